@@ -0,0 +1,121 @@
+"""
+基准测试数据集 - 录制样本的平铺扩展与合成数据生成
+
+所有生成器都使用固定随机种子，同样的参数总是得到同样的数据。
+"""
+
+import json
+import os
+import random
+from typing import Any, Dict, List
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SEED = 20240601
+
+# 繁简混排的中文短句和少量英文，覆盖繁简转换的常见路径
+_PHRASES = [
+    "大家好，歡迎來到今天的節目", "今天我們來聊一聊機器學習", "首先看一下這個問題",
+    "這個功能的設計其實很簡單", "用戶每次都要重新下載整個影片", "所以我們加了一個快取層",
+    "接下来我们看一下具体的实现", "这里有几个需要注意的地方", "好的，今天就到这里",
+    "記得點讚訂閱", "let's take a look at the code", "這個 API 的回應時間大約是 200 毫秒",
+]
+
+
+def _load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthetic_segments(count: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """生成统一格式的字幕片段 [{"start", "end", "content"}]"""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    for _ in range(count):
+        duration = round(rng.uniform(0.8, 5.0), 3)
+        segments.append({
+            "start": round(t, 3),
+            "end": round(t + duration, 3),
+            "content": rng.choice(_PHRASES),
+        })
+        t += duration + round(rng.uniform(0.0, 0.6), 3)
+    return segments
+
+
+def synthetic_text(chars: int, seed: int = SEED) -> str:
+    """生成约 chars 个字符的繁简混排文本（按行拼接）"""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    total = 0
+    while total < chars:
+        line = rng.choice(_PHRASES)
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+def bilibili_body(count: int) -> List[Dict[str, Any]]:
+    """将录制的 B站字幕 body 平铺扩展到 count 条（时间轴顺延）"""
+    sample = _load_fixture("bilibili_ai_zh.json")["body"]
+    span = sample[-1]["to"] + 0.5
+    body = []
+    for i in range(count):
+        item = dict(sample[i % len(sample)])
+        offset = (i // len(sample)) * span
+        item["from"] = round(item["from"] + offset, 2)
+        item["to"] = round(item["to"] + offset, 2)
+        item["sid"] = i + 1
+        body.append(item)
+    return body
+
+
+def youtube_json3(count: int) -> str:
+    """将录制的 YouTube 自动字幕 json3 平铺扩展到 count 个字幕事件
+
+    保留样本中的窗口定义事件和 aAppend 换行事件，字幕事件数为 count。
+    """
+    sample = _load_fixture("youtube_auto_zh.json3")
+    header = [e for e in sample["events"] if "segs" not in e]
+    body = [e for e in sample["events"] if "segs" in e]
+    captions = [e for e in body if not e.get("aAppend")]
+    span = body[-1]["tStartMs"] + body[-1]["dDurationMs"]
+
+    events = list(header)
+    emitted = 0
+    round_index = 0
+    while emitted < count:
+        offset = round_index * span
+        for event in body:
+            if emitted >= count:
+                break
+            shifted = dict(event)
+            shifted["tStartMs"] = event["tStartMs"] + offset
+            events.append(shifted)
+            if not event.get("aAppend"):
+                emitted += 1
+        round_index += 1
+
+    data = dict(sample)
+    data["events"] = events
+    assert captions, "样本中没有字幕事件"
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def routing_sources(count: int, seed: int = SEED) -> List[str]:
+    """生成混合平台的来源列表（B站/YouTube/不支持的 URL）"""
+    rng = random.Random(seed)
+    templates = [
+        "https://www.bilibili.com/video/BV1{id}/",
+        "BV1{id}",
+        "https://www.bilibili.com/list/ml123?bvid=BV1{id}",
+        "https://www.youtube.com/watch?v={id}",
+        "https://youtu.be/{id}?t=30",
+        "https://www.youtube.com/shorts/{id}",
+        "https://example.com/video/{id}",
+    ]
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    return [
+        rng.choice(templates).format(id="".join(rng.choice(alphabet) for _ in range(10)))
+        for _ in range(count)
+    ]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+yt-dlp 桩程序 - 返回预置的视频信息、json3 字幕和媒体文件，不访问网络
+
+只实现本项目用到的参数组合:
+    --dump-json            输出视频信息 JSON
+    --write-subs ... -o T  按 T 写入 <id>.<lang>.json3
+    -o FILE                写入一个短的静音 WAV（下载视频/音频）
+
+视频 ID 以 "nosub" 开头（YouTube）或以 "BVnosub" 开头（B站）时没有字幕。
+
+环境变量:
+    FAKE_YT_DLP_LATENCY     每次调用的延迟（毫秒，默认 0）
+    FAKE_YT_DLP_ERROR_RATE  返回 429 限流错误的比例（0-1，默认 0）
+    FAKE_YT_DLP_SEGMENTS    每个字幕文件的事件数（默认 200）
+
+用法:
+    VIDEO_CAPTIONS_YT_DLP=benchmarks/loadtest/fake_yt_dlp.py video-captions <url>
+"""
+
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasets  # noqa: E402
+
+SAMPLE_RATE = 16000
+MEDIA_SECONDS = 1
+
+
+def _option(args: List[str], name: str) -> Optional[str]:
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return None
+
+
+def _video_id(url: str) -> str:
+    patterns = (
+        r"[?&]v=([\w-]+)", r"youtu\.be/([\w-]+)", r"/(?:shorts|embed|v)/([\w-]+)", r"(BV\w+)"
+    )
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return "unknown"
+
+
+def _has_subtitles(video_id: str) -> bool:
+    return not (video_id.startswith("nosub") or video_id.startswith("BVnosub"))
+
+
+def _info(video_id: str) -> dict:
+    captions = {"zh-Hans": [{"ext": "json3"}]} if _has_subtitles(video_id) else {}
+    return {
+        "id": video_id,
+        "title": f"桩视频 {video_id}",
+        "duration": 600,
+        "description": "",
+        "uploader": "stub",
+        "subtitles": {},
+        "automatic_captions": captions,
+    }
+
+
+def _write_wav(path: str) -> None:
+    """写入 16kHz 单声道 16bit 静音 WAV"""
+    frames = SAMPLE_RATE * MEDIA_SECONDS
+    data_size = frames * 2
+    header = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16)
+    header += b"data" + struct.pack("<I", data_size)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(header + b"\x00" * data_size)
+
+
+def main() -> int:
+    args = sys.argv[1:]
+
+    latency = float(os.environ.get("FAKE_YT_DLP_LATENCY", "0"))
+    if latency > 0:
+        time.sleep(latency / 1000)
+
+    if random.random() < float(os.environ.get("FAKE_YT_DLP_ERROR_RATE", "0")):
+        print(
+            "ERROR: Unable to download webpage: HTTP Error 429: Too Many Requests", file=sys.stderr
+        )
+        return 1
+
+    video_id = _video_id(args[-1] if args else "")
+
+    if "--dump-json" in args:
+        print(json.dumps(_info(video_id), ensure_ascii=False))
+        return 0
+
+    output = _option(args, "-o")
+    if output is None:
+        print("ERROR: 桩程序需要 -o 参数", file=sys.stderr)
+        return 2
+
+    if "--write-subs" in args or "--write-auto-subs" in args:
+        if _has_subtitles(video_id):
+            lang = _option(args, "--sub-lang") or "zh-Hans"
+            base = output.replace("%(id)s", video_id).replace("%(ext)s", "").rstrip(".")
+            segments = int(os.environ.get("FAKE_YT_DLP_SEGMENTS", "200"))
+            with open(f"{base}.{lang}.json3", "w", encoding="utf-8") as f:
+                f.write(datasets.youtube_json3(segments))
+        return 0
+
+    _write_wav(output.replace("%(id)s", video_id).replace("%(ext)s", "wav"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
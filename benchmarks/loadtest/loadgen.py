@@ -0,0 +1,192 @@
+"""
+MCP 服务压测 - 并发调用 download_captions，统计吞吐量与延迟分位数
+
+默认在进程内启动 B站桩服务（stub_server.py），并将 yt-dlp 替换为
+fake_yt_dlp.py，缓存目录使用临时目录，全程不访问真实平台。
+
+用法:
+    python benchmarks/loadtest/loadgen.py --requests 200 --concurrency 20
+    python benchmarks/loadtest/loadgen.py --platform mixed --unique 10 --throttle-rate 0.05
+    python benchmarks/loadtest/loadgen.py --api-url http://127.0.0.1:8765 --json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(LOADTEST_DIR))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, LOADTEST_DIR)
+
+from stub_server import StubConfig, start_stub_server  # noqa: E402
+
+FAKE_YT_DLP = os.path.join(LOADTEST_DIR, "fake_yt_dlp.py")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def build_urls(platform: str, requests: int, unique: int, seed: int) -> List[str]:
+    """生成请求 URL 列表，unique 个不同视频循环使用（用于观察缓存效果）"""
+    bilibili = [f"https://www.bilibili.com/video/BV1load{i:05d}" for i in range(unique)]
+    youtube = [f"https://www.youtube.com/watch?v=load{i:07d}" for i in range(unique)]
+    if platform == "bilibili":
+        pool = bilibili
+    elif platform == "youtube":
+        pool = youtube
+    else:
+        pool = bilibili + youtube
+    rng = random.Random(seed)
+    return [rng.choice(pool) for _ in range(requests)]
+
+
+async def run_load(urls: List[str], concurrency: int, format: str) -> Dict[str, Any]:
+    """以固定并发度执行所有请求"""
+    # 环境变量需在导入服务模块前设置，因此延迟导入
+    from handler.mcp import download_captions
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    sources: Dict[str, int] = {}
+
+    async def worker() -> None:
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            result = await download_captions(url, format=format)
+            latencies.append(time.perf_counter() - start)
+            if "error" in result:
+                key = result["error"]
+                errors[key] = errors.get(key, 0) + 1
+            else:
+                source = result.get("source", "unknown")
+                sources[source] = sources.get(source, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(urls),
+        "concurrency": concurrency,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(urls) / elapsed, 2) if elapsed else 0.0,
+        "latency": {
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "errors": errors,
+        "sources": sources,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(f"请求数       {report['requests']}（并发 {report['concurrency']}）")
+    print(f"总耗时       {report['elapsed']:.3f} s")
+    print(f"吞吐量       {report['throughput']:.2f} req/s")
+    print(
+        f"延迟         p50 {latency['p50'] * 1000:.1f} ms   p95 {latency['p95'] * 1000:.1f} ms"
+        f"   p99 {latency['p99'] * 1000:.1f} ms   max {latency['max'] * 1000:.1f} ms"
+    )
+    print(f"字幕来源     {json.dumps(report['sources'], ensure_ascii=False)}")
+    errors = json.dumps(report['errors'], ensure_ascii=False) if report['errors'] else '无'
+    print(f"错误         {errors}")
+    if report.get("stub"):
+        print(f"桩服务请求   {json.dumps(report['stub'], ensure_ascii=False)}")
+    stages = report.get("stages", {})
+    if stages:
+        print("\n阶段耗时（avg / max, ms）")
+        for name, stats in stages.items():
+            print(
+                f"  {name:<16} {stats['avg'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}"
+                f"   ×{stats['count']}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="video-captions MCP 服务压测")
+    parser.add_argument("--requests", type=int, default=100, help="总请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument("--platform", choices=["bilibili", "youtube", "mixed"], default="bilibili")
+    parser.add_argument("--unique", type=int, default=20, help="不同视频的数量")
+    parser.add_argument("--format", choices=["text", "srt", "json"], default="text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--api-url", help="使用已启动的桩服务（不在进程内启动）")
+    parser.add_argument("--latency", type=float, default=20.0, help="桩服务基础延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=10.0, help="桩服务随机附加延迟上限（毫秒）")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="桩服务限流响应比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="桩服务 HTTP 500 比例")
+    parser.add_argument("--segments", type=int, default=200, help="每个字幕文件的条数")
+    parser.add_argument(
+        "--flaky-rate", type=float, default=0.0, help="桩服务播放器接口返回空列表/错误字幕的比例"
+    )
+    parser.add_argument(
+        "--yt-dlp-latency", type=float, default=50.0, help="yt-dlp 桩程序延迟（毫秒）"
+    )
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出报告")
+    args = parser.parse_args()
+
+    server = None
+    stub_config: Optional[StubConfig] = None
+    api_url = args.api_url
+    if not api_url:
+        stub_config = StubConfig(
+            args.latency, args.jitter, args.throttle_rate, args.error_rate, args.segments,
+            seed=args.seed, flaky_rate=args.flaky_rate
+        )
+        server, api_url = start_stub_server(stub_config)
+
+    cache_dir = tempfile.TemporaryDirectory(prefix="video-captions-loadtest-")
+    os.environ["VIDEO_CAPTIONS_BILIBILI_API"] = api_url
+    os.environ["VIDEO_CAPTIONS_YT_DLP"] = FAKE_YT_DLP
+    os.environ["VIDEO_CAPTIONS_CACHE_DIR"] = cache_dir.name
+    os.environ.setdefault("BILIBILI_SESSDATA", "loadtest")
+    os.environ["FAKE_YT_DLP_LATENCY"] = str(args.yt_dlp_latency)
+    os.environ["FAKE_YT_DLP_SEGMENTS"] = str(args.segments)
+
+    from core.metrics import snapshot
+
+    urls = build_urls(args.platform, args.requests, args.unique, args.seed)
+    try:
+        report = asyncio.run(run_load(urls, args.concurrency, args.format))
+    finally:
+        if server:
+            server.shutdown()
+        cache_dir.cleanup()
+
+    report["stages"] = snapshot()["stages"]
+    if stub_config:
+        report["stub"] = stub_config.stats
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
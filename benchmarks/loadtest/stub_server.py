@@ -0,0 +1,255 @@
+"""
+B站接口桩服务 - 在本地模拟视频信息、播放器字幕列表和字幕 CDN
+
+模拟的接口:
+    GET /x/web-interface/view?bvid=...          视频信息
+    GET /x/web-interface/nav                    WBI key（未登录响应）
+    GET /x/player/wbi/v2?bvid=...&cid=...       字幕列表（未签名时返回空列表）
+    GET /bfs/ai_subtitle/prod/<bvid>.json       字幕 JSON（CDN，带 ETag，支持 If-None-Match）
+
+BV 号以 "BVnosub" 开头的视频没有字幕。可配置响应延迟、限流比例（HTTP 412
+或业务码 -352）、错误比例（HTTP 500），以及播放器接口偶发返回空字幕列表或
+其他视频字幕的比例。
+
+用法:
+    python benchmarks/loadtest/stub_server.py --port 8765 --latency 50 --throttle-rate 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasets  # noqa: E402
+
+
+class StubConfig:
+    """桩服务行为配置"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        segments: int = 200,
+        duration: int = 600,
+        seed: Optional[int] = None,
+        flaky_rate: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.segments = segments
+        # 视频时长不短于字幕结束时间，避免字幕校验失败
+        last_end = int(datasets.bilibili_body(segments)[-1]["to"]) + 1 if segments else 0
+        self.duration = max(duration, last_end)
+        self.flaky_rate = flaky_rate
+        self.random = random.Random(seed)
+        self.stats: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+def _cid(bvid: str) -> int:
+    return zlib.crc32(bvid.encode("utf-8")) % 10**9
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """处理桩服务请求"""
+
+    config: StubConfig = StubConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, payload: Any, status: int = 200, etag: bool = False) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        tag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if etag else None
+        if tag and self.headers.get("If-None-Match") == tag:
+            self.config.count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        if tag:
+            self.send_header("ETag", tag)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_faults(self, api: bool) -> bool:
+        """按配置注入延迟、限流和错误，已响应时返回 True"""
+        config = self.config
+        delay = config.latency_ms + config.random.uniform(0, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        roll = config.random.random()
+        if roll < config.error_rate:
+            config.count("error_500")
+            self._send_json({"code": -500, "message": "服务器错误"}, status=500)
+            return True
+        if api and roll < config.error_rate + config.throttle_rate:
+            # 一半返回 HTTP 412，一半返回业务码 -352
+            if config.random.random() < 0.5:
+                config.count("throttle_412")
+                self._send_json({"code": -412, "message": "请求被拦截"}, status=412)
+            else:
+                config.count("throttle_352")
+                self._send_json({"code": -352, "message": "风控校验失败"})
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path
+        config = self.config
+
+        if path == "/x/web-interface/view":
+            config.count("view")
+            if self._inject_faults(api=True):
+                return
+            bvid = params.get("bvid", "")
+            self._send_json({
+                "code": 0,
+                "message": "0",
+                "data": {
+                    "bvid": bvid,
+                    "title": f"桩视频 {bvid}",
+                    "duration": config.duration,
+                    "desc": "",
+                    "owner": {"name": "stub"},
+                    "cid": _cid(bvid),
+                    "subtitle": {"list": []},
+                },
+            })
+        elif path == "/x/player/wbi/v2":
+            config.count("player")
+            if self._inject_faults(api=True):
+                return
+            bvid = params.get("bvid", "")
+            subtitles = []
+            flaky = config.random.random() < config.flaky_rate
+            if "w_rid" not in params or "wts" not in params:
+                # 与线上行为一致：未签名的请求返回空字幕列表
+                config.count("unsigned")
+            elif flaky and config.random.random() < 0.5:
+                # 偶发的空字幕列表
+                config.count("flaky_empty")
+            elif not bvid.startswith("BVnosub"):
+                host = self.headers.get("Host", "127.0.0.1")
+                name = bvid
+                if flaky:
+                    # 偶发的其他视频（时长更长）的字幕
+                    config.count("flaky_other")
+                    name = f"other-{bvid}"
+                subtitles.append({
+                    "lan": "ai-zh",
+                    "lan_doc": "中文（自动生成）",
+                    "subtitle_url": f"http://{host}/bfs/ai_subtitle/prod/{name}.json",
+                })
+            self._send_json({
+                "code": 0,
+                "data": {
+                    "bvid": bvid,
+                    "cid": int(params.get("cid") or 0),
+                    "subtitle": {"subtitles": subtitles},
+                },
+            })
+        elif path == "/x/web-interface/nav":
+            config.count("nav")
+            self._send_json({
+                "code": -101,
+                "message": "账号未登录",
+                "data": {
+                    "isLogin": False,
+                    "wbi_img": {
+                        "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                        "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+                    },
+                },
+            })
+        elif path.startswith("/bfs/ai_subtitle/"):
+            config.count("subtitle")
+            if self._inject_faults(api=False):
+                return
+            count = config.segments * (3 if "/other-" in path else 1)
+            self._send_json(
+                {"type": "AIsubtitle", "lang": "zh", "body": datasets.bilibili_body(count)},
+                etag=True,
+            )
+        else:
+            config.count("not_found")
+            self._send_json({"code": -404, "message": "啥都木有"}, status=404)
+
+
+def start_stub_server(
+    config: StubConfig,
+    host: str = "127.0.0.1",
+    port: int = 0
+) -> tuple[ThreadingHTTPServer, str]:
+    """在后台线程中启动桩服务
+
+    Returns:
+        (server, base_url)，调用 server.shutdown() 停止
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="B站接口桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="基础延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机附加延迟上限（毫秒）")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="限流响应比例 (0-1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 比例 (0-1)")
+    parser.add_argument("--segments", type=int, default=200, help="每个字幕文件的条数")
+    parser.add_argument(
+        "--flaky-rate", type=float, default=0.0, help="播放器接口返回空列表/错误字幕的比例 (0-1)"
+    )
+    args = parser.parse_args()
+
+    config = StubConfig(
+        args.latency, args.jitter, args.throttle_rate, args.error_rate, args.segments,
+        flaky_rate=args.flaky_rate
+    )
+    server, base_url = start_stub_server(config, args.host, args.port)
+    print(f"桩服务已启动: {base_url}", file=sys.stderr)
+    print(
+        f"使用方式: VIDEO_CAPTIONS_BILIBILI_API={base_url} BILIBILI_SESSDATA=stub ...",
+        file=sys.stderr,
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(config.stats, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+离线微基准测试 - 字幕解析、格式化与繁简转换热路径
+
+不访问网络，数据来自 fixtures/ 中的录制样本和合成生成器。
+
+用法:
+    python benchmarks/run.py                          # 运行并打印结果
+    python benchmarks/run.py --save baseline.json     # 保存结果作为基线
+    python benchmarks/run.py --compare baseline.json  # 与基线对比，回归时退出码为 1
+    python benchmarks/run.py --sizes 10,1000 --filter format
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datasets  # noqa: E402
+from core.formatter import ResponseFormat, format_subtitle  # noqa: E402
+from core.text import convert_to_simplified  # noqa: E402
+from service import get_service, get_service_name  # noqa: E402
+from service.bilibili import parse_subtitle_body  # noqa: E402
+from service.youtube import parse_json3  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.15
+# 单个用例的时间预算（秒），超出后减少重复次数
+TIME_BUDGET = 10.0
+
+# (名称, 准备函数(size) -> 输入, 被测函数(输入))
+Case = Tuple[str, Callable[[int], Any], Callable[[Any], Any]]
+
+
+def _format_case(fmt: ResponseFormat) -> Case:
+    return (
+        f"format_subtitle[{fmt.value}]",
+        datasets.synthetic_segments,
+        lambda segments: format_subtitle(segments, "benchmark", fmt, source="api"),
+    )
+
+
+def _route(sources: List[str]) -> None:
+    for source in sources:
+        get_service_name(source)
+        get_service(source)
+
+
+CASES: List[Case] = [
+    _format_case(ResponseFormat.TEXT),
+    _format_case(ResponseFormat.SRT),
+    _format_case(ResponseFormat.JSON),
+    _format_case(ResponseFormat.COMPACT),
+    # 用例名沿用函数改名前的 _parse_json3，保持与已保存的基线可比
+    ("youtube._parse_json3", datasets.youtube_json3, parse_json3),
+    ("bilibili.parse_subtitle_body", datasets.bilibili_body, parse_subtitle_body),
+    # 以字幕条数 × 约 12 字符估算文本长度
+    ("convert_to_simplified", lambda n: datasets.synthetic_text(n * 12), convert_to_simplified),
+    ("service_routing", datasets.routing_sources, _route),
+]
+
+
+def run_case(func: Callable[[Any], Any], data: Any, repeat: int) -> Dict[str, Any]:
+    """运行单个用例，返回耗时统计（秒）"""
+    timings: List[float] = []
+    deadline = time.perf_counter() + TIME_BUDGET
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+        # 超出时间预算则提前结束（大规模用例可能只运行 1 次）
+        if time.perf_counter() > deadline:
+            break
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "runs": len(timings),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        )
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_all(sizes: List[int], repeat: int, pattern: Optional[str]) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, prepare, func in CASES:
+        if pattern and pattern not in name:
+            continue
+        func(prepare(10))  # 预热（如 OpenCC 词典加载）
+        for size in sizes:
+            data = prepare(size)
+            key = f"{name}/{size}"
+            results[key] = run_case(func, data, repeat)
+            stats = results[key]
+            print(
+                f"{key:<42} median {stats['median'] * 1000:>10.3f} ms"
+                f"   min {stats['min'] * 1000:>10.3f} ms   runs {stats['runs']}",
+                file=sys.stderr,
+            )
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """对比当前结果与基线，返回回归的用例列表"""
+    regressions = []
+    print(f"\n{'用例':<40} {'基线(ms)':>12} {'当前(ms)':>12} {'变化':>9}")
+    for key, stats in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            print(f"{key:<42} {'-':>12} {stats['median'] * 1000:>12.3f} {'新增':>9}")
+            continue
+        ratio = stats["median"] / base["median"] if base["median"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ← 回归"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = "  ← 提升"
+        print(
+            f"{key:<42} {base['median'] * 1000:>12.3f} {stats['median'] * 1000:>12.3f}"
+            f" {(ratio - 1) * 100:>+8.1f}%{flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="video-captions 离线微基准测试")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="字幕条数列表，逗号分隔（默认 10,100,1000,10000,100000）",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个用例的重复次数")
+    parser.add_argument("--filter", dest="pattern", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--save", metavar="PATH", help="将结果保存为 JSON（可作为基线）")
+    parser.add_argument("--compare", metavar="PATH", help="与基线 JSON 对比")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="判定回归的中位数变慢比例（默认 0.15，即 15%%）",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    current = run_all(sizes, args.repeat, args.pattern)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.save}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 个回归（阈值 {args.threshold:.0%}）", file=sys.stderr)
+            sys.exit(1)
+        print("\n未发现回归", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 """
 Core 层 - 通用能力模块
 
-提供日志、文本处理、音频处理、ASR、Cookie 读取、字幕格式化等通用功能
+提供日志、文本处理、音频处理、ASR、Cookie 读取、字幕格式化、本地缓存等通用功能
 """
 
 from .logging import (
@@ -15,9 +15,22 @@ from .logging import (
 )
 from .text import make_safe_filename, convert_to_simplified
 from .audio import extract_audio, is_video_file, is_audio_file
+from .timerange import TimeRange, make_time_range, parse_time
 from .asr import transcribe_with_asr
+from .model_select import select_model_size
 from .cookie import get_sessdata, get_sessdata_with_source, require_sessdata
 from .formatter import format_subtitle, ResponseFormat
+from .compact import CompactOptions, estimate_tokens
+from .export import ExportOptions, export_subtitles
+from .governor import ResourceBusyError, get_governor
+from .cache import (
+    DiskCache,
+    get_cache_dir,
+    get_audio_cache,
+    get_asr_cache,
+    get_http_cache,
+    fingerprint_file,
+)
 from .browser import (
     get_sessdata_from_browser,
     get_browser_name,
@@ -40,8 +53,12 @@ __all__ = [
     "extract_audio",
     "is_video_file",
     "is_audio_file",
+    "TimeRange",
+    "make_time_range",
+    "parse_time",
     # ASR
     "transcribe_with_asr",
+    "select_model_size",
     # Cookie
     "get_sessdata",
     "get_sessdata_with_source",
@@ -53,4 +70,18 @@ __all__ = [
     # Formatter
     "format_subtitle",
     "ResponseFormat",
+    "CompactOptions",
+    "estimate_tokens",
+    "ExportOptions",
+    "export_subtitles",
+    # Cache
+    "DiskCache",
+    "get_cache_dir",
+    "get_audio_cache",
+    "get_asr_cache",
+    "get_http_cache",
+    "fingerprint_file",
+    # Governor
+    "ResourceBusyError",
+    "get_governor",
 ]
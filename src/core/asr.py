@@ -1,12 +1,31 @@
 """
 ASR 语音识别 - 使用 mlx-whisper 进行语音转录
+
+默认在独立的 worker 进程中运行（见 asr_worker.py），不阻塞事件循环，
+也不会改写主进程的 stdout/stderr。
 """
 
+import asyncio
+import gzip
+import importlib.util
+import json
 import os
+import sqlite3
+import subprocess
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
 
-from .logging import log_step, _verbose_log
+from .asr_worker import _empty_result, get_asr_pool, get_worker_count
+from .audio import SAMPLE_RATE, get_audio_duration, read_pcm16
+from .cache import fingerprint_file, get_asr_cache
+from .fingerprint import compute_fingerprint, find_match, index_fingerprint, is_fingerprint_enabled
+from .governor import MB, get_governor
+from .logging import log_step, log_success, log_debug, log_info, log_warning, is_verbose_log
+from .metrics import observe_stage, record_cache, stage
+from .model_select import record_rtf, select_model_size
+from .vad import apply_vad, is_vad_enabled, remap_segments
 
 # 禁用 tqdm 进度条，避免非 verbose 模式下 huggingface_hub 输出无关信息
 os.environ["TQDM_DISABLE"] = "1"
@@ -19,9 +38,27 @@ MODEL_MAP = {
     "large": "mlx-community/whisper-large-v3-mlx",
 }
 
+# 推理时的大致内存占用（MB，fp16 权重 + 解码缓存），用于资源调度的内存预算
+MODEL_MEMORY_MB = {
+    "base": 300,
+    "small": 800,
+    "medium": 2000,
+    "large": 4000,
+}
+
+# 解码参数（同时参与 ASR 结果缓存键的计算）
+DECODE_OPTIONS: Dict[str, Any] = {
+    "language": "zh",
+    "hallucination_silence_threshold": 0.5,
+    "condition_on_previous_text": False,
+}
+
 
 def _suppress_output(func, *args, **kwargs):
-    """在函数执行期间抑制所有 stdout/stderr 输出（包括 C 扩展级别的写入）"""
+    """在函数执行期间抑制所有 stdout/stderr 输出（包括 C 扩展级别的写入）
+
+    会改写整个进程的 fd 1/2，只应在 ASR worker 进程或主进程内转录模式下使用。
+    """
     devnull = os.open(os.devnull, os.O_WRONLY)
     # 保存原始 fd
     stdout_fd = os.dup(1)
@@ -39,17 +76,210 @@ def _suppress_output(func, *args, **kwargs):
         os.close(stderr_fd)
 
 
+def _asr_cache_key(audio_file: str, model_path: str, vad: bool) -> str:
+    """ASR 缓存键：音频内容指纹 + 模型 + 解码参数（含 VAD 开关）"""
+    options = json.dumps({**DECODE_OPTIONS, "vad": vad}, sort_keys=True)
+    return f"{fingerprint_file(audio_file)}|{model_path}|{options}"
+
+
+def _load_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """读取缓存的 ASR 结果，未命中或损坏返回 None"""
+    data = get_asr_cache().get_bytes(cache_key)
+    if data is None:
+        return None
+    try:
+        payload = json.loads(gzip.decompress(data))
+        segments = [
+            {"start": start, "end": end, "text": text}
+            for start, end, text in payload["segments"]
+        ]
+        return {"segments": segments, "language": payload.get("language", "zh")}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _store_cached_result(cache_key: str, segments: List[Dict[str, Any]], language: str) -> None:
+    """以紧凑形式（[start, end, text] 数组 + gzip）保存 ASR 结果"""
+    payload = {
+        "language": language,
+        "segments": [[seg["start"], seg["end"], seg["text"]] for seg in segments],
+    }
+    data = gzip.compress(
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    )
+    get_asr_cache().put_bytes(cache_key, data, ".json.gz")
+
+
+def _load_model(model_path: str) -> None:
+    """预先加载模型到 mlx-whisper 的模型缓存
+
+    mlx_whisper.transcribe 内部通过 ModelHolder 复用同一模型，
+    提前加载可以把模型下载/加载与推理分开统计，也便于预热。
+    """
+    try:
+        import mlx.core as mx
+        from mlx_whisper.transcribe import ModelHolder
+    except ImportError:
+        return
+
+    if is_verbose_log():
+        ModelHolder.get_model(model_path, mx.float16)
+    else:
+        _suppress_output(ModelHolder.get_model, model_path, mx.float16)
+
+
+def is_asr_available() -> bool:
+    """是否已安装 mlx-whisper（仅 Apple Silicon Mac 可用）"""
+    return importlib.util.find_spec("mlx_whisper") is not None
+
+
+def _download_model(model_path: str) -> None:
+    """把模型权重下载到 huggingface 缓存（不加载）"""
+    if os.path.isdir(model_path):
+        return
+    from huggingface_hub import snapshot_download
+
+    if is_verbose_log():
+        snapshot_download(repo_id=model_path)
+    else:
+        _suppress_output(snapshot_download, repo_id=model_path)
+
+
+async def preload_models(model_sizes: List[str]) -> Dict[str, Any]:
+    """启动预热：下载各模型的权重，并在每个 ASR worker 中加载第一个模型
+
+    mlx-whisper 每个进程只保留一个已加载的模型，因此只有第一个（最常用的）模型
+    常驻 worker，其余模型只预先下载权重，首次使用时免去下载。
+
+    Returns:
+        {"loaded": "large", "load_seconds": [3.2], "downloaded": ["large", "small"]}
+    """
+    sizes = [size for size in dict.fromkeys(model_sizes) if size in MODEL_MAP]
+    if not sizes:
+        return {"loaded": None, "load_seconds": [], "downloaded": []}
+    for size in sizes:
+        await asyncio.to_thread(_download_model, MODEL_MAP[size])
+
+    model_path = MODEL_MAP[sizes[0]]
+    if get_worker_count() > 0:
+        load_seconds = await get_asr_pool().preload(model_path)
+    else:
+        start = time.perf_counter()
+        await asyncio.to_thread(_load_model, model_path)
+        load_seconds = [time.perf_counter() - start]
+    return {
+        "loaded": sizes[0],
+        "load_seconds": [round(t, 2) for t in load_seconds],
+        "downloaded": sizes,
+    }
+
+
+def estimate_asr_memory(model_size: str, audio_seconds: Optional[float]) -> int:
+    """估算一次转录的内存占用（字节）：模型 + float32 波形及中间结果（约波形的 2 倍）"""
+    audio_bytes = int((audio_seconds or 0) * SAMPLE_RATE * 4 * 2)
+    return MODEL_MEMORY_MB.get(model_size, MODEL_MEMORY_MB["large"]) * MB + audio_bytes
+
+
+def _transcribe_in_process(audio_file: str, model_path: str, vad: bool) -> Dict[str, Any]:
+    """在当前进程内转录（VIDEO_CAPTIONS_ASR_WORKERS=0 时使用）"""
+    import mlx_whisper
+
+    with stage("audio_decode"):
+        samples = np.frombuffer(read_pcm16(audio_file), dtype=np.int16)
+    regions = None
+    if vad:
+        with stage("vad"):
+            samples, regions = apply_vad(samples)
+        if regions == []:
+            return _empty_result(DECODE_OPTIONS)
+    audio = samples.astype(np.float32) / 32768.0
+
+    load_start = time.perf_counter()
+    with stage("model_load"):
+        _load_model(model_path)
+
+    # 非 verbose 模式下抑制 mlx_whisper 及 huggingface_hub 的所有输出
+    decode_start = time.perf_counter()
+    with stage("asr_decode"):
+        if is_verbose_log():
+            result = mlx_whisper.transcribe(audio, path_or_hf_repo=model_path, **DECODE_OPTIONS)
+        else:
+            result = _suppress_output(
+                mlx_whisper.transcribe, audio, path_or_hf_repo=model_path, **DECODE_OPTIONS
+            )
+    decode_end = time.perf_counter()
+
+    segments = [
+        {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"].strip()}
+        for seg in result.get("segments", [])
+    ]
+    return {
+        "segments": remap_segments(segments, regions),
+        "language": result.get("language", "zh"),
+        "audio_seconds": len(audio) / SAMPLE_RATE,
+        "timings": {
+            "model_load": decode_start - load_start,
+            "asr_decode": decode_end - decode_start,
+        },
+    }
+
+
+def _fingerprint_lookup(
+    audio_file: str,
+    model_size: str
+) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]]]:
+    """计算音频指纹并查找同一内容的已有转录（在线程中运行）
+
+    Returns:
+        (指纹, 匹配结果)；解码或读取索引失败时返回 (None, None)
+    """
+    try:
+        with stage("fingerprint"):
+            samples = np.frombuffer(read_pcm16(audio_file), dtype=np.int16)
+            fingerprint = compute_fingerprint(samples)
+            return fingerprint, find_match(samples, model_size, fingerprint=fingerprint)
+    except (OSError, sqlite3.Error, subprocess.CalledProcessError) as e:
+        log_warning(f"音频指纹查找失败: {e}")
+        return None, None
+
+
+def _index_fingerprint(
+    audio_file: str,
+    fingerprint: np.ndarray,
+    segments: List[Dict[str, Any]],
+    language: str,
+    model_size: str,
+    audio_seconds: float
+) -> None:
+    """把转录结果写入指纹索引（失败只记录警告）"""
+    try:
+        index_fingerprint(
+            fingerprint_file(audio_file), fingerprint, segments, language, model_size, audio_seconds
+        )
+    except (OSError, sqlite3.Error) as e:
+        log_warning(f"写入音频指纹失败: {e}")
+
+
 async def transcribe_with_asr(
     audio_file: str,
     model_size: str = "large",
-    show_progress: bool = True
+    show_progress: bool = True,
+    use_cache: bool = True,
+    deadline: Optional[float] = None
 ) -> Dict[str, Any]:
     """使用 Whisper ASR 生成字幕
 
+    相同内容的音频（无论路径）在相同模型和解码参数下只转录一次，
+    结果缓存在本地 ASR 缓存中。ASR 缓存未命中时再按音频指纹查找重新上传、
+    剪辑或转录自其他平台的相同内容（见 fingerprint.py），复用其转录。
+
     Args:
         audio_file: 音频文件路径
-        model_size: 模型大小 (base/small/medium/large)
+        model_size: 模型大小 (base/small/medium/large/auto)；auto 根据音频时长、
+            截止时间和本机实测 RTF 选择能按时完成的最高精度模型
         show_progress: 是否显示进度
+        use_cache: 是否使用 ASR 结果缓存
+        deadline: auto 模式下可用于转录的秒数（默认 600）
 
     Returns:
         {
@@ -57,54 +287,115 @@ async def transcribe_with_asr(
             "segments": [{"start": 0.0, "end": 1.0, "text": "..."}],
             "text": "完整文本",
             "language": "zh",
-            "duration": 12.5
+            "duration": 12.5,
+            "model_size": "large",
+            "model_selection": {...},  # 仅 auto 模式
+            "fingerprint_match": {...}  # 仅复用了指纹匹配的转录时
         }
     """
-    import mlx_whisper
-
-    model_path = MODEL_MAP.get(model_size, MODEL_MAP["large"])
-
-    if show_progress:
-        log_step(f"加载 Whisper {model_size} 模型", "(mlx-whisper)")
-
     start_time = time.time()
+    selection = None
+    audio_seconds = None
+    if model_size == "auto":
+        audio_seconds = get_audio_duration(audio_file)
+        if audio_seconds is None:
+            model_size = "large"
+        else:
+            selection = select_model_size(audio_seconds, deadline)
+            model_size = selection["model_size"]
+            log_info(
+                f"自动选择模型: {model_size}（音频 {audio_seconds:.0f}s，"
+                f"预计 {selection['estimated_seconds']:.0f}s，截止 {selection['deadline']:.0f}s）"
+            )
+    model_size = model_size if model_size in MODEL_MAP else "large"
+    model_path = MODEL_MAP[model_size]
+    extra: Dict[str, Any] = {"model_size": model_size}
+    if selection:
+        extra["model_selection"] = selection
 
-    # 非 verbose 模式下抑制 mlx_whisper 及 huggingface_hub 的所有输出
-    if _verbose_log:
-        result = mlx_whisper.transcribe(
-            audio_file,
-            path_or_hf_repo=model_path,
-            language="zh",
-            hallucination_silence_threshold=0.5,
-            condition_on_previous_text=False,
-        )
-    else:
-        result = _suppress_output(mlx_whisper.transcribe,
-            audio_file,
-            path_or_hf_repo=model_path,
-            language="zh",
-            hallucination_silence_threshold=0.5,
-            condition_on_previous_text=False,
-        )
+    use_cache = use_cache and get_asr_cache().enabled
+    vad = is_vad_enabled()
+    cache_key = _asr_cache_key(audio_file, model_path, vad) if use_cache else None
+    if cache_key:
+        cached = _load_cached_result(cache_key)
+        record_cache("asr", cached is not None)
+        if cached is not None:
+            log_success(f"命中 ASR 缓存，共 {len(cached['segments'])} 个片段")
+            return {
+                "source": "whisper_asr",
+                "segments": cached["segments"],
+                "text": '\n'.join(seg["text"] for seg in cached["segments"]),
+                "language": cached["language"],
+                "duration": time.time() - start_time,
+                "cached": True,
+                **extra
+            }
+        log_debug("ASR 缓存未命中")
 
-    elapsed = time.time() - start_time
+    # 占用 asr 名额并预占内存，同时运行的大模型推理不超过内存预算；指纹查找要解码整段
+    # 音频，也在名额内进行，排队中的请求不会各自持有完整的 PCM
+    if audio_seconds is None:
+        audio_seconds = get_audio_duration(audio_file)
+    fingerprint = None
+    async with get_governor().slot("asr", memory=estimate_asr_memory(model_size, audio_seconds)):
+        if use_cache and is_fingerprint_enabled():
+            fingerprint, match = await asyncio.to_thread(
+                _fingerprint_lookup, audio_file, model_size
+            )
+            record_cache("fingerprint", match is not None)
+            if match is not None:
+                segments = match.pop("segments")
+                log_success(
+                    f"命中音频指纹: {match['content_key'][:12]}（偏移 {match['offset']:.1f}s，"
+                    f"误码率 {match['bit_error_rate']:.3f}），共 {len(segments)} 个片段"
+                )
+                # 按转录实际使用的模型写入 ASR 缓存，不写到请求的模型的缓存键下
+                if match["model_size"] == model_size:
+                    _store_cached_result(cache_key, segments, match["language"])
+                elif match["model_size"] in MODEL_MAP:
+                    match_key = _asr_cache_key(audio_file, MODEL_MAP[match["model_size"]], vad)
+                    _store_cached_result(match_key, segments, match["language"])
+                return {
+                    "source": "whisper_asr",
+                    "segments": segments,
+                    "text": '\n'.join(seg["text"] for seg in segments),
+                    "language": match["language"],
+                    "duration": time.time() - start_time,
+                    "cached": True,
+                    **extra,
+                    "model_size": match["model_size"],
+                    "fingerprint_match": match,
+                }
 
-    segments = result.get("segments", [])
-    segment_list: List[Dict[str, Any]] = []
-    text_lines: List[str] = []
+        if show_progress:
+            log_step(f"加载 Whisper {model_size} 模型", "(mlx-whisper)")
+        if get_worker_count() > 0:
+            result = await get_asr_pool().transcribe(
+                audio_file, model_path, DECODE_OPTIONS, vad=vad
+            )
+            for name, seconds in result["timings"].items():
+                observe_stage(name, seconds, child_process=True)
+        else:
+            result = await asyncio.to_thread(_transcribe_in_process, audio_file, model_path, vad)
+    timings = result["timings"]
+    record_rtf(model_size, result["audio_seconds"], timings["asr_decode"], timings["model_load"])
 
-    for seg in segments:
-        segment_list.append({
-            "start": seg["start"],
-            "end": seg["end"],
-            "text": seg["text"].strip()
-        })
-        text_lines.append(seg["text"].strip())
+    elapsed = time.time() - start_time
+    segment_list: List[Dict[str, Any]] = result["segments"]
+    language = result.get("language", "zh")
+    if cache_key:
+        _store_cached_result(cache_key, segment_list, language)
+    if fingerprint is not None and audio_seconds:
+        await asyncio.to_thread(
+            _index_fingerprint,
+            audio_file, fingerprint, segment_list, language, model_size, audio_seconds,
+        )
 
     return {
         "source": "whisper_asr",
         "segments": segment_list,
-        "text": '\n'.join(text_lines),
-        "language": result.get("language", "zh"),
-        "duration": elapsed
+        "text": '\n'.join(seg["text"] for seg in segment_list),
+        "language": language,
+        "duration": elapsed,
+        **extra
     }
@@ -0,0 +1,432 @@
+"""
+ASR 工作进程 - 在独立进程中运行 Whisper，通过共享内存传递音频
+
+主进程解码音频后写入 multiprocessing.shared_memory，只把共享内存名称和采样数
+发给 worker；worker 直接在共享内存上构造 numpy 数组交给模型，结果经队列返回。
+
+每个 worker 在启动时把自己的 fd 1/2 重定向到独立的日志文件（verbose 模式下
+stdout 重定向到 stderr），模型输出不会写入主进程的 stdout —— 在 stdio MCP
+服务中 stdout 就是协议通道。
+"""
+
+import asyncio
+import atexit
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE, read_pcm16
+from .cache import get_cache_dir
+from .logging import is_verbose_log, log_debug, log_warning
+from .metrics import stage
+from .vad import apply_vad, remap_segments
+
+WORKERS_ENV = "VIDEO_CAPTIONS_ASR_WORKERS"
+DEFAULT_WORKERS = 1
+
+# worker 中调用的转录函数（"模块:函数"），签名同 mlx_whisper.transcribe
+DEFAULT_TRANSCRIBER = "mlx_whisper:transcribe"
+
+# 结果队列轮询间隔（秒），同时用于检测 worker 异常退出
+_POLL_INTERVAL = 0.5
+
+
+class ASRWorkerError(RuntimeError):
+    """worker 转录失败或异常退出"""
+
+
+def _redirect_output(verbose: bool, log_path: str) -> None:
+    """重定向 worker 进程的 stdout/stderr（fd 级别，覆盖 C 扩展输出）"""
+    if verbose:
+        os.dup2(2, 1)
+        return
+    fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    os.close(fd)
+
+
+def _resolve(path: str):
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """连接主进程创建的共享内存（由主进程负责释放）"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Python < 3.13 会在连接时登记共享内存，worker 退出时误删或报泄漏
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except (ImportError, AttributeError, KeyError):
+        pass
+    return shm
+
+
+def _worker_main(
+    index: int,
+    tasks: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+    transcriber: str,
+    verbose: bool,
+    log_path: str
+) -> None:
+    """worker 进程主循环"""
+    _redirect_output(verbose, log_path)
+    os.environ["TQDM_DISABLE"] = "1"
+
+    from .asr import _load_model
+
+    transcribe = _resolve(transcriber)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, shm_name, length, model_path, options = task
+        if shm_name is None:
+            # 预加载任务：只加载模型
+            try:
+                load_start = time.perf_counter()
+                _load_model(model_path)
+                timings = {"model_load": time.perf_counter() - load_start}
+                results.put((task_id, index, {"timings": timings}, None))
+            except Exception as e:
+                results.put((task_id, index, None, f"{type(e).__name__}: {e}"))
+            continue
+        try:
+            shm = _attach(shm_name)
+            try:
+                audio = np.ndarray((length,), dtype=np.float32, buffer=shm.buf)
+                load_start = time.perf_counter()
+                _load_model(model_path)
+                decode_start = time.perf_counter()
+                result = transcribe(audio, path_or_hf_repo=model_path, **options)
+                decode_end = time.perf_counter()
+                del audio
+            finally:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+
+            segments = [
+                {
+                    "start": float(seg["start"]),
+                    "end": float(seg["end"]),
+                    "text": seg["text"].strip(),
+                }
+                for seg in result.get("segments", [])
+            ]
+            results.put((task_id, index, {
+                "segments": segments,
+                "language": result.get("language", "zh"),
+                "audio_seconds": length / SAMPLE_RATE,
+                "timings": {
+                    "model_load": decode_start - load_start,
+                    "asr_decode": decode_end - decode_start,
+                },
+            }, None))
+        except Exception as e:
+            results.put((task_id, index, None, f"{type(e).__name__}: {e}"))
+
+
+def _empty_result(options: Dict[str, Any]) -> Dict[str, Any]:
+    """VAD 未检测到语音时的结果（不运行模型）"""
+    log_debug("VAD 未检测到语音，跳过 ASR")
+    return {
+        "segments": [],
+        "language": options.get("language", "zh"),
+        "audio_seconds": 0.0,
+        "timings": {"model_load": 0.0, "asr_decode": 0.0},
+    }
+
+
+class _Task:
+    def __init__(
+        self,
+        task_id: int,
+        payload: tuple,
+        shm: Optional[shared_memory.SharedMemory],
+        loop: asyncio.AbstractEventLoop,
+        future: asyncio.Future,
+        worker: Optional[int] = None
+    ):
+        self.task_id = task_id
+        self.payload = payload
+        self.shm = shm
+        self.loop = loop
+        self.future = future
+        # 指定执行的 worker（预加载任务），None 表示任意空闲 worker
+        self.worker = worker
+
+
+class ASRWorkerPool:
+    """ASR worker 进程池
+
+    每个 worker 有独立的任务队列，由主进程分派，因此始终知道每个任务在哪个
+    worker 上；worker 异常退出时对应任务立即失败并重启该 worker。
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, transcriber: str = DEFAULT_TRANSCRIBER):
+        self.size = max(1, workers)
+        self.transcriber = transcriber
+        # mlx/Metal 不支持 fork 后使用，统一使用 spawn
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * self.size
+        self._task_queues: List[Any] = [None] * self.size
+        self._results = None
+        self._idle: Deque[int] = deque()
+        self._running: Dict[int, _Task] = {}
+        self._pending: Deque[_Task] = deque()
+        self._next_id = 0
+        self._reader: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _spawn(self, index: int) -> None:
+        tasks = self._ctx.Queue()
+        log_path = os.path.join(get_cache_dir("logs"), f"asr-worker-{index}.log")
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, tasks, self._results, self.transcriber, is_verbose_log(), log_path),
+            name=f"video-captions-asr-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._task_queues[index] = tasks
+        self._idle.append(index)
+        log_debug(f"ASR worker {index} 已启动 (pid {process.pid})")
+
+    def start(self) -> None:
+        """启动所有 worker（首次转录时自动调用）"""
+        with self._lock:
+            if self._reader is not None:
+                return
+            self._results = self._ctx.Queue()
+            for index in range(self.size):
+                self._spawn(index)
+            self._reader = threading.Thread(
+                target=self._read_results, name="asr-results", daemon=True
+            )
+            self._reader.start()
+
+    def _dispatch(self) -> None:
+        """把等待中的任务分派给空闲 worker（调用方持有锁）"""
+        for task in list(self._pending):
+            if not self._idle:
+                return
+            if task.future.cancelled():
+                self._pending.remove(task)
+                self._release(task)
+                continue
+            if task.worker is None:
+                index = self._idle.popleft()
+            elif task.worker in self._idle:
+                index = task.worker
+                self._idle.remove(index)
+            else:
+                continue
+            self._pending.remove(task)
+            self._running[index] = task
+            self._task_queues[index].put(task.payload)
+
+    @staticmethod
+    def _release(task: _Task) -> None:
+        if task.shm is None:
+            return
+        task.shm.close()
+        try:
+            task.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _resolve(task: _Task, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        def settle() -> None:
+            if task.future.done():
+                return
+            if error is not None:
+                task.future.set_exception(ASRWorkerError(error))
+            else:
+                task.future.set_result(result)
+
+        try:
+            task.loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            # 调用方的事件循环已关闭
+            pass
+
+    def _check_workers(self) -> None:
+        """发现异常退出的 worker：使其任务失败并重启（调用方持有锁）"""
+        for index, process in enumerate(self._processes):
+            if process is None or process.is_alive():
+                continue
+            task = self._running.pop(index, None)
+            if index in self._idle:
+                self._idle.remove(index)
+            log_warning(f"ASR worker {index} 异常退出 (exitcode {process.exitcode})，正在重启")
+            if task is not None:
+                self._release(task)
+                self._resolve(task, None, f"ASR worker 异常退出 (exitcode {process.exitcode})")
+            self._spawn(index)
+
+    def _read_results(self) -> None:
+        while not self._closed:
+            try:
+                task_id, index, result, error = self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                with self._lock:
+                    if not self._closed:
+                        self._check_workers()
+                        self._dispatch()
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                task = self._running.pop(index, None)
+                self._idle.append(index)
+                if task is not None and task.task_id == task_id:
+                    self._release(task)
+                    self._resolve(task, result, error)
+                self._dispatch()
+
+    def _submit(self, samples: np.ndarray, model_path: str, options: Dict[str, Any],
+                loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> None:
+        """把 int16 PCM 转为 float32 写入共享内存并排队"""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, samples.size * 4))
+        audio = np.ndarray((samples.size,), dtype=np.float32, buffer=shm.buf)
+        np.multiply(samples, 1 / 32768.0, out=audio, casting="unsafe")
+        del audio
+
+        with self._lock:
+            if self._closed:
+                shm.close()
+                shm.unlink()
+                raise ASRWorkerError("ASR worker 池已关闭")
+            self._next_id += 1
+            payload = (self._next_id, shm.name, samples.size, model_path, options)
+            self._pending.append(_Task(self._next_id, payload, shm, loop, future))
+            self._dispatch()
+
+    async def transcribe(
+        self,
+        audio_file: str,
+        model_path: str,
+        options: Dict[str, Any],
+        vad: bool = False
+    ) -> Dict[str, Any]:
+        """在 worker 中转录音频文件
+
+        Args:
+            vad: 是否只把语音区间送入模型（时间戳映射回原始时间轴）
+
+        Returns:
+            {"segments": [{"start", "end", "text"}], "language": str, "audio_seconds": float,
+             "timings": {"model_load": float, "asr_decode": float}}
+
+        Raises:
+            ASRWorkerError: 转录失败或 worker 异常退出
+        """
+        self.start()
+        with stage("audio_decode"):
+            pcm = await asyncio.to_thread(read_pcm16, audio_file)
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        regions = None
+        if vad:
+            with stage("vad"):
+                samples, regions = await asyncio.to_thread(apply_vad, samples)
+            if regions == []:
+                return _empty_result(options)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await asyncio.to_thread(self._submit, samples, model_path, options, loop, future)
+        result = await future
+        result["segments"] = remap_segments(result["segments"], regions)
+        return result
+
+    async def preload(self, model_path: str) -> List[float]:
+        """在每个 worker 中预先加载模型（启动预热）
+
+        Returns:
+            各 worker 的模型加载耗时（秒）
+
+        Raises:
+            ASRWorkerError: 加载失败或 worker 异常退出
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = []
+        with self._lock:
+            if self._closed:
+                raise ASRWorkerError("ASR worker 池已关闭")
+            for index in range(self.size):
+                self._next_id += 1
+                future = loop.create_future()
+                payload = (self._next_id, None, 0, model_path, None)
+                task = _Task(self._next_id, payload, None, loop, future, worker=index)
+                self._pending.append(task)
+                futures.append(future)
+            self._dispatch()
+        results = await asyncio.gather(*futures)
+        return [result["timings"]["model_load"] for result in results]
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """停止所有 worker，未完成的任务以异常结束"""
+        with self._lock:
+            if self._closed or self._reader is None:
+                self._closed = True
+                return
+            self._closed = True
+            for tasks in self._task_queues:
+                if tasks is not None:
+                    tasks.put(None)
+            leftover: List[Tuple[_Task, str]] = [
+                (t, "ASR worker 池已关闭") for t in self._running.values()
+            ]
+            leftover += [(t, "ASR worker 池已关闭") for t in self._pending]
+            self._running.clear()
+            self._pending.clear()
+
+        for task, message in leftover:
+            self._release(task)
+            self._resolve(task, None, message)
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._reader.join(timeout)
+
+
+_pool: Optional[ASRWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_count() -> int:
+    """worker 数量，0 表示在主进程内转录"""
+    try:
+        return max(0, int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS)))
+    except ValueError:
+        return DEFAULT_WORKERS
+
+
+def get_asr_pool() -> ASRWorkerPool:
+    """获取全局 ASR worker 池（进程退出时自动关闭）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ASRWorkerPool(get_worker_count() or 1)
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -1,12 +1,20 @@
 """
-音频处理 - 从视频文件提取音频
+音频处理 - 从视频文件提取音频，解码为 ASR 使用的 PCM 采样
 """
 
 import os
 import subprocess
+import wave
 from typing import Optional
 
 from .logging import log_step
+from .metrics import stage
+from .profiler import child_process
+from .timerange import TimeRange
+
+
+# Whisper 输入：16kHz 单声道
+SAMPLE_RATE = 16000
 
 
 def is_video_file(file_path: str) -> bool:
@@ -24,7 +32,8 @@ def is_audio_file(file_path: str) -> bool:
 def extract_audio(
     video_file: str,
     output_dir: Optional[str] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    time_range: Optional[TimeRange] = None
 ) -> str:
     """从视频文件中提取音频
 
@@ -32,6 +41,7 @@ def extract_audio(
         video_file: 视频文件路径
         output_dir: 输出目录（默认与视频文件同目录）
         show_progress: 是否显示进度提示
+        time_range: 只提取该时间范围（ffmpeg 在输入端定位，不解码范围之前的内容）
 
     Returns:
         音频文件路径
@@ -43,6 +53,8 @@ def extract_audio(
         output_dir = os.path.dirname(video_file) or "."
 
     base_name = os.path.splitext(os.path.basename(video_file))[0]
+    if time_range is not None:
+        base_name = f"{base_name}.{time_range.label()}"
     audio_filename = os.path.join(output_dir, f"{base_name}.wav")
 
     # 如果音频已存在，直接返回
@@ -55,11 +67,18 @@ def extract_audio(
     if show_progress:
         log_step("正在提取音频")
 
-    result = subprocess.run(
-        ['ffmpeg', '-y', '-i', video_file, '-vn',
-         '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', audio_filename],
-        capture_output=True
-    )
+    seek = []
+    if time_range is not None:
+        seek = ['-ss', f"{time_range.start:.3f}"]
+        if time_range.end is not None:
+            seek += ['-t', f"{time_range.duration:.3f}"]
+
+    with stage("audio_extract"), child_process():
+        result = subprocess.run(
+            ['ffmpeg', '-y'] + seek + ['-i', video_file, '-vn',
+             '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', audio_filename],
+            capture_output=True
+        )
 
     if result.returncode != 0:
         # 检查视频文件是否存在
@@ -90,3 +109,53 @@ def extract_audio(
         )
 
     return audio_filename
+
+
+def get_audio_duration(audio_file: str) -> Optional[float]:
+    """获取音频时长（秒）：WAV 读取文件头，其他格式使用 ffprobe，失败返回 None"""
+    try:
+        with wave.open(audio_file, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, OSError, ZeroDivisionError):
+        pass
+
+    try:
+        with child_process():
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', audio_file],
+                capture_output=True, text=True
+            )
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_pcm16(audio_file: str) -> bytes:
+    """将音频解码为 16kHz 单声道 16bit 小端 PCM
+
+    已是 16kHz 单声道 16bit 的 WAV（extract_audio 的输出）直接读取，
+    其他格式通过 ffmpeg 管道解码。
+
+    Raises:
+        subprocess.CalledProcessError: ffmpeg 解码失败
+    """
+    try:
+        with wave.open(audio_file, "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        pass
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0', '-i', audio_file,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-',
+    ]
+    with child_process():
+        result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='ignore')
+        raise subprocess.CalledProcessError(
+            result.returncode, cmd, f"ffmpeg 解码音频失败: {stderr[-500:]}"
+        )
+    return result.stdout
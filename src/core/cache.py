@@ -0,0 +1,349 @@
+"""
+本地缓存 - 带索引、按字节上限 LRU 淘汰的磁盘缓存
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from filelock import FileLock
+
+from .logging import log_debug
+
+# 缓存根目录，可通过环境变量覆盖
+CACHE_DIR_ENV = "VIDEO_CAPTIONS_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "video-captions")
+
+# 音频缓存容量上限（MB），<= 0 表示禁用
+AUDIO_CACHE_SIZE_ENV = "VIDEO_CAPTIONS_AUDIO_CACHE_MB"
+DEFAULT_AUDIO_CACHE_MB = 2048
+
+# ASR 结果缓存容量上限（MB），<= 0 表示禁用
+ASR_CACHE_SIZE_ENV = "VIDEO_CAPTIONS_ASR_CACHE_MB"
+DEFAULT_ASR_CACHE_MB = 256
+
+# HTTP 响应缓存容量上限（MB），<= 0 表示禁用
+HTTP_CACHE_SIZE_ENV = "VIDEO_CAPTIONS_HTTP_CACHE_MB"
+DEFAULT_HTTP_CACHE_MB = 64
+
+# 视频元信息缓存容量上限（MB），<= 0 表示禁用
+METADATA_CACHE_SIZE_ENV = "VIDEO_CAPTIONS_METADATA_CACHE_MB"
+DEFAULT_METADATA_CACHE_MB = 16
+
+# 内容指纹采样参数
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+FINGERPRINT_SAMPLES = 16
+
+_INDEX_FILE = "index.json"
+
+
+def get_cache_dir(*parts: str) -> str:
+    """获取缓存目录（不存在时自动创建）
+
+    Args:
+        parts: 子目录
+
+    Returns:
+        缓存目录路径
+    """
+    base = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """原子写入文件：先写同目录临时文件，再 rename 覆盖"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def fingerprint_file(
+    path: str,
+    block_size: int = FINGERPRINT_BLOCK_SIZE,
+    samples: int = FINGERPRINT_SAMPLES
+) -> str:
+    """计算文件的快速内容指纹
+
+    对文件大小和均匀分布的若干采样块（含首尾块）做哈希，
+    无需读取整个文件；内容相同的文件无论路径如何，指纹都相同。
+
+    Args:
+        path: 文件路径
+        block_size: 采样块大小（字节）
+        samples: 采样块数量
+
+    Returns:
+        十六进制指纹字符串
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode("ascii"))
+
+    with open(path, "rb") as f:
+        if size <= block_size * samples:
+            digest.update(f.read())
+        else:
+            step = (size - block_size) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+
+    return digest.hexdigest()
+
+
+def _env_megabytes(name: str, default: float) -> int:
+    """读取以 MB 为单位的环境变量，返回字节数"""
+    try:
+        value = float(os.environ.get(name, default))
+    except ValueError:
+        value = default
+    return int(value * 1024 * 1024)
+
+
+class DiskCache:
+    """带索引的磁盘缓存
+
+    - 每个条目对应缓存目录下的一个文件，索引记录大小、最近访问时间和元信息
+    - 总大小超过 max_bytes 时按最近最少使用（LRU）淘汰
+    - 文件和索引均原子写入，索引读写通过文件锁保证跨进程安全
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def directory(self) -> str:
+        return get_cache_dir(self.name)
+
+    def _lock(self) -> FileLock:
+        return FileLock(os.path.join(self.directory, _INDEX_FILE + ".lock"))
+
+    def _load_index(self) -> Dict[str, Any]:
+        index_path = os.path.join(self.directory, _INDEX_FILE)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if isinstance(index.get("entries"), dict):
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"entries": {}}
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        data = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        atomic_write(os.path.join(self.directory, _INDEX_FILE), data)
+
+    def _file_name(self, key: str, suffix: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:40] + suffix
+
+    def _remove_entry(self, index: Dict[str, Any], key: str) -> None:
+        entry = index["entries"].pop(key, None)
+        if entry:
+            path = os.path.join(self.directory, entry["file"])
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _evict(self, index: Dict[str, Any]) -> None:
+        entries = index["entries"]
+        total = sum(entry.get("size", 0) for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k].get("atime", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key].get("size", 0)
+            log_debug(f"缓存淘汰 [{self.name}]: {key}")
+            self._remove_entry(index, key)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存条目并刷新访问时间
+
+        Returns:
+            {"path": 文件路径, "size": 字节数, "meta": 元信息}，未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock():
+            index = self._load_index()
+            entry = index["entries"].get(key)
+            if not entry:
+                return None
+
+            path = os.path.join(self.directory, entry["file"])
+            if not os.path.exists(path):
+                # 文件被外部删除，清理索引
+                index["entries"].pop(key, None)
+                self._save_index(index)
+                return None
+
+            entry["atime"] = time.time()
+            self._save_index(index)
+            return {"path": path, "size": entry.get("size", 0), "meta": entry.get("meta", {})}
+
+    def put_file(
+        self,
+        key: str,
+        src_path: str,
+        suffix: str = "",
+        meta: Optional[Dict[str, Any]] = None,
+        move: bool = False
+    ) -> str:
+        """将文件存入缓存
+
+        Args:
+            key: 缓存键
+            src_path: 源文件路径
+            suffix: 缓存文件后缀
+            meta: 附加元信息（需可 JSON 序列化）
+            move: 是否移动源文件（否则复制）
+
+        Returns:
+            缓存文件路径；缓存禁用或文件超过容量上限时返回源文件路径
+        """
+        size = os.path.getsize(src_path)
+        if not self.enabled or size > self.max_bytes:
+            return src_path
+
+        # 先在缓存目录内准备临时文件，保证最终 rename 是原子的
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(fd)
+        try:
+            if move:
+                shutil.move(src_path, tmp_path)
+            else:
+                shutil.copyfile(src_path, tmp_path)
+
+            file_name = self._file_name(key, suffix)
+            path = os.path.join(self.directory, file_name)
+            with self._lock():
+                index = self._load_index()
+                self._remove_entry(index, key)
+                os.replace(tmp_path, path)
+                index["entries"][key] = {
+                    "file": file_name,
+                    "size": size,
+                    "atime": time.time(),
+                    "meta": meta or {},
+                }
+                self._evict(index)
+                self._save_index(index)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        return path
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """读取缓存内容，未命中返回 None"""
+        entry = self.lookup(key)
+        if not entry:
+            return None
+        try:
+            with open(entry["path"], "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_bytes(
+        self,
+        key: str,
+        data: bytes,
+        suffix: str = "",
+        meta: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """将内容存入缓存"""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+
+        file_name = self._file_name(key, suffix)
+        with self._lock():
+            index = self._load_index()
+            self._remove_entry(index, key)
+            atomic_write(os.path.join(self.directory, file_name), data)
+            index["entries"][key] = {
+                "file": file_name,
+                "size": len(data),
+                "atime": time.time(),
+                "meta": meta or {},
+            }
+            self._evict(index)
+            self._save_index(index)
+
+    def delete(self, key: str) -> None:
+        """删除缓存条目"""
+        with self._lock():
+            index = self._load_index()
+            if key in index["entries"]:
+                self._remove_entry(index, key)
+                self._save_index(index)
+
+    def total_size(self) -> int:
+        """当前缓存总字节数"""
+        with self._lock():
+            index = self._load_index()
+        return sum(entry.get("size", 0) for entry in index["entries"].values())
+
+
+_audio_cache: Optional[DiskCache] = None
+
+
+def get_audio_cache() -> DiskCache:
+    """获取音频缓存（16kHz 单声道 WAV，按视频 ID 索引）"""
+    global _audio_cache
+    if _audio_cache is None:
+        _audio_cache = DiskCache(
+            "audio", _env_megabytes(AUDIO_CACHE_SIZE_ENV, DEFAULT_AUDIO_CACHE_MB)
+        )
+    return _audio_cache
+
+
+_asr_cache: Optional[DiskCache] = None
+
+
+def get_asr_cache() -> DiskCache:
+    """获取 ASR 结果缓存（按音频内容指纹 + 解码参数索引）"""
+    global _asr_cache
+    if _asr_cache is None:
+        _asr_cache = DiskCache("asr", _env_megabytes(ASR_CACHE_SIZE_ENV, DEFAULT_ASR_CACHE_MB))
+    return _asr_cache
+
+
+_http_cache: Optional[DiskCache] = None
+
+
+def get_http_cache() -> DiskCache:
+    """获取 HTTP 响应缓存（响应体 + ETag/Last-Modified，用于条件请求）"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = DiskCache("http", _env_megabytes(HTTP_CACHE_SIZE_ENV, DEFAULT_HTTP_CACHE_MB))
+    return _http_cache
+
+
+_metadata_cache: Optional[DiskCache] = None
+
+
+def get_metadata_cache() -> DiskCache:
+    """获取视频元信息缓存（get_info 结果与"无字幕"记录，按视频 ID 索引）"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = DiskCache(
+            "metadata", _env_megabytes(METADATA_CACHE_SIZE_ENV, DEFAULT_METADATA_CACHE_MB)
+        )
+    return _metadata_cache
@@ -0,0 +1,203 @@
+"""
+紧凑文本 - 面向 LLM 的字幕压缩：合并段落、稀疏时间戳、去除幻觉行、按预算均匀采样
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .text import convert_to_simplified
+
+# 段落合并：片段间隔超过该值（秒）或段落超过该长度（字符）时另起一段
+PARAGRAPH_GAP = 2.0
+PARAGRAPH_CHARS = 300
+# 段落达到该长度后，遇到句末标点即结束
+PARAGRAPH_MIN_CHARS = 120
+
+DEFAULT_TIMESTAMP_INTERVAL = 60
+DEFAULT_MAX_CHARS = 50000
+
+SAMPLE_GAP_MARKER = "……"
+
+# Whisper 在静音/音乐段常见的幻觉文本（归一化后比较）
+HALLUCINATION_PHRASES = {
+    "请不吝点赞订阅转发打赏支持明镜与点点栏目",
+    "明镜与点点栏目",
+    "字幕由amaraorg社区提供",
+    "中文字幕志愿者李宗盛",
+    "谢谢观看",
+    "感谢观看",
+    "谢谢大家",
+    "thanksforwatching",
+    "thankyouforwatching",
+    "pleasesubscribe",
+}
+
+_SENTENCE_END = "。！？!?…"
+_CJK_PUNCTUATION = "。，、；：！？…）》」』"
+_NORMALIZE_RE = re.compile(r"[\W_]+", re.UNICODE)
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+@dataclass
+class CompactOptions:
+    """紧凑格式选项
+
+    Attributes:
+        max_tokens: 估算 token 预算（优先于 max_chars）
+        max_chars: 字符预算
+        timestamp_interval: 时间戳最小间隔（秒），0 表示不输出时间戳
+    """
+    max_tokens: Optional[int] = None
+    max_chars: Optional[int] = None
+    timestamp_interval: int = DEFAULT_TIMESTAMP_INTERVAL
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 token/字，其他文本约 4 字符/token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _normalize(text: str) -> str:
+    return _NORMALIZE_RE.sub("", text).lower()
+
+
+def _join(left: str, right: str) -> str:
+    """拼接两段文本：前一段以中文标点结尾时直接连接，否则以空格分隔（保留断句信息）"""
+    if not left:
+        return right
+    if left[-1] in _CJK_PUNCTUATION:
+        return left + right
+    return f"{left} {right}"
+
+
+def drop_hallucinations(segments: List[Dict[str, Any]], asr: bool) -> List[Dict[str, Any]]:
+    """去除连续重复的行；ASR 结果额外去除已知的 Whisper 幻觉文本"""
+    kept = []
+    previous = None
+    for seg in segments:
+        text = seg.get("content", seg.get("text", "")).strip()
+        key = _normalize(text)
+        if not key or key == previous:
+            continue
+        if asr and key in HALLUCINATION_PHRASES:
+            continue
+        previous = key
+        kept.append({"start": seg["start"], "end": seg["end"], "content": text})
+    return kept
+
+
+def merge_paragraphs(segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按停顿、句末标点和长度将片段合并为段落"""
+    paragraphs: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for seg in segments:
+        if current is not None:
+            text = current["content"]
+            if (seg["start"] - current["end"] > PARAGRAPH_GAP
+                    or len(text) >= PARAGRAPH_CHARS
+                    or (len(text) >= PARAGRAPH_MIN_CHARS and text[-1] in _SENTENCE_END)):
+                paragraphs.append(current)
+                current = None
+        if current is None:
+            current = dict(seg)
+        else:
+            current["content"] = _join(current["content"], seg["content"])
+            current["end"] = seg["end"]
+    if current is not None:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def _timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"[{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}]"
+    return f"[{seconds // 60:02}:{seconds % 60:02}]"
+
+
+def _render(paragraphs: List[Dict[str, Any]], indices: List[int], interval: int) -> str:
+    """渲染选中的段落；跳过的部分用省略标记表示，其后的段落强制带时间戳"""
+    lines = []
+    last_stamp: Optional[float] = None
+    previous = -1
+    for index in indices:
+        paragraph = paragraphs[index]
+        skipped = index != previous + 1
+        if skipped and previous >= 0:
+            lines.append(SAMPLE_GAP_MARKER)
+        due = last_stamp is None or skipped or paragraph["start"] - last_stamp >= interval
+        if interval > 0 and due:
+            lines.append(f"{_timestamp(paragraph['start'])} {paragraph['content']}")
+            last_stamp = paragraph["start"]
+        else:
+            lines.append(paragraph["content"])
+        previous = index
+    if indices and indices[-1] != len(paragraphs) - 1:
+        lines.append(SAMPLE_GAP_MARKER)
+    return "\n".join(lines)
+
+
+def _evenly_spaced(total: int, count: int) -> List[int]:
+    return [int((i + 0.5) * total / count) for i in range(count)]
+
+
+def build_compact(
+    segments: List[Dict[str, Any]],
+    options: Optional[CompactOptions] = None,
+    asr: bool = False
+) -> Dict[str, Any]:
+    """生成紧凑文本
+
+    超出预算时按时间轴均匀抽取段落（而不是截掉结尾），跳过处以省略标记表示。
+
+    Returns:
+        {"content": str, "paragraph_count": int, "estimated_tokens": int, "sampled": bool}
+    """
+    options = options or CompactOptions()
+
+    # 先整体做一次繁简转换（OpenCC 初始化开销较大，不逐条调用）
+    texts = [seg.get("content", seg.get("text", "")).replace("\n", " ") for seg in segments]
+    converted = convert_to_simplified("\n".join(texts)).split("\n") if texts else []
+    if len(converted) != len(texts):
+        converted = texts
+    segments = [
+        {"start": seg["start"], "end": seg["end"], "content": text}
+        for seg, text in zip(segments, converted)
+    ]
+    paragraphs = merge_paragraphs(drop_hallucinations(segments, asr))
+
+    if options.max_tokens:
+        measure, budget = estimate_tokens, options.max_tokens
+    else:
+        measure, budget = len, options.max_chars or DEFAULT_MAX_CHARS
+
+    interval = options.timestamp_interval
+    content = _render(paragraphs, list(range(len(paragraphs))), interval)
+    sampled = False
+
+    if measure(content) > budget and paragraphs:
+        sampled = True
+        # 二分查找能放入预算的最多段落数
+        low, high = 1, len(paragraphs) - 1
+        best = _render(paragraphs, _evenly_spaced(len(paragraphs), 1), interval)
+        while low <= high:
+            count = (low + high) // 2
+            candidate = _render(paragraphs, _evenly_spaced(len(paragraphs), count), interval)
+            if measure(candidate) <= budget:
+                best, low = candidate, count + 1
+            else:
+                high = count - 1
+        content = best
+        # 单个段落仍超出预算时按比例截断
+        if measure(content) > budget:
+            content = content[:max(1, len(content) * budget // measure(content))]
+
+    return {
+        "content": content,
+        "paragraph_count": len(paragraphs),
+        "estimated_tokens": estimate_tokens(content),
+        "sampled": sampled,
+    }
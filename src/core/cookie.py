@@ -3,13 +3,20 @@ Cookie 读取 - 从浏览器读取 B站 SESSDATA
 """
 
 import os
-from typing import Optional
+import time
+from typing import Dict, Optional, Tuple
 
 from .logging import log_step, log_success, log_warning, log_debug
 
+# 读取到的 SESSDATA 在进程内复用的秒数（浏览器 Cookie 需要解密，读取较慢；
+# MCP 服务器每个请求新建服务实例，启动预热读取一次后后续请求直接复用）
+SESSDATA_TTL = 600
+
+_sessdata_cache: Dict[Optional[str], Tuple[float, str]] = {}
+
 
 def get_sessdata(browser: Optional[str] = "auto") -> Optional[str]:
-    """获取 SESSDATA，按优先级从浏览器、环境变量读取
+    """获取 SESSDATA，按优先级从浏览器、环境变量读取（结果在进程内缓存 SESSDATA_TTL 秒）
 
     Args:
         browser: 浏览器类型 ("auto", "chrome", "edge", "firefox", "brave")
@@ -17,7 +24,12 @@ def get_sessdata(browser: Optional[str] = "auto") -> Optional[str]:
     Returns:
         SESSDATA 字符串，未找到返回 None
     """
+    cached = _sessdata_cache.get(browser)
+    if cached and time.monotonic() - cached[0] < SESSDATA_TTL:
+        return cached[1]
     result, _ = get_sessdata_with_source(browser, log=False)
+    if result:
+        _sessdata_cache[browser] = (time.monotonic(), result)
     return result
 
 
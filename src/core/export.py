@@ -0,0 +1,143 @@
+"""
+多格式导出 - 一次获取的字幕片段渲染为多种格式，原子写入输出目录
+
+文件名由视频标题经 make_safe_filename 清理后加视频 ID 和格式扩展名构成，如
+"直播回放 [BV1xx].srt"（同一视频每次导出的文件名相同，重复导出直接覆盖；同名的
+不同视频互不覆盖）；标题清理后为空时只用视频 ID。
+
+MCP 客户端指定的输出目录限制在 VIDEO_CAPTIONS_EXPORT_DIR（默认缓存目录下的 exports）
+之内，见 resolve_export_dir()。
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import atomic_write, get_cache_dir
+from .compact import CompactOptions
+from .formatter import ResponseFormat, format_subtitle
+from .text import make_safe_filename
+
+# 各格式的文件扩展名（新增 ResponseFormat 时在这里登记）
+FORMAT_EXTENSIONS: Dict[ResponseFormat, str] = {
+    ResponseFormat.TEXT: ".txt",
+    ResponseFormat.SRT: ".srt",
+    ResponseFormat.JSON: ".json",
+    ResponseFormat.COMPACT: ".compact.txt",
+}
+
+DEFAULT_EXPORT_FORMATS = (ResponseFormat.TEXT, ResponseFormat.SRT, ResponseFormat.JSON)
+
+# 文件名主体的最大长度（字符），避免超出文件系统的文件名长度限制
+MAX_STEM_CHARS = 120
+
+# 远程调用方（MCP）可写入的导出根目录
+EXPORT_DIR_ENV = "VIDEO_CAPTIONS_EXPORT_DIR"
+
+
+@dataclass
+class ExportOptions:
+    """多格式导出选项
+
+    Attributes:
+        output_dir: 输出目录（不存在时创建）
+        formats: 导出的格式
+        filename: 文件名主体（不含扩展名），默认取自视频标题
+    """
+    output_dir: str
+    formats: Tuple[ResponseFormat, ...] = DEFAULT_EXPORT_FORMATS
+    filename: Optional[str] = None
+
+
+def parse_formats(value: str) -> Tuple[ResponseFormat, ...]:
+    """解析逗号分隔的格式列表（去重并保持顺序）
+
+    Raises:
+        ValueError: 包含不支持的格式
+    """
+    formats: List[ResponseFormat] = []
+    for name in value.split(","):
+        name = name.strip()
+        if name and ResponseFormat(name) not in formats:
+            formats.append(ResponseFormat(name))
+    if not formats:
+        raise ValueError("未指定导出格式")
+    return tuple(formats)
+
+
+def export_filename(video_title: str, video_id: Optional[str] = None) -> str:
+    """导出文件名主体（不含扩展名）：标题 + " [视频ID]"，ID 与标题相同（本地文件）时省略"""
+    stem = make_safe_filename(video_title or "").strip().strip(".")[:MAX_STEM_CHARS].strip()
+    safe_id = make_safe_filename(video_id or "").strip()
+    if not stem:
+        return safe_id or "subtitle"
+    if safe_id and safe_id != stem:
+        return f"{stem} [{safe_id}]"
+    return stem
+
+
+def get_export_root() -> str:
+    """远程调用方可写入的导出根目录"""
+    root = os.environ.get(EXPORT_DIR_ENV)
+    if root:
+        return os.path.realpath(os.path.expanduser(root))
+    return os.path.realpath(get_cache_dir("exports"))
+
+
+def resolve_export_dir(output_dir: str) -> str:
+    """把调用方指定的输出目录解析到导出根目录之内（相对路径相对根目录）
+
+    Raises:
+        ValueError: 解析后（含符号链接）位于根目录之外
+    """
+    root = get_export_root()
+    path = os.path.realpath(os.path.join(root, os.path.expanduser(output_dir)))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"输出目录必须位于 {root} 之内（{EXPORT_DIR_ENV}）: {output_dir}")
+    return path
+
+
+def export_subtitles(
+    segments: List[Dict[str, Any]],
+    video_title: str,
+    options: ExportOptions,
+    source: str = "api",
+    language: Optional[str] = None,
+    compact: Optional[CompactOptions] = None,
+    video_id: Optional[str] = None,
+    suffix: str = ""
+) -> Dict[str, str]:
+    """把同一组字幕片段渲染为 options.formats 中的每种格式并写入输出目录
+
+    Args:
+        segments: 字幕片段列表 [{"start": 0.0, "end": 1.0, "content/text": "..."}]
+        video_title: 视频标题（决定文件名）
+        options: 导出选项
+        source: 来源标识 (bilibili_api/youtube_api/whisper_asr)
+        language: 语言代码（可选）
+        compact: compact 格式的预算与时间戳选项（可选）
+        video_id: 标题不可用作文件名时使用的视频 ID
+        suffix: 文件名主体后附加的标识（如时间范围 ".10m00s-15m00s"）
+
+    Returns:
+        {"text": "/out/标题.txt", "srt": "/out/标题.srt", ...}
+
+    Raises:
+        OSError: 创建目录或写入文件失败
+    """
+    os.makedirs(options.output_dir, exist_ok=True)
+    stem = (options.filename or export_filename(video_title, video_id)) + suffix
+    written = {}
+    for fmt in options.formats:
+        result = format_subtitle(
+            segments, video_title, fmt, source=source, language=language, compact=compact
+        )
+        if fmt == ResponseFormat.JSON:
+            data = json.dumps(result, ensure_ascii=False, indent=2)
+        else:
+            data = result["content"]
+        path = os.path.join(options.output_dir, stem + FORMAT_EXTENSIONS[fmt])
+        atomic_write(path, data.encode("utf-8"))
+        written[fmt.value] = path
+    return written
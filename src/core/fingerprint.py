@@ -0,0 +1,383 @@
+"""
+音频指纹 - 识别重复上传、镜像和本地录制的相同内容，复用已有转录
+
+同一段内容经常以 B站转载、YouTube 搬运和本地录音等形式出现，文件内容各不相同，
+ASR 缓存（按文件内容哈希）无法命中，每份都要重新跑一次 Whisper。
+
+指纹按 Haitsma-Kalker 方法从 16kHz PCM 计算：降采样到 8kHz，每 32ms 取一帧
+（256ms 汉宁窗），在 300-2000Hz 内划分 33 个对数频带，相邻频带能量差在时间上的
+变化符号构成 32 位子指纹。重新编码、音量变化和轻微噪声只翻转少量位。
+
+索引保存在 ~/.cache/video-captions/fingerprints.db（SQLite）：
+- audio 表保存每份音频的完整指纹和转录结果
+- hashes 表保存每 4 帧一个子指纹（锚点）及其位置，用于查找候选
+
+查找时在几个帧网格平移量下计算查询窗口的子指纹去命中锚点，按 (音频, 帧偏移, 平移量)
+投票选出候选，再在对齐后的重叠区间上计算误码率（BER）确认；命中后把候选的转录
+按偏移平移到查询音频的时间轴。
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .cache import get_cache_dir
+from .logging import log_debug
+
+FINGERPRINT_ENV = "VIDEO_CAPTIONS_FINGERPRINT"
+
+# 输入采样率与降采样后的分析参数
+INPUT_RATE = 16000
+ANALYSIS_RATE = 8000
+FRAME_SIZE = 2048          # 256ms
+HOP_SIZE = 256             # 32ms
+HOP_SECONDS = HOP_SIZE / ANALYSIS_RATE
+BAND_COUNT = 33
+BAND_MIN_HZ = 300.0
+BAND_MAX_HZ = 2000.0
+
+# 每次 FFT 处理的帧数（控制内存占用）
+_CHUNK_FRAMES = 2048
+
+# 索引中每隔多少帧保存一个锚点
+ANCHOR_STEP = 4
+# 查找时使用的查询窗口：最多取 4 段、每段约 30 秒
+LOOKUP_WINDOWS = 4
+LOOKUP_WINDOW_FRAMES = int(30 / HOP_SECONDS)
+# 查询时帧网格的平移量（8kHz 采样数，一帧之内均匀取 4 个）
+LOOKUP_SHIFTS = (0, 64, 128, 192)
+# 候选所需的最少投票数、最多验证的候选数
+MIN_VOTES = 5
+MAX_CANDIDATES = 5
+# 判定为同一内容的阈值：误码率上限、查询音频被候选覆盖的最小比例
+MAX_BIT_ERROR_RATE = 0.25
+MIN_COVERAGE = 0.95
+# 短于该时长的音频不做指纹匹配（区分度不足）
+MIN_SECONDS = 10.0
+
+# 索引最多保留的音频数，超出时淘汰最早写入的
+MAX_ENTRIES = 5000
+
+# 静音等退化帧
+_DEGENERATE = (0, 0xFFFFFFFF)
+
+_DB_FILE = "fingerprints.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio (
+    id INTEGER PRIMARY KEY,
+    content_key TEXT NOT NULL UNIQUE,
+    duration REAL,
+    model_size TEXT,
+    language TEXT,
+    fingerprint BLOB,
+    segments BLOB,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    audio_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+CREATE INDEX IF NOT EXISTS hashes_audio ON hashes (audio_id);
+"""
+
+# 模型精度从高到低（与 model_select.MODEL_SIZES 一致）
+_MODEL_RANK = {"large": 0, "medium": 1, "small": 2, "base": 3}
+
+
+def model_covers(available: str, requested: str) -> bool:
+    """available 模型的转录精度不低于 requested（未知模型视为不满足）"""
+    return _MODEL_RANK.get(available, 99) <= _MODEL_RANK.get(requested, 0)
+
+
+def is_fingerprint_enabled() -> bool:
+    """是否启用指纹去重（VIDEO_CAPTIONS_FINGERPRINT=0 时禁用）"""
+    return os.environ.get(FINGERPRINT_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _band_edges() -> np.ndarray:
+    """各频带在 FFT 频点上的边界"""
+    edges_hz = np.geomspace(BAND_MIN_HZ, BAND_MAX_HZ, BAND_COUNT + 1)
+    return np.round(edges_hz * FRAME_SIZE / ANALYSIS_RATE).astype(np.int64)
+
+
+def compute_fingerprint(samples: np.ndarray, shift: int = 0) -> np.ndarray:
+    """计算音频指纹
+
+    Args:
+        samples: 16kHz 单声道 int16 PCM 采样
+        shift: 分帧起点向后平移的采样数（8kHz），用于查找时对齐帧网格
+
+    Returns:
+        uint32 数组，每个元素是一帧（32ms）的子指纹
+    """
+    audio = samples.astype(np.float32)
+    # 两点平均降采样到 8kHz（同时起到简单的低通作用）
+    audio = (audio[0:len(audio) // 2 * 2:2] + audio[1:len(audio) // 2 * 2:2]) * 0.5
+    audio = audio[shift:]
+    if len(audio) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    edges = _band_edges()
+
+    energies = np.empty((len(frames), BAND_COUNT), dtype=np.float64)
+    for start in range(0, len(frames), _CHUNK_FRAMES):
+        chunk = frames[start:start + _CHUNK_FRAMES] * window
+        power = np.abs(np.fft.rfft(chunk, axis=1)) ** 2
+        cumulative = np.concatenate([np.zeros((len(power), 1)), np.cumsum(power, axis=1)], axis=1)
+        energies[start:start + len(chunk)] = cumulative[:, edges[1:]] - cumulative[:, edges[:-1]]
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = np.left_shift(np.uint64(1), np.arange(BAND_COUNT - 1, dtype=np.uint64))
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray) -> float:
+    """两段等长指纹的误码率"""
+    if len(a) == 0:
+        return 1.0
+    diff = np.bitwise_xor(a, b).view(np.uint8)
+    return float(np.unpackbits(diff).sum()) / (len(a) * 32)
+
+
+def align_segments(
+    segments: List[Dict[str, Any]],
+    offset: float,
+    duration: float
+) -> List[Dict[str, Any]]:
+    """把候选音频的转录平移到查询音频的时间轴
+
+    Args:
+        segments: 候选音频的转录片段
+        offset: 查询音频起点在候选音频中的位置（秒）
+        duration: 查询音频时长（秒）
+
+    Returns:
+        落在 [0, duration] 内的片段（超出部分截断）
+    """
+    aligned = []
+    for seg in segments:
+        start = seg["start"] - offset
+        end = seg["end"] - offset
+        if end <= 0 or start >= duration:
+            continue
+        aligned.append({
+            **seg,
+            "start": round(max(0.0, start), 3),
+            "end": round(min(duration, end), 3),
+        })
+    return aligned
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(get_cache_dir(), _DB_FILE), timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def index_fingerprint(
+    content_key: str,
+    fingerprint: np.ndarray,
+    segments: List[Dict[str, Any]],
+    language: str,
+    model_size: str,
+    duration: float
+) -> bool:
+    """写入一份音频的指纹和转录
+
+    同一内容已有更高精度模型的转录时不覆盖。
+
+    Returns:
+        是否写入
+    """
+    if duration < MIN_SECONDS or len(fingerprint) == 0:
+        return False
+    positions = np.arange(0, len(fingerprint), ANCHOR_STEP)
+    anchors = [
+        (int(fingerprint[pos]), int(pos)) for pos in positions
+        if int(fingerprint[pos]) not in _DEGENERATE
+    ]
+    payload = gzip.compress(json.dumps(segments, ensure_ascii=False).encode("utf-8"))
+
+    conn = _connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT id, model_size FROM audio WHERE content_key = ?", (content_key,)
+            ).fetchone()
+            if row is not None:
+                if _MODEL_RANK.get(row["model_size"], 99) < _MODEL_RANK.get(model_size, 99):
+                    return False
+                conn.execute("DELETE FROM hashes WHERE audio_id = ?", (row["id"],))
+                conn.execute("DELETE FROM audio WHERE id = ?", (row["id"],))
+            audio_id = conn.execute(
+                "INSERT INTO audio (content_key, duration, model_size, language, fingerprint, "
+                "segments, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_key, duration, model_size, language, fingerprint.astype("<u4").tobytes(),
+                 payload, time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO hashes (hash, audio_id, pos) VALUES (?, ?, ?)",
+                [(value, audio_id, pos) for value, pos in anchors],
+            )
+            _prune(conn)
+    finally:
+        conn.close()
+    log_debug(f"已写入音频指纹: {content_key}（{len(anchors)} 个锚点）")
+    return True
+
+
+def _prune(conn: sqlite3.Connection) -> None:
+    """超出 MAX_ENTRIES 时淘汰最早写入的音频"""
+    count = conn.execute("SELECT COUNT(*) FROM audio").fetchone()[0]
+    if count <= MAX_ENTRIES:
+        return
+    stale = [
+        row["id"] for row in conn.execute(
+            "SELECT id FROM audio ORDER BY indexed_at LIMIT ?", (count - MAX_ENTRIES,)
+        )
+    ]
+    conn.executemany("DELETE FROM hashes WHERE audio_id = ?", [(i,) for i in stale])
+    conn.executemany("DELETE FROM audio WHERE id = ?", [(i,) for i in stale])
+
+
+def _lookup_windows(frames: int) -> List[tuple]:
+    """查询使用的帧区间 [start, end)：短音频整段使用，长音频均匀取几段窗口"""
+    if frames <= LOOKUP_WINDOWS * LOOKUP_WINDOW_FRAMES:
+        return [(0, frames)]
+    starts = np.linspace(0, frames - LOOKUP_WINDOW_FRAMES, LOOKUP_WINDOWS).astype(np.int64)
+    return [(int(s), int(s) + LOOKUP_WINDOW_FRAMES) for s in starts]
+
+
+def _query_hashes(samples: np.ndarray, fingerprint: np.ndarray) -> Dict[tuple, List[int]]:
+    """查询窗口在各个帧网格平移下的子指纹 → 帧位置
+
+    查询音频与索引音频的帧网格一般不对齐，错开半帧时误码率明显升高、锚点很难精确命中；
+    在一帧之内取几个平移量分别计算，总有一个接近对齐。
+    """
+    query: Dict[tuple, List[int]] = {}
+    for start, end in _lookup_windows(len(fingerprint)):
+        for shift in LOOKUP_SHIFTS:
+            if shift == 0:
+                values = fingerprint[start:end]
+            else:
+                # 窗口对应的 16kHz 采样区间（多取一帧供平移）
+                region_end = (end - 1) * HOP_SIZE + FRAME_SIZE + HOP_SIZE
+                region = samples[start * HOP_SIZE * 2:region_end * 2]
+                values = compute_fingerprint(region, shift)[:end - start]
+            for i, value in enumerate(values.tolist()):
+                if value not in _DEGENERATE:
+                    query.setdefault((value, shift), []).append(start + i)
+    return query
+
+
+def find_match(
+    samples: np.ndarray,
+    model_size: str = "base",
+    fingerprint: Optional[np.ndarray] = None
+) -> Optional[Dict[str, Any]]:
+    """查找同一内容的已有转录
+
+    Args:
+        samples: 查询音频的 16kHz 单声道 int16 PCM 采样
+        model_size: 需要的模型精度，只复用相同或更高精度模型的转录
+        fingerprint: 已计算好的查询指纹（compute_fingerprint(samples)），省略时在这里计算
+
+    Returns:
+        {
+            "content_key": "...",
+            "offset": 12.3,       # 查询音频起点在候选音频中的位置（秒）
+            "bit_error_rate": 0.08,
+            "coverage": 1.0,
+            "model_size": "large",
+            "language": "zh",
+            "segments": [...]     # 已对齐到查询音频时间轴
+        }
+        未找到时返回 None
+    """
+    duration = len(samples) / INPUT_RATE
+    if duration < MIN_SECONDS:
+        return None
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(samples)
+    query = _query_hashes(samples, fingerprint)
+    if not query:
+        return None
+
+    by_value: Dict[int, List[tuple]] = {}
+    for value, shift in query:
+        by_value.setdefault(value, []).append((value, shift))
+
+    conn = _connect()
+    try:
+        votes: Dict[tuple, int] = {}
+        values = list(by_value)
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            rows = conn.execute(
+                "SELECT hash, audio_id, pos FROM hashes "
+                f"WHERE hash IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for value, audio_id, pos in rows:
+                for key in by_value[value]:
+                    for query_pos in query[key]:
+                        vote = (audio_id, pos - query_pos, key[1])
+                        votes[vote] = votes.get(vote, 0) + 1
+
+        candidates = sorted(
+            (item for item in votes.items() if item[1] >= MIN_VOTES),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:MAX_CANDIDATES]
+        shifted = {0: fingerprint}
+        for (audio_id, offset, shift), _ in candidates:
+            row = conn.execute("SELECT * FROM audio WHERE id = ?", (audio_id,)).fetchone()
+            if row is None or not model_covers(row["model_size"], model_size):
+                continue
+            if shift not in shifted:
+                shifted[shift] = compute_fingerprint(samples, shift)
+            probe = shifted[shift]
+            reference = np.frombuffer(row["fingerprint"], dtype="<u4")
+            # 查询帧 i 对应候选帧 i + offset
+            first = max(0, -offset)
+            last = min(len(probe), len(reference) - offset)
+            if last <= first:
+                continue
+            coverage = (last - first) / len(probe)
+            ber = bit_error_rate(probe[first:last], reference[first + offset:last + offset])
+            log_debug(
+                f"指纹候选 {row['content_key']}: 偏移 {offset}，"
+                f"覆盖 {coverage:.2f}，误码率 {ber:.3f}"
+            )
+            if coverage < MIN_COVERAGE or ber > MAX_BIT_ERROR_RATE:
+                continue
+
+            # 查询第 i 帧从查询音频的 shift + i * HOP_SIZE 处开始，
+            # 对应候选的 (i + offset) * HOP_SIZE
+            offset_seconds = (offset * HOP_SIZE - shift) / ANALYSIS_RATE
+            segments = json.loads(gzip.decompress(row["segments"]).decode("utf-8"))
+            return {
+                "content_key": row["content_key"],
+                "offset": round(offset_seconds, 3),
+                "bit_error_rate": round(ber, 4),
+                "coverage": round(coverage, 4),
+                "model_size": row["model_size"],
+                "language": row["language"],
+                "segments": align_segments(segments, offset_seconds, duration),
+            }
+    finally:
+        conn.close()
+    return None
@@ -1,10 +1,12 @@
 """
-字幕格式化 - 将字幕数据格式化为 text/srt/json 格式
+字幕格式化 - 将字幕数据格式化为 text/srt/json/compact 格式
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from enum import Enum
 
+from .compact import CompactOptions, build_compact
+from .metrics import stage
 from .text import convert_to_simplified
 
 
@@ -13,6 +15,7 @@ class ResponseFormat(str, Enum):
     TEXT = "text"
     SRT = "srt"
     JSON = "json"
+    COMPACT = "compact"
 
 
 CHARACTER_LIMIT = 50000
@@ -23,21 +26,52 @@ def format_subtitle(
     video_title: str,
     format: ResponseFormat,
     source: str = "api",
-    language: str = None
+    language: str = None,
+    compact: Optional[CompactOptions] = None
 ) -> Dict[str, Any]:
     """将字幕数据格式化为指定格式
 
     Args:
         segments: 字幕片段列表 [{"start": 0.0, "end": 1.0, "content/text": "..."}]
         video_title: 视频标题
-        format: 输出格式 (text/srt/json)
+        format: 输出格式 (text/srt/json/compact)
         source: 来源标识 (api/whisper_asr)
         language: 语言代码（可选）
+        compact: compact 格式的预算与时间戳选项（可选）
 
     Returns:
         格式化后的字幕数据
     """
-    if format == ResponseFormat.JSON:
+    with stage("format"):
+        return _format_subtitle(segments, video_title, format, source, language, compact)
+
+
+def _format_subtitle(
+    segments: List[Dict[str, Any]],
+    video_title: str,
+    format: ResponseFormat,
+    source: str,
+    language: str,
+    compact: Optional[CompactOptions] = None
+) -> Dict[str, Any]:
+    """format_subtitle 的实现"""
+    if format == ResponseFormat.COMPACT:
+        compacted = build_compact(segments, compact, asr=source == "whisper_asr")
+        result = {
+            "source": source,
+            "format": "compact",
+            "subtitle_count": len(segments),
+            "paragraph_count": compacted["paragraph_count"],
+            "estimated_tokens": compacted["estimated_tokens"],
+            "sampled": compacted["sampled"],
+            "content": compacted["content"],
+            "video_title": video_title
+        }
+        if language:
+            result["language"] = language
+        return result
+
+    elif format == ResponseFormat.JSON:
         converted_data = [
             {
                 "from": seg['start'],
@@ -0,0 +1,255 @@
+"""
+资源调度 - 按阶段限制并发，控制内存和临时磁盘预算，队列满时快速拒绝
+
+按主机的限流（ratelimit.py）保护上游平台；这里保护本机：没有字幕的视频集中到来时，
+同时运行的 yt-dlp 下载、ffmpeg 提取和 Whisper 推理会耗尽内存、写满临时目录。
+
+- 每个阶段（network / download / extract / asr）有独立的并发名额和有界等待队列
+- ASR 按模型大小和音频大小预占内存，下载按预估文件大小预占临时磁盘
+- 等待队列已满时立即抛出 ResourceBusyError，附带按平均占用时长估算的 retry_after
+
+各项上限可通过环境变量配置，例如 VIDEO_CAPTIONS_ASR_SLOTS=2、VIDEO_CAPTIONS_ASR_QUEUE=8、
+VIDEO_CAPTIONS_MEMORY_BUDGET_MB=16384、VIDEO_CAPTIONS_TEMP_DISK_MB=20480。
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .logging import log_debug
+from .metrics import inc_counter
+
+
+@dataclass
+class StageLimit:
+    """单个阶段的限制"""
+    slots: int   # 并发名额，0 表示不限（仅受预算约束）
+    queue: int   # 最多排队的请求数，超出时拒绝
+
+
+# 阶段默认限制；"disk" 不占并发名额，只排队等待临时磁盘预算
+DEFAULT_LIMITS: Dict[str, StageLimit] = {
+    "network": StageLimit(slots=32, queue=256),
+    "download": StageLimit(slots=4, queue=32),
+    "extract": StageLimit(slots=2, queue=32),
+    "asr": StageLimit(slots=1, queue=16),
+    "disk": StageLimit(slots=0, queue=32),
+}
+
+# 尚无实测数据时，各阶段单次占用的估计时长（秒），用于计算 retry_after
+DEFAULT_HOLD_SECONDS = {"network": 0.5, "download": 30.0, "extract": 5.0, "asr": 60.0, "disk": 60.0}
+
+# 每次视频下载预占的临时磁盘（MB）
+DEFAULT_DOWNLOAD_RESERVE_MB = 1024
+
+# 未配置时，内存预算取物理内存的比例、临时磁盘预算取可用空间的比例
+MEMORY_BUDGET_RATIO = 0.6
+DISK_BUDGET_RATIO = 0.8
+FALLBACK_MEMORY_MB = 8192
+
+# 占用时长的指数滑动平均权重
+HOLD_EWMA_ALPHA = 0.2
+
+MB = 1024 * 1024
+
+
+class ResourceBusyError(Exception):
+    """等待队列已满，请求被拒绝"""
+
+    def __init__(self, stage: str, retry_after: float):
+        super().__init__(f"{stage} 阶段繁忙，请 {retry_after:.0f} 秒后重试")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def _physical_memory() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return FALLBACK_MEMORY_MB * MB
+
+
+def _free_temp_disk() -> int:
+    try:
+        return shutil.disk_usage(tempfile.gettempdir()).free
+    except OSError:
+        return DEFAULT_DOWNLOAD_RESERVE_MB * 8 * MB
+
+
+class ResourceGovernor:
+    """进程级资源调度器
+
+    申请名额时，若同一阶段没有人在排队且名额和预算充足则立即通过；
+    否则进入该阶段的等待队列，队列已满时抛出 ResourceBusyError。
+    每次释放后唤醒所有等待者重新检查，预算大于总量的申请按总量计（可以单独运行）。
+    """
+
+    def __init__(self, limits: Dict[str, StageLimit], memory_bytes: int, disk_bytes: int):
+        self.limits = limits
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._active = {stage: 0 for stage in limits}
+        self._waiting = {stage: 0 for stage in limits}
+        self._hold = dict(DEFAULT_HOLD_SECONDS)
+        self._memory_used = 0
+        self._disk_used = 0
+        self._waiters: List[asyncio.Future] = []
+
+    def _fits(self, stage: str, memory: int, disk: int) -> bool:
+        slots = self.limits[stage].slots
+        if slots and self._active[stage] >= slots:
+            return False
+        if memory and self._memory_used + memory > self.memory_bytes:
+            return False
+        return not disk or self._disk_used + disk <= self.disk_bytes
+
+    def retry_after(self, stage: str) -> float:
+        """按平均占用时长估算排到队首所需的秒数"""
+        slots = self.limits[stage].slots or 1
+        hold = self._hold.get(stage, 1.0)
+        return round(max(1.0, hold * (self._waiting[stage] + 1) / slots), 1)
+
+    def admit(self, stage: str) -> None:
+        """入口处的准入检查：等待队列已满时立即拒绝（不占用名额）
+
+        Raises:
+            ResourceBusyError: 等待队列已满
+        """
+        if self._waiting[stage] >= self.limits[stage].queue:
+            inc_counter("resource_rejections", stage=stage)
+            raise ResourceBusyError(stage, self.retry_after(stage))
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, stage: str, memory: int = 0, disk: int = 0) -> AsyncIterator[None]:
+        """占用一个阶段名额，同时预占内存和临时磁盘（字节）
+
+        Raises:
+            ResourceBusyError: 等待队列已满
+        """
+        memory = min(memory, self.memory_bytes)
+        disk = min(disk, self.disk_bytes)
+
+        if self._waiting[stage] or not self._fits(stage, memory, disk):
+            self.admit(stage)
+            self._waiting[stage] += 1
+            try:
+                while True:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self._waiters.append(waiter)
+                    try:
+                        await waiter
+                    finally:
+                        self._waiters.remove(waiter)
+                    if self._fits(stage, memory, disk):
+                        break
+            except BaseException:
+                # 被唤醒后取消：把机会让给其他等待者
+                self._wake()
+                raise
+            finally:
+                self._waiting[stage] -= 1
+
+        self._active[stage] += 1
+        self._memory_used += memory
+        self._disk_used += disk
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._active[stage] -= 1
+            self._memory_used -= memory
+            self._disk_used -= disk
+            held = time.monotonic() - started
+            previous = self._hold.get(stage, held)
+            self._hold[stage] = (1 - HOLD_EWMA_ALPHA) * previous + HOLD_EWMA_ALPHA * held
+            self._wake()
+
+    @asynccontextmanager
+    async def reserve_disk(self, nbytes: int) -> AsyncIterator[None]:
+        """预占临时磁盘（不占阶段名额），覆盖文件从写入到删除的整个生命周期"""
+        async with self.slot("disk", disk=nbytes):
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        """当前占用情况（JSON 可序列化）"""
+        return {
+            "stages": {
+                stage: {
+                    "active": self._active[stage],
+                    "waiting": self._waiting[stage],
+                    "slots": limit.slots,
+                    "queue": limit.queue,
+                }
+                for stage, limit in self.limits.items()
+            },
+            "memory": {
+                "used_mb": round(self._memory_used / MB, 1),
+                "budget_mb": round(self.memory_bytes / MB, 1),
+            },
+            "disk": {
+                "used_mb": round(self._disk_used / MB, 1),
+                "budget_mb": round(self.disk_bytes / MB, 1),
+            },
+        }
+
+
+def load_limits(asr_slots: int = 1) -> Dict[str, StageLimit]:
+    """读取各阶段限制（VIDEO_CAPTIONS_<STAGE>_SLOTS / VIDEO_CAPTIONS_<STAGE>_QUEUE）
+
+    Args:
+        asr_slots: ASR 名额默认值（与 ASR worker 数一致）
+    """
+    limits = {}
+    for stage, default in DEFAULT_LIMITS.items():
+        prefix = f"VIDEO_CAPTIONS_{stage.upper()}"
+        default_slots = asr_slots if stage == "asr" else default.slots
+        limits[stage] = StageLimit(
+            slots=_env_int(f"{prefix}_SLOTS", default_slots),
+            queue=_env_int(f"{prefix}_QUEUE", default.queue),
+        )
+    return limits
+
+
+def get_download_reserve() -> int:
+    """每次视频下载预占的临时磁盘（字节）"""
+    return _env_int("VIDEO_CAPTIONS_DOWNLOAD_RESERVE_MB", DEFAULT_DOWNLOAD_RESERVE_MB) * MB
+
+
+_governor: Optional[ResourceGovernor] = None
+
+
+def get_governor() -> ResourceGovernor:
+    """获取进程级资源调度器（首次调用时按环境变量创建）"""
+    global _governor
+    if _governor is None:
+        from .asr_worker import get_worker_count
+
+        memory_mb = _env_int("VIDEO_CAPTIONS_MEMORY_BUDGET_MB", 0)
+        disk_mb = _env_int("VIDEO_CAPTIONS_TEMP_DISK_MB", 0)
+        _governor = ResourceGovernor(
+            load_limits(asr_slots=max(1, get_worker_count())),
+            memory_mb * MB if memory_mb else int(_physical_memory() * MEMORY_BUDGET_RATIO),
+            disk_mb * MB if disk_mb else int(_free_temp_disk() * DISK_BUDGET_RATIO),
+        )
+        log_debug(
+            f"资源预算: 内存 {_governor.memory_bytes // MB} MB，"
+            f"临时磁盘 {_governor.disk_bytes // MB} MB"
+        )
+    return _governor
@@ -0,0 +1,277 @@
+"""
+HTTP 客户端 - 共享连接池，按主机限流并对可重试错误自动退避重试
+
+cached_get() 在连接池之前加一层磁盘缓存：保存响应体和 ETag/Last-Modified，
+再次请求时发送条件请求，304 时直接使用缓存；内容寻址的 URL 视为永久新鲜。
+"""
+
+import asyncio
+import logging
+import re
+import time
+import urllib.parse
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from .cache import get_http_cache
+from .governor import get_governor
+from .logging import log_debug
+from .metrics import record_cache
+from .ratelimit import RetryableError, backoff_delay, get_host_limiter
+
+# 禁用 httpx 的 HTTP 请求日志
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_ATTEMPTS = 4
+
+# 限流状态码与可重试状态码
+THROTTLE_STATUS_CODES = {412, 429}
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# 内容寻址的 URL（路径中包含内容哈希，内容不会变化），命中缓存后不再请求
+IMMUTABLE_URL_PATTERNS = [
+    re.compile(r"^https?://[^/]*\.hdslb\.com/bfs/"),
+]
+
+# 签名、时效类查询参数：每次请求都会变化，不参与缓存键
+VOLATILE_PARAMS = {"auth_key", "e", "deadline", "expires", "wts", "w_rid"}
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环下共享的 AsyncClient（连接池复用）"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    """关闭共享客户端"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _parse_retry_after(response: httpx.Response) -> float:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return 0.0
+
+
+def classify_response(
+    response: httpx.Response,
+    is_throttled: Optional[Callable[[httpx.Response], bool]] = None
+) -> Optional[RetryableError]:
+    """判断响应是否需要重试
+
+    Args:
+        response: HTTP 响应
+        is_throttled: 平台自定义的限流判断（如 B站风控错误码）
+
+    Returns:
+        需要重试时返回 RetryableError，否则返回 None
+    """
+    status = response.status_code
+    if status in THROTTLE_STATUS_CODES:
+        return RetryableError(
+            f"HTTP {status}", throttled=True, retry_after=_parse_retry_after(response)
+        )
+    if status in RETRYABLE_STATUS_CODES:
+        return RetryableError(f"HTTP {status}", retry_after=_parse_retry_after(response))
+    if is_throttled is not None and status == 200 and is_throttled(response):
+        return RetryableError("平台风控限流", throttled=True)
+    return None
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    cookies: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    is_throttled: Optional[Callable[[httpx.Response], bool]] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+) -> httpx.Response:
+    """发送 HTTP 请求（占用 network 名额并按主机限流，可重试错误自动退避重试）
+
+    Args:
+        method: 请求方法
+        url: 请求 URL
+        headers: 请求头
+        cookies: Cookie（以请求头形式发送，不写入共享客户端）
+        params: 查询参数
+        is_throttled: 平台自定义的限流判断
+        max_attempts: 最大尝试次数
+
+    Returns:
+        最终响应
+
+    Raises:
+        httpx.HTTPStatusError: 不可重试的错误状态，或重试耗尽
+        httpx.TransportError: 网络错误且重试耗尽
+        ResourceBusyError: network 等待队列已满
+    """
+    host = urllib.parse.urlparse(url).hostname or ""
+    limiter = get_host_limiter(host)
+    # 在按主机限流等待之前检查，队列已满时立即拒绝
+    get_governor().admit("network")
+
+    request_headers = dict(headers or {})
+    if cookies:
+        request_headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        async with limiter.slot(), get_governor().slot("network"):
+            try:
+                response = await get_http_client().request(
+                    method, url, headers=request_headers, params=params
+                )
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                if last_attempt:
+                    raise
+                error = RetryableError(f"{type(e).__name__}: {e}")
+                response = None
+            else:
+                error = classify_response(response, is_throttled)
+
+        limiter.record(
+            bool(error and error.throttled),
+            error.retry_after if error else 0.0,
+            success=error is None,
+        )
+
+        if error is None or last_attempt:
+            # 304 只会出现在条件请求中，由调用方处理
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
+
+        delay = max(error.retry_after, backoff_delay(attempt))
+        log_debug(f"{host} 请求失败 ({error})，{delay:.1f}s 后重试 ({attempt + 1}/{max_attempts})")
+        await asyncio.sleep(delay)
+
+    raise RuntimeError("unreachable")
+
+
+def is_immutable_url(url: str) -> bool:
+    """URL 是否为内容寻址（内容永不变化）"""
+    return any(pattern.match(url) for pattern in IMMUTABLE_URL_PATTERNS)
+
+
+def http_cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """缓存键：去掉 fragment 和签名/时效参数，其余查询参数排序后拼接"""
+    parsed = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+    query += [(k, str(v)) for k, v in (params or {}).items()]
+    query = sorted((k, v) for k, v in query if k not in VOLATILE_PARAMS)
+    return urllib.parse.urlunsplit(
+        (parsed.scheme, parsed.netloc, parsed.path, urllib.parse.urlencode(query), "")
+    )
+
+
+def _cached_response(url: str, body: bytes, meta: Dict[str, Any]) -> httpx.Response:
+    headers = {"Content-Type": meta["content_type"]} if meta.get("content_type") else {}
+    return httpx.Response(200, content=body, headers=headers, request=httpx.Request("GET", url))
+
+
+async def cached_get(
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    is_throttled: Optional[Callable[[httpx.Response], bool]] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+) -> httpx.Response:
+    """带条件请求缓存的 GET（不支持 Cookie：带 Cookie 的响应可能因用户而异）
+
+    - 内容寻址的 URL 命中缓存时直接返回，不发请求
+    - 其他 URL 携带 If-None-Match / If-Modified-Since 发送条件请求，304 时返回缓存内容
+    - 只缓存带 ETag 或 Last-Modified 的 200 响应（以及内容寻址 URL 的 200 响应）
+
+    参数同 request()，返回的响应状态码总是 200。
+    """
+    cache = get_http_cache()
+    if not cache.enabled:
+        return await request("GET", url, headers=headers, params=params,
+                             is_throttled=is_throttled, max_attempts=max_attempts)
+
+    key = http_cache_key(url, params)
+    immutable = is_immutable_url(key)
+    entry = cache.lookup(key)
+    body: Optional[bytes] = None
+    if entry:
+        try:
+            with open(entry["path"], "rb") as f:
+                body = f.read()
+        except OSError:
+            body = None
+
+    meta = entry["meta"] if entry and body is not None else {}
+    if body is not None and (immutable or meta.get("immutable")):
+        record_cache("http", True)
+        return _cached_response(url, body, meta)
+
+    request_headers = dict(headers or {})
+    if body is not None:
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = await request("GET", url, headers=request_headers, params=params,
+                             is_throttled=is_throttled, max_attempts=max_attempts)
+    if response.status_code == 304 and body is not None:
+        log_debug(f"HTTP 缓存重新验证通过: {key}")
+        record_cache("http", True)
+        return _cached_response(url, body, meta)
+    if response.status_code == 304:
+        # 没有可用的缓存内容却收到 304（缓存文件被删除），不带条件重新请求
+        response = await request("GET", url, headers=headers, params=params,
+                                 is_throttled=is_throttled, max_attempts=max_attempts)
+
+    record_cache("http", False)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified or immutable:
+        cache.put_bytes(key, response.content, meta={
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": response.headers.get("Content-Type"),
+            "immutable": immutable,
+            "stored_at": time.time(),
+        })
+    elif entry:
+        cache.delete(key)
+    return response
+
+
+async def get_json(url: str, cache: bool = False, **kwargs: Any) -> Any:
+    """GET 请求并解析 JSON 响应，参数同 request()
+
+    Args:
+        cache: 是否经过 HTTP 缓存（见 cached_get，不能与 cookies 同时使用）
+    """
+    if cache:
+        response = await cached_get(url, **kwargs)
+    else:
+        response = await request("GET", url, **kwargs)
+    return response.json()
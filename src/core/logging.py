@@ -23,6 +23,11 @@ def set_verbose_log(enabled: bool = True) -> None:
     _verbose_log = enabled
 
 
+def is_verbose_log() -> bool:
+    """是否处于详细日志模式"""
+    return _verbose_log
+
+
 def log_info(message: str) -> None:
     """打印信息日志（仅在详细模式下）"""
     if _verbose_log:
@@ -0,0 +1,96 @@
+"""
+视频元信息缓存 - 按规范视频 ID 缓存 get_info 的结果，并记住已知没有字幕的视频
+
+标题、时长、cid、字幕轨道列表很少变化，但每次请求都要重新获取（B站一次 API 往返，
+YouTube 启动一次 yt-dlp）；已知没有字幕的视频还要再探测一到三次播放器接口才进入 ASR。
+条目分为两类，TTL 分别设置：
+
+- 正向：元信息（字幕可用或尚未探测），VIDEO_CAPTIONS_METADATA_TTL 秒，默认 1 天
+- 负向："截至 T 没有字幕"，VIDEO_CAPTIONS_NO_SUBTITLE_TTL 秒，默认 6 小时；命中时
+  跳过字幕探测直接进入 ASR（通常命中音频/ASR 缓存）。平台可能在上传后一段时间才生成
+  AI 字幕，因此负向条目的 TTL 较短
+
+TTL 为 0 时不使用对应类别的条目；容量由 VIDEO_CAPTIONS_METADATA_CACHE_MB 控制。
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from .cache import get_metadata_cache
+from .logging import log_debug
+from .metrics import record_cache
+
+METADATA_TTL_ENV = "VIDEO_CAPTIONS_METADATA_TTL"
+NO_SUBTITLE_TTL_ENV = "VIDEO_CAPTIONS_NO_SUBTITLE_TTL"
+DEFAULT_METADATA_TTL = 24 * 3600
+DEFAULT_NO_SUBTITLE_TTL = 6 * 3600
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def _cache_key(service: str, video_id: str) -> str:
+    return f"{service}:{video_id}"
+
+
+def load_metadata(service: str, video_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """读取未过期的元信息条目
+
+    Returns:
+        {"info": get_info() 的结果, "subtitles": True/False/None（未探测）, "checked_at": 时间戳}，
+        未命中或已过期返回 None
+    """
+    cache = get_metadata_cache()
+    if not video_id or not cache.enabled:
+        return None
+    data = cache.get_bytes(_cache_key(service, video_id))
+    entry = None
+    if data is not None:
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            entry = None
+    if entry is not None:
+        if entry.get("subtitles") is False:
+            ttl = _env_seconds(NO_SUBTITLE_TTL_ENV, DEFAULT_NO_SUBTITLE_TTL)
+        else:
+            ttl = _env_seconds(METADATA_TTL_ENV, DEFAULT_METADATA_TTL)
+        if time.time() - entry.get("checked_at", 0) >= ttl:
+            log_debug(f"元信息缓存已过期: {service}:{video_id}")
+            entry = None
+    record_cache("metadata", entry is not None)
+    return entry
+
+
+def store_metadata(
+    service: str,
+    video_id: Optional[str],
+    info: Dict[str, Any],
+    subtitles: Optional[bool] = None
+) -> None:
+    """保存元信息
+
+    Args:
+        service: 服务名
+        video_id: 规范视频 ID
+        info: get_info() 的结果（需可 JSON 序列化）
+        subtitles: 字幕探测结果，False 记为负向条目（"截至现在没有字幕"），None 表示未探测
+    """
+    if not video_id:
+        return
+    entry = {"info": info, "subtitles": subtitles, "checked_at": time.time()}
+    try:
+        get_metadata_cache().put_bytes(
+            _cache_key(service, video_id),
+            json.dumps(entry, ensure_ascii=False).encode("utf-8"),
+            ".json",
+        )
+    except OSError as e:
+        log_debug(f"写入元信息缓存失败: {e}")
+
@@ -0,0 +1,199 @@
+"""
+性能指标 - 分阶段耗时统计与计数器，支持 JSON 快照和 Prometheus 文本格式
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .profiler import get_profiler
+
+_METRIC_PREFIX = "video_captions"
+
+# 流水线阶段
+STAGES = (
+    "cookie",           # Cookie 读取
+    "metadata",         # 视频信息获取
+    "subtitle_fetch",   # API 字幕获取
+    "media_download",   # 视频下载
+    "audio_extract",    # 音频提取
+    "audio_decode",     # 音频解码为 PCM（送入 ASR worker）
+    "fingerprint",      # 音频指纹计算与查找
+    "vad",              # 语音活动检测
+    "model_load",       # ASR 模型加载
+    "asr_decode",       # ASR 推理
+    "format",           # 字幕格式化
+)
+
+# 耗时直方图分桶（秒）
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+# 计数器说明（用于 Prometheus HELP）
+COUNTER_HELP = {
+    "requests": "Subtitle requests by service",
+    "cache_hits": "Cache hits by cache name",
+    "cache_misses": "Cache misses by cache name",
+    "asr_fallbacks": "Fallbacks from platform subtitles to ASR",
+    "errors": "Errors by exception type",
+    "resource_rejections": "Requests rejected because a resource queue was full",
+}
+
+_lock = threading.Lock()
+_stage_stats: Dict[str, Dict[str, Any]] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+# 当前请求的阶段耗时（用于附加到单次结果）
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "video_captions_request_timings", default=None
+)
+
+
+def observe_stage(name: str, seconds: float, child_process: bool = False) -> None:
+    """记录一次阶段耗时
+
+    Args:
+        name: 阶段名
+        seconds: 耗时（秒）
+        child_process: 该阶段在子进程中运行（如 ASR worker 上报的耗时），剖析时计入子进程墙钟
+    """
+    with _lock:
+        stats = _stage_stats.get(name)
+        if stats is None:
+            stats = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(DURATION_BUCKETS)}
+            _stage_stats[name] = stats
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds, 4)
+
+    profiler = get_profiler()
+    if child_process and profiler is not None:
+        profiler.add_child_wall(seconds, name)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """统计代码块耗时（异常时同样记录）
+
+    Example:
+        with stage("metadata"):
+            info = fetch_info()
+    """
+    profiler = get_profiler()
+    active = profiler.enter(name) if profiler is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if active is not None:
+            profiler.exit(active)
+        observe_stage(name, time.perf_counter() - start)
+
+
+def inc_counter(name: str, value: float = 1, **labels: str) -> None:
+    """计数器累加"""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """记录缓存命中/未命中"""
+    inc_counter("cache_hits" if hit else "cache_misses", cache=cache)
+
+
+def record_error(error_type: str) -> None:
+    """按异常类型记录错误"""
+    inc_counter("errors", type=error_type)
+
+
+@contextmanager
+def track_request() -> Iterator[Dict[str, float]]:
+    """收集当前请求内各阶段的耗时
+
+    Example:
+        with track_request() as timings:
+            result = await service.download_subtitle(...)
+        result["metrics"] = timings
+    """
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = round(time.perf_counter() - start, 4)
+        _request_timings.reset(token)
+
+
+def snapshot() -> Dict[str, Any]:
+    """获取指标快照（JSON 可序列化）"""
+    with _lock:
+        stages = {
+            name: {
+                "count": stats["count"],
+                "sum": round(stats["sum"], 4),
+                "avg": round(stats["sum"] / stats["count"], 4) if stats["count"] else 0.0,
+                "max": round(stats["max"], 4),
+            }
+            for name, stats in _stage_stats.items()
+        }
+        counters: Dict[str, List[Dict[str, Any]]] = {}
+        for (name, labels), value in sorted(_counters.items()):
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return {"stages": stages, "counters": counters}
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式（0.0.4）输出所有指标"""
+    lines: List[str] = []
+    metric = f"{_METRIC_PREFIX}_stage_duration_seconds"
+
+    with _lock:
+        lines.append(f"# HELP {metric} Pipeline stage duration in seconds")
+        lines.append(f"# TYPE {metric} histogram")
+        for name in sorted(_stage_stats):
+            stats = _stage_stats[name]
+            for bound, count in zip(DURATION_BUCKETS, stats["buckets"]):
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {stats["count"]}')
+
+        by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {}
+        for (name, labels), value in sorted(_counters.items()):
+            by_name.setdefault(name, []).append((labels, value))
+
+    for name, samples in by_name.items():
+        counter = f"{_METRIC_PREFIX}_{name}_total"
+        lines.append(f"# HELP {counter} {COUNTER_HELP.get(name, name)}")
+        lines.append(f"# TYPE {counter} counter")
+        for labels, value in samples:
+            lines.append(f"{counter}{_format_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """清空所有指标"""
+    with _lock:
+        _stage_stats.clear()
+        _counters.clear()
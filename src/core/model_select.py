@@ -0,0 +1,118 @@
+"""
+模型选择 - 根据音频时长、截止时间和本机实测的实时率（RTF）自动选择 ASR 模型
+
+RTF = 推理耗时 / 音频时长。每次实际推理后按指数滑动平均更新，
+保存在缓存目录的 rtf.json 中，跨进程、跨运行共享。
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from filelock import FileLock
+
+from .cache import atomic_write, get_cache_dir
+from .logging import log_debug
+
+# 按精度从高到低排列
+MODEL_SIZES = ("large", "medium", "small", "base")
+
+# 未指定截止时间时的默认值（秒），与推荐的 MCP 客户端超时（600000 ms）一致
+DEFAULT_DEADLINE = 600.0
+
+# 未实测前的先验值（Apple Silicon 上的大致水平）：(RTF, 模型加载秒数)
+DEFAULT_PROFILES: Dict[str, Tuple[float, float]] = {
+    "large": (0.12, 15.0),
+    "medium": (0.07, 8.0),
+    "small": (0.035, 4.0),
+    "base": (0.015, 2.0),
+}
+
+# 估算耗时的安全系数
+SAFETY_FACTOR = 1.2
+# 指数滑动平均的新样本权重
+EWMA_ALPHA = 0.3
+# 音频过短时 RTF 受固定开销影响过大，不计入
+MIN_SAMPLE_SECONDS = 10.0
+
+_RTF_FILE = "rtf.json"
+
+
+def _table_path() -> str:
+    return os.path.join(get_cache_dir(), _RTF_FILE)
+
+
+def load_rtf_table() -> Dict[str, Dict[str, Any]]:
+    """读取实测 RTF 表 {model_size: {"rtf", "load", "samples"}}"""
+    try:
+        with open(_table_path(), "r", encoding="utf-8") as f:
+            table = json.load(f)
+        return table if isinstance(table, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def record_rtf(
+    model_size: str, audio_seconds: float, decode_seconds: float, load_seconds: float
+) -> None:
+    """用一次实际推理的耗时更新 RTF 表"""
+    if model_size not in DEFAULT_PROFILES or audio_seconds < MIN_SAMPLE_SECONDS:
+        return
+    rtf = decode_seconds / audio_seconds
+    path = _table_path()
+    with FileLock(path + ".lock"):
+        table = load_rtf_table()
+        entry = table.get(model_size)
+        if entry:
+            entry["rtf"] = round(entry["rtf"] + EWMA_ALPHA * (rtf - entry["rtf"]), 5)
+            entry["load"] = round(entry["load"] + EWMA_ALPHA * (load_seconds - entry["load"]), 3)
+            entry["samples"] = entry.get("samples", 0) + 1
+        else:
+            table[model_size] = {"rtf": round(rtf, 5), "load": round(load_seconds, 3), "samples": 1}
+        atomic_write(path, json.dumps(table, indent=2).encode("utf-8"))
+    log_debug(f"更新 {model_size} 模型 RTF: {rtf:.4f}")
+
+
+def estimate_seconds(
+    model_size: str, audio_seconds: float, table: Optional[Dict[str, Any]] = None
+) -> float:
+    """估算指定模型转录该时长音频所需的秒数（含模型加载和安全系数）"""
+    rtf, load = DEFAULT_PROFILES[model_size]
+    entry = (table if table is not None else load_rtf_table()).get(model_size)
+    if entry:
+        rtf, load = entry["rtf"], entry["load"]
+    return (load + rtf * audio_seconds) * SAFETY_FACTOR
+
+
+def select_model_size(audio_seconds: float, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """选择能在截止时间内完成的最高精度模型
+
+    Args:
+        audio_seconds: 音频时长（秒）
+        deadline: 可用于转录的秒数，默认 DEFAULT_DEADLINE
+
+    Returns:
+        {
+            "model_size": "medium",
+            "estimated_seconds": 123.4,
+            "deadline": 600.0,
+            "audio_seconds": 3600.0,
+            "fits": true   # 所有模型都超时时为 false，此时选择最快的模型
+        }
+    """
+    deadline = DEFAULT_DEADLINE if deadline is None else deadline
+    table = load_rtf_table()
+    estimates = {size: estimate_seconds(size, audio_seconds, table) for size in MODEL_SIZES}
+
+    chosen = next((size for size in MODEL_SIZES if estimates[size] <= deadline), None)
+    fits = chosen is not None
+    if chosen is None:
+        chosen = MODEL_SIZES[-1]
+
+    return {
+        "model_size": chosen,
+        "estimated_seconds": round(estimates[chosen], 1),
+        "deadline": deadline,
+        "audio_seconds": round(audio_seconds, 1),
+        "fits": fits,
+    }
@@ -0,0 +1,300 @@
+"""
+性能剖析 - 分阶段统计 CPU、内存峰值和子进程耗时，采样生成火焰图用的折叠栈
+
+启用后（CLI --profile，MCP 服务器 --profile 或环境变量 VIDEO_CAPTIONS_PROFILE）：
+
+- metrics.stage() 进入/退出时记录墙钟、进程 CPU、子进程 CPU（已回收的子进程）
+  和 tracemalloc 内存峰值
+- yt-dlp / ffmpeg / ffprobe 子进程和 ASR worker 中的耗时计为子进程墙钟
+- 后台线程定时采样所有线程的 Python 调用栈，按 "阶段;帧;帧..." 折叠计数，
+  可直接交给 flamegraph.pl / speedscope 生成火焰图
+
+并发请求时进程 CPU 和采样的阶段归属为近似值（以线程上最内层的阶段为准）。
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV = "VIDEO_CAPTIONS_PROFILE"
+
+# 采样间隔（秒）
+DEFAULT_INTERVAL = 0.005
+
+# 空闲等待的栈顶帧（模块名, 函数名），不计入采样
+IDLE_LEAVES = {
+    ("selectors", "select"),
+    ("thread", "_worker"),
+    ("threading", "wait"),
+    ("queues", "get"),
+    ("connection", "_recv"),
+    ("connection", "wait"),
+}
+
+# 不在任何阶段内的采样
+NO_STAGE = "(other)"
+
+
+@dataclass
+class StageProfile:
+    """单个阶段的累计数据"""
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    child_wall: float = 0.0
+    child_cpu: float = 0.0
+    peak_bytes: int = 0
+    samples: int = 0
+
+
+class _ActiveStage:
+    """一次进行中的阶段"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.child_cpu = _children_cpu()
+        self.base_bytes = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.peak_bytes = self.base_bytes
+
+
+def _children_cpu() -> float:
+    """已回收子进程的累计 CPU 时间（用户态 + 内核态）"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """分阶段剖析器（进程级单例，由 start_profiler() 创建）"""
+
+    def __init__(self, output_dir: str, interval: float = DEFAULT_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.started_at = time.time()
+        self.stages: Dict[str, StageProfile] = {}
+        self.stacks: Dict[str, int] = {}
+        self._active: Dict[int, List[_ActiveStage]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="video-captions-profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # ---- 阶段 ----
+
+    def _fold_peak(self) -> None:
+        """把当前内存峰值并入所有进行中的阶段，然后重置峰值（供嵌套阶段单独统计）"""
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for stack in self._active.values():
+            for active in stack:
+                active.peak_bytes = max(active.peak_bytes, peak)
+        tracemalloc.reset_peak()
+
+    def enter(self, name: str) -> _ActiveStage:
+        with self._lock:
+            self._fold_peak()
+            active = _ActiveStage(name)
+            self._active.setdefault(threading.get_ident(), []).append(active)
+        return active
+
+    def exit(self, active: _ActiveStage) -> None:
+        wall = time.perf_counter() - active.wall
+        cpu = time.process_time() - active.cpu
+        child_cpu = _children_cpu() - active.child_cpu
+        with self._lock:
+            self._fold_peak()
+            stack = self._active.get(threading.get_ident(), [])
+            if active in stack:
+                stack.remove(active)
+            profile = self.stages.setdefault(active.name, StageProfile())
+            profile.calls += 1
+            profile.wall += wall
+            profile.cpu += cpu
+            profile.child_cpu += child_cpu
+            profile.peak_bytes = max(profile.peak_bytes, active.peak_bytes - active.base_bytes)
+
+    def add_child_wall(self, seconds: float, name: Optional[str] = None) -> None:
+        """记录子进程耗时
+
+        指定阶段名时计入该阶段（ASR worker 上报的阶段），否则计入当前线程进行中的阶段
+        """
+        with self._lock:
+            if name is not None:
+                profile = self.stages.setdefault(name, StageProfile())
+                profile.calls += 1
+                profile.wall += seconds
+                profile.child_wall += seconds
+                return
+            for active in self._active.get(threading.get_ident(), []):
+                self.stages.setdefault(active.name, StageProfile()).child_wall += seconds
+
+    # ---- 采样 ----
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own:
+                        self._record_sample(thread_id, frame)
+
+    def _record_sample(self, thread_id: int, frame) -> None:
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        if (module, frame.f_code.co_name) in IDLE_LEAVES:
+            return
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        stack = self._active.get(thread_id)
+        stage_name = stack[-1].name if stack else NO_STAGE
+        key = ";".join([stage_name] + labels[::-1])
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        if stack:
+            self.stages.setdefault(stage_name, StageProfile()).samples += 1
+
+    # ---- 输出 ----
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """各阶段汇总（按墙钟降序）"""
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: item[1].wall, reverse=True)
+            return [
+                {
+                    "stage": name,
+                    "calls": p.calls,
+                    "wall": round(p.wall, 4),
+                    "cpu": round(p.cpu, 4),
+                    "child_wall": round(p.child_wall, 4),
+                    "child_cpu": round(p.child_cpu, 4),
+                    "peak_mb": round(p.peak_bytes / (1024 * 1024), 2),
+                    "samples": p.samples,
+                }
+                for name, p in items
+            ]
+
+    def render_table(self) -> str:
+        """各阶段汇总表（纯文本）"""
+        header = (
+            "阶段", "调用", "墙钟(s)", "CPU(s)",
+            "子进程墙钟(s)", "子进程CPU(s)", "内存峰值(MB)", "采样",
+        )
+        rows = [
+            (r["stage"], str(r["calls"]), f"{r['wall']:.3f}", f"{r['cpu']:.3f}",
+             f"{r['child_wall']:.3f}", f"{r['child_cpu']:.3f}", f"{r['peak_mb']:.2f}",
+             str(r["samples"]))
+            for r in self.summary()
+        ]
+        widths = [
+            max(_display_width(row[i]) for row in [header] + rows) for i in range(len(header))
+        ]
+        lines = [
+            "  ".join(_pad(cell, widths[i], left=i == 0) for i, cell in enumerate(row))
+            for row in [header] + rows
+        ]
+        return "\n".join(lines)
+
+    def write(self, prefix: Optional[str] = None) -> Tuple[str, str]:
+        """写出折叠栈文件（.folded）和汇总表（.txt）
+
+        Returns:
+            (折叠栈文件路径, 汇总表文件路径)
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if prefix is None:
+            started = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+            prefix = f"profile-{started}-{os.getpid()}"
+        folded_path = os.path.join(self.output_dir, prefix + ".folded")
+        table_path = os.path.join(self.output_dir, prefix + ".txt")
+        with self._lock:
+            lines = [f"{stack} {count}\n" for stack, count in sorted(self.stacks.items())]
+        with open(folded_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        with open(table_path, "w", encoding="utf-8") as f:
+            f.write(self.render_table() + "\n")
+        return folded_path, table_path
+
+
+def _display_width(text: str) -> int:
+    """终端显示宽度（中日韩字符占两列）"""
+    return sum(2 if ord(ch) > 0x2E80 else 1 for ch in text)
+
+
+def _pad(text: str, width: int, left: bool) -> str:
+    padding = " " * (width - _display_width(text))
+    return text + padding if left else padding + text
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    """当前启用的剖析器，未启用时返回 None"""
+    return _profiler
+
+
+def start_profiler(output_dir: str, interval: float = DEFAULT_INTERVAL) -> Profiler:
+    """启用剖析（重复调用返回已有的剖析器）"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(output_dir, interval)
+        _profiler.start()
+    return _profiler
+
+
+def stop_profiler() -> Optional[Profiler]:
+    """停止剖析，返回已停止的剖析器（仍可读取结果和写出文件）"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+@contextmanager
+def child_process() -> Iterator[None]:
+    """标记一段等待子进程的代码（未启用剖析时无开销）"""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add_child_wall(time.perf_counter() - start)
@@ -0,0 +1,215 @@
+"""
+限流与重试 - 按主机的令牌桶、AIMD 自适应并发和指数退避重试
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from .logging import log_debug
+
+
+@dataclass
+class HostLimitConfig:
+    """单个主机的限流配置"""
+    rate: float              # 令牌桶速率（请求/秒）
+    burst: int               # 令牌桶容量（允许的突发请求数）
+    max_concurrency: int     # 并发上限（AIMD 增长的上界）
+    min_concurrency: int = 1
+
+
+# 按主机后缀匹配，越具体的配置越优先
+HOST_LIMITS: Dict[str, HostLimitConfig] = {
+    "api.bilibili.com": HostLimitConfig(rate=4.0, burst=8, max_concurrency=8),
+    "bilibili.com": HostLimitConfig(rate=2.0, burst=4, max_concurrency=4),
+    "hdslb.com": HostLimitConfig(rate=20.0, burst=40, max_concurrency=16),
+    "youtube.com": HostLimitConfig(rate=2.0, burst=4, max_concurrency=4),
+}
+DEFAULT_HOST_LIMIT = HostLimitConfig(rate=10.0, burst=20, max_concurrency=16)
+
+# 重试参数
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+
+class RetryableError(Exception):
+    """可重试的错误（限流、服务端错误、网络抖动）"""
+
+    def __init__(self, message: str, throttled: bool = False, retry_after: float = 0.0):
+        super().__init__(message)
+        self.throttled = throttled
+        self.retry_after = retry_after
+
+
+def backoff_delay(
+    attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY
+) -> float:
+    """带抖动的指数退避时长（full jitter）
+
+    Args:
+        attempt: 已失败次数（从 0 开始）
+        base: 基础时长（秒）
+        cap: 时长上限（秒）
+
+    Returns:
+        [0, min(cap, base * 2^attempt)] 之间的随机时长
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """令牌桶：平滑请求速率，允许有限突发
+
+    令牌不足时预占未来的令牌（余额可为负），调用方按预占顺序依次等待，
+    保证同一主机上的请求总体不超过设定速率。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """暂停发放令牌（服务端返回 Retry-After 时使用）"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= 1
+        wait = max(0.0, -self._tokens / self.rate, self._paused_until - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """AIMD 自适应并发：成功时加性增长，被限流时乘性减半"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial if initial is not None else max(min_limit, max_limit // 2))
+        self._in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        self._last_decrease = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self._in_flight
+        for waiter in list(self._waiters):
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def on_success(self) -> None:
+        """加性增长：每个完整窗口的成功请求使上限 +1"""
+        self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+        self._wake()
+
+    def on_throttle(self) -> None:
+        """乘性减半：同一时刻的多个限流响应只减半一次"""
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit / 2)
+
+
+class HostLimiter:
+    """单个主机的限流器：令牌桶控制速率，AIMD 控制并发"""
+
+    def __init__(self, host: str, config: HostLimitConfig):
+        self.host = host
+        self.bucket = TokenBucket(config.rate, config.burst)
+        self.concurrency = AdaptiveConcurrency(config.max_concurrency, config.min_concurrency)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """获取一个请求名额（先并发、后速率）"""
+        await self.concurrency.acquire()
+        try:
+            await self.bucket.acquire()
+            yield
+        finally:
+            self.concurrency.release()
+
+    def record(self, throttled: bool, retry_after: float = 0.0, success: bool = True) -> None:
+        """根据响应结果调整限流参数
+
+        Args:
+            throttled: 是否被限流（并发上限减半）
+            retry_after: 服务端要求的等待秒数
+            success: 请求是否成功；只有成功才使并发上限增长，其他失败（5xx、网络错误）保持不变
+        """
+        if throttled:
+            self.concurrency.on_throttle()
+            if retry_after > 0:
+                self.bucket.pause(retry_after)
+            log_debug(
+                f"{self.host} 触发限流，并发上限降至 {int(self.concurrency.limit)}"
+            )
+        elif success:
+            self.concurrency.on_success()
+
+
+_limiters: Dict[str, HostLimiter] = {}
+
+
+def _match_config(host: str) -> tuple[str, HostLimitConfig]:
+    """按主机后缀匹配限流配置，返回 (限流键, 配置)"""
+    host = host.lower()
+    for suffix in sorted(HOST_LIMITS, key=len, reverse=True):
+        if host == suffix or host.endswith("." + suffix):
+            return suffix, HOST_LIMITS[suffix]
+    return host, DEFAULT_HOST_LIMIT
+
+
+def get_host_limiter(host: str) -> HostLimiter:
+    """获取主机对应的限流器（同一配置下的主机共享限流器）"""
+    key, config = _match_config(host)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = HostLimiter(key, config)
+        _limiters[key] = limiter
+    return limiter
+
+
+def configure_host_limit(
+    host: str,
+    rate: float,
+    burst: int,
+    max_concurrency: int,
+    min_concurrency: int = 1
+) -> None:
+    """设置主机的限流配置（覆盖默认值，已创建的限流器会被重建）"""
+    HOST_LIMITS[host.lower()] = HostLimitConfig(rate, burst, max_concurrency, min_concurrency)
+    _limiters.pop(host.lower(), None)
@@ -0,0 +1,203 @@
+"""
+字幕全文检索 - 基于 SQLite FTS5 的本地索引
+
+每次成功获取字幕后自动写入 ~/.cache/video-captions/search.db，之后可按关键词
+跨视频检索片段及其时间戳，无需重新下载字幕。
+
+FTS5 自带的 unicode61 分词器把连续的中文视为一个词，无法检索其中的子串；
+这里在写入和查询时把每个中日韩字符切分为独立的词（unigram），查询词作为
+短语匹配，因此任意长度的中文子串都能命中，英文仍按单词匹配。
+"""
+
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from .cache import get_cache_dir
+from .logging import log_debug, log_warning
+from .text import convert_to_simplified
+
+SEARCH_ENV = "VIDEO_CAPTIONS_SEARCH_INDEX"
+DEFAULT_LIMIT = 20
+
+_DB_FILE = "search.db"
+# 片段 rowid = 视频 rowid * _ROWID_STRIDE + 序号，按视频删除时走 rowid 范围
+_ROWID_STRIDE = 1_000_000
+
+_CJK_RE = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    service TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    origin TEXT,
+    segment_count INTEGER,
+    indexed_at REAL,
+    UNIQUE (service, video_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    tokens,
+    text UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def is_search_index_enabled() -> bool:
+    """是否自动写入检索索引（VIDEO_CAPTIONS_SEARCH_INDEX=0 时禁用）"""
+    return os.environ.get(SEARCH_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def tokenize(text: str) -> str:
+    """在每个中日韩字符两侧插入空格，供 unicode61 分词"""
+    return _CJK_RE.sub(r" \1 ", text)
+
+
+def build_query(query: str) -> Optional[str]:
+    """将用户输入转换为 FTS5 查询：空白分隔的每个词作为短语，词之间为 AND"""
+    phrases = []
+    for term in convert_to_simplified(query).split():
+        tokens = re.findall(r"\w+", tokenize(term))
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " ".join(phrases) or None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(get_cache_dir(), _DB_FILE), timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def index_transcript(
+    service: str,
+    video_id: str,
+    title: str,
+    segments: List[Dict[str, Any]],
+    origin: str,
+    url: Optional[str] = None
+) -> int:
+    """写入（或替换）一个视频的字幕
+
+    Args:
+        service: 服务名称
+        video_id: 视频 ID（本地文件为绝对路径）
+        title: 视频标题
+        segments: [{"start", "end", "content"}] 字幕片段
+        origin: 字幕来源（bilibili_api / youtube_api / whisper_asr）
+        url: 原始 URL 或文件路径
+
+    Returns:
+        写入的片段数
+    """
+    texts = [seg.get("content", seg.get("text", "")).replace("\n", " ").strip() for seg in segments]
+    converted = convert_to_simplified("\n".join(texts)).split("\n") if texts else []
+    if len(converted) != len(texts):
+        converted = texts
+    rows = [
+        (seg["start"], seg["end"], text)
+        for seg, text in zip(segments, converted) if text
+    ][:_ROWID_STRIDE]
+
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO videos "
+                "(service, video_id, title, url, origin, segment_count, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (service, video_id) DO UPDATE SET "
+                "title = excluded.title, url = excluded.url, origin = excluded.origin, "
+                "segment_count = excluded.segment_count, indexed_at = excluded.indexed_at",
+                (service, video_id, title, url, origin, len(rows), time.time()),
+            )
+            vid = conn.execute(
+                "SELECT id FROM videos WHERE service = ? AND video_id = ?", (service, video_id)
+            ).fetchone()["id"]
+            base = vid * _ROWID_STRIDE
+            conn.execute(
+                "DELETE FROM segments WHERE rowid >= ? AND rowid < ?", (base, base + _ROWID_STRIDE)
+            )
+            conn.executemany(
+                "INSERT INTO segments (rowid, tokens, text, start, end) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (base + i, tokenize(text), text, start, end)
+                    for i, (start, end, text) in enumerate(rows)
+                ],
+            )
+    finally:
+        conn.close()
+    log_debug(f"已写入检索索引: {service}:{video_id}（{len(rows)} 个片段）")
+    return len(rows)
+
+
+def safe_index_transcript(*args, **kwargs) -> None:
+    """写入检索索引，失败只记录警告（不影响字幕下载）"""
+    if not is_search_index_enabled():
+        return
+    try:
+        index_transcript(*args, **kwargs)
+    except (sqlite3.Error, OSError) as e:
+        log_warning(f"写入检索索引失败: {e}")
+
+
+def search_captions(
+    query: str,
+    limit: int = DEFAULT_LIMIT,
+    service: Optional[str] = None,
+    video_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """检索字幕片段
+
+    Args:
+        query: 关键词，空白分隔的多个词需同时出现在同一片段中
+        limit: 最多返回的片段数
+        service: 只检索指定服务（bilibili/youtube/local）
+        video_id: 只检索指定视频
+
+    Returns:
+        {
+            "query": "缓存",
+            "count": 2,
+            "results": [{
+                "service": "bilibili", "video_id": "BV1xx", "title": "标题",
+                "url": "...", "start": 12.3, "end": 15.6, "text": "片段文本"
+            }]
+        }
+    """
+    match = build_query(query)
+    if not match:
+        return {"query": query, "count": 0, "results": []}
+
+    sql = (
+        "SELECT v.service, v.video_id, v.title, v.url, s.start, s.end, s.text "
+        "FROM segments s JOIN videos v ON v.id = s.rowid / ? "
+        "WHERE segments MATCH ?"
+    )
+    params: List[Any] = [_ROWID_STRIDE, match]
+    if service:
+        sql += " AND v.service = ?"
+        params.append(service)
+    if video_id:
+        sql += " AND v.video_id = ?"
+        params.append(video_id)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(max(1, limit))
+
+    conn = _connect()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    results = [dict(row) for row in rows]
+    return {"query": query, "count": len(results), "results": results}
@@ -3,6 +3,8 @@
 """
 
 import re
+from functools import lru_cache
+
 from opencc import OpenCC
 
 
@@ -11,10 +13,15 @@ def make_safe_filename(filename: str) -> str:
     return re.sub(r'[\\/*?:"<>|]', "", filename)
 
 
+@lru_cache(maxsize=1)
+def _get_converter() -> OpenCC:
+    """繁简转换器（加载词典约需数百毫秒，进程内只创建一次）"""
+    return OpenCC('t2s')
+
+
 def convert_to_simplified(text: str) -> str:
     """将繁体中文转换为简体中文"""
     try:
-        cc = OpenCC('t2s')
-        return cc.convert(text)
+        return _get_converter().convert(text)
     except (TypeError, ValueError, RuntimeError):
         return text
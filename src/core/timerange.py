@@ -0,0 +1,109 @@
+"""
+时间范围 - 只获取视频中的一段字幕（如两小时视频的第 10–15 分钟）
+
+API 字幕按时间过滤；ASR 只下载、提取和转录该时间段的音频，转录片段再平移回
+视频时间轴。返回的时间戳始终是相对视频开头的时间。
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+
+@dataclass(frozen=True)
+class TimeRange:
+    """视频中的一段时间（秒）
+
+    Attributes:
+        start: 开始时间
+        end: 结束时间，None 表示到视频结尾
+
+    Raises:
+        ValueError: 开始时间为负，或结束时间不晚于开始时间
+    """
+    start: float = 0.0
+    end: Optional[float] = None
+
+    def __post_init__(self):
+        if not math.isfinite(self.start) or self.start < 0:
+            raise ValueError(f"开始时间无效: {self.start}")
+        if self.end is not None and (not math.isfinite(self.end) or self.end <= self.start):
+            raise ValueError(f"结束时间 ({self.end}) 必须晚于开始时间 ({self.start})")
+
+    @property
+    def duration(self) -> Optional[float]:
+        """时长（秒），到视频结尾时为 None"""
+        return None if self.end is None else self.end - self.start
+
+    def label(self) -> str:
+        """可用于文件名和缓存键的范围标识，如 "10m00s-15m00s"、"0m10.500s-0m20s"（精确到毫秒）"""
+        end = "end" if self.end is None else _format_label(self.end)
+        return f"{_format_label(self.start)}-{end}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"start": self.start, "end": self.end}
+
+
+def _format_label(seconds: float) -> str:
+    total, millis = divmod(round(seconds * 1000), 1000)
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    fraction = f".{millis:03}" if millis else ""
+    if hours:
+        return f"{hours}h{minutes:02}m{secs:02}{fraction}s"
+    return f"{minutes}m{secs:02}{fraction}s"
+
+
+def parse_time(value: Union[str, float, int]) -> float:
+    """解析时间点：秒数（90、"90.5"）或 "mm:ss" / "hh:mm:ss"（"1:30"、"01:02:03.5"）
+
+    Raises:
+        ValueError: 格式错误
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = value.strip().split(":")
+    if len(parts) > 3 or not all(parts):
+        raise ValueError(f"无法解析的时间: {value}")
+    try:
+        numbers = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"无法解析的时间: {value}") from None
+    if any(n < 0 for n in numbers) or any(n >= 60 for n in numbers[1:]):
+        raise ValueError(f"无法解析的时间: {value}")
+    seconds = 0.0
+    for number in numbers:
+        seconds = seconds * 60 + number
+    return seconds
+
+
+def make_time_range(
+    start: Union[str, float, int, None] = None,
+    end: Union[str, float, int, None] = None
+) -> Optional[TimeRange]:
+    """由可选的开始/结束时间构造 TimeRange；都未指定（即整个视频）时返回 None
+
+    Raises:
+        ValueError: 时间格式错误或范围无效
+    """
+    start_seconds = parse_time(start) if start not in (None, "") else 0.0
+    end_seconds = parse_time(end) if end not in (None, "") else None
+    if start_seconds == 0 and end_seconds is None:
+        return None
+    return TimeRange(start_seconds, end_seconds)
+
+
+def clip_segments(segments: List[Dict[str, Any]], time_range: TimeRange) -> List[Dict[str, Any]]:
+    """保留与时间范围有重叠的片段（时间戳不变）"""
+    return [
+        seg for seg in segments
+        if seg["end"] > time_range.start
+        and (time_range.end is None or seg["start"] < time_range.end)
+    ]
+
+
+def shift_segments(segments: List[Dict[str, Any]], offset: float) -> List[Dict[str, Any]]:
+    """把相对片段开头的时间戳平移到视频时间轴"""
+    if not offset:
+        return segments
+    return [{**seg, "start": seg["start"] + offset, "end": seg["end"] + offset} for seg in segments]
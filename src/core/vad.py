@@ -0,0 +1,149 @@
+"""
+语音活动检测（VAD）- 在 ASR 之前去除静音和低电平背景段
+
+基于帧能量的自适应阈值：以音频自身的底噪（低分位能量）为基准，高出一定分贝的帧
+视为语音，再合并短停顿、去除过短片段并在两端留出余量。只把语音区间拼接后送入
+Whisper，转录结果的时间戳再映射回原始时间轴。
+
+能量检测无法区分响亮的背景音乐与人声，这类片段会保留，交由 Whisper 的
+hallucination_silence_threshold 处理。
+"""
+
+import bisect
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+VAD_ENV = "VIDEO_CAPTIONS_VAD"
+
+FRAME_MS = 30
+# 短于该值的停顿视为同一语音区间
+MAX_GAP_MS = 600
+# 短于该值的语音区间丢弃（按键声、爆音等）
+MIN_SPEECH_MS = 250
+# 语音区间两端保留的余量
+PAD_MS = 200
+
+# 阈值 = 底噪 + NOISE_MARGIN_DB，并限制在 [ABS_THRESHOLD_DB, MAX_THRESHOLD_DB] 内（dBFS）
+NOISE_MARGIN_DB = 12.0
+ABS_THRESHOLD_DB = -50.0
+MAX_THRESHOLD_DB = -35.0
+NOISE_PERCENTILE = 10
+
+# 语音占比高于该值时不裁剪（拼接带来的收益小于打断上下文的代价）
+MAX_SPEECH_RATIO = 0.9
+
+Region = Tuple[int, int]
+
+
+def is_vad_enabled() -> bool:
+    """VAD 是否启用（VIDEO_CAPTIONS_VAD=0 时禁用）"""
+    return os.environ.get(VAD_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """计算每帧的 RMS 能量（dBFS），samples 为 int16 或 [-1, 1] 的浮点数组"""
+    frame = sample_rate * FRAME_MS // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32)
+    if samples.dtype == np.int16:
+        frames /= 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> List[Region]:
+    """布尔数组中连续为 True 的区间 [start, end)"""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Region]:
+    """检测语音区间
+
+    Returns:
+        按时间排序、互不重叠的采样点区间 [(start, end), ...]
+    """
+    energy = frame_energy_db(samples, sample_rate)
+    if energy.size == 0:
+        return []
+
+    floor = float(np.percentile(energy, NOISE_PERCENTILE))
+    threshold = min(max(floor + NOISE_MARGIN_DB, ABS_THRESHOLD_DB), MAX_THRESHOLD_DB)
+
+    frame = sample_rate * FRAME_MS // 1000
+    max_gap = MAX_GAP_MS // FRAME_MS
+    min_speech = MIN_SPEECH_MS // FRAME_MS
+    pad = sample_rate * PAD_MS // 1000
+
+    merged: List[List[int]] = []
+    for start, end in _runs(energy > threshold):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions: List[Region] = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start = max(0, start * frame - pad)
+        end = min(len(samples), end * frame + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def apply_vad(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE
+) -> Tuple[np.ndarray, Optional[List[Region]]]:
+    """只保留语音区间
+
+    Returns:
+        (audio, regions) - 拼接后的音频和语音区间；无需裁剪时 regions 为 None，
+        audio 为原数组；完全没有语音时 regions 为空列表
+    """
+    regions = detect_speech(samples, sample_rate)
+    speech = sum(end - start for start, end in regions)
+    if len(samples) == 0 or speech > MAX_SPEECH_RATIO * len(samples):
+        return samples, None
+    if not regions:
+        return samples[:0], []
+    return np.concatenate([samples[start:end] for start, end in regions]), regions
+
+
+def remap_segments(
+    segments: List[Dict[str, Any]],
+    regions: Optional[List[Region]],
+    sample_rate: int = SAMPLE_RATE
+) -> List[Dict[str, Any]]:
+    """将裁剪后音频上的片段时间戳映射回原始时间轴"""
+    if not regions:
+        return segments
+
+    # 每个区间在裁剪后音频中的起点（秒）
+    kept_starts = []
+    offset = 0
+    for start, end in regions:
+        kept_starts.append(offset / sample_rate)
+        offset += end - start
+
+    def remap(t: float, is_end: bool) -> float:
+        # 片段结束时间恰好落在区间边界时归入前一个区间
+        index = (bisect.bisect_left if is_end else bisect.bisect_right)(kept_starts, t) - 1
+        index = max(0, index)
+        return round(regions[index][0] / sample_rate + t - kept_starts[index], 3)
+
+    return [
+        {**seg, "start": remap(seg["start"], False), "end": remap(seg["end"], True)}
+        for seg in segments
+    ]
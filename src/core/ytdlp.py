@@ -0,0 +1,126 @@
+"""
+yt-dlp 调用 - 按主机限流，对限流和网络错误自动退避重试
+"""
+
+import asyncio
+import os
+import subprocess
+from typing import List
+
+from .governor import get_governor
+from .logging import log_debug
+from .profiler import child_process
+from .ratelimit import backoff_delay, get_host_limiter
+from .timerange import TimeRange
+
+# yt-dlp 可执行文件，可通过环境变量替换（如压测时使用本地桩程序）
+YT_DLP = os.environ.get("VIDEO_CAPTIONS_YT_DLP", "yt-dlp")
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 只下载一段时仅取音频流（ASR 不需要视频；音频每帧都可独立解码，切点准确）
+SECTION_FORMAT = "bestaudio[ext=m4a]/bestaudio/best"
+
+# stderr 特征：平台限流
+THROTTLE_PATTERNS = (
+    "HTTP Error 412",
+    "HTTP Error 429",
+    "Too Many Requests",
+    "rate-limit",
+)
+
+# stderr 特征：临时性错误（服务端错误、网络抖动）
+RETRYABLE_PATTERNS = (
+    "HTTP Error 500",
+    "HTTP Error 502",
+    "HTTP Error 503",
+    "HTTP Error 504",
+    "timed out",
+    "Connection reset",
+    "Temporary failure in name resolution",
+    "IncompleteRead",
+)
+
+
+def _stderr_text(stderr) -> str:
+    if isinstance(stderr, bytes):
+        return stderr.decode("utf-8", errors="ignore")
+    return stderr or ""
+
+
+def classify_stderr(stderr: str) -> tuple[bool, bool]:
+    """根据 yt-dlp 的 stderr 判断错误类型
+
+    Returns:
+        (retryable, throttled)
+    """
+    throttled = any(p in stderr for p in THROTTLE_PATTERNS)
+    retryable = throttled or any(p in stderr for p in RETRYABLE_PATTERNS)
+    return retryable, throttled
+
+
+async def run_yt_dlp(
+    args: List[str],
+    host: str,
+    text: bool = False,
+    check: bool = True,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    resource: str = "network"
+) -> subprocess.CompletedProcess:
+    """在线程中运行 yt-dlp（不阻塞事件循环），并按主机限流
+
+    Args:
+        args: yt-dlp 参数（不含可执行文件名）
+        host: 目标主机，用于选择限流器（如 "youtube.com"）
+        text: 是否以文本模式读取输出
+        check: 退出码非 0 时是否抛出异常
+        max_attempts: 最大尝试次数
+        resource: 占用的资源阶段（视频下载使用 "download"）
+
+    Returns:
+        subprocess.CompletedProcess
+
+    Raises:
+        subprocess.CalledProcessError: check=True 且最终失败
+        ResourceBusyError: 资源阶段的等待队列已满
+    """
+    cmd = [YT_DLP] + args
+    limiter = get_host_limiter(host)
+    get_governor().admit(resource)
+
+    for attempt in range(max_attempts):
+        async with limiter.slot(), get_governor().slot(resource):
+            with child_process():
+                result = await asyncio.to_thread(
+                    subprocess.run, cmd, capture_output=True, text=text
+                )
+
+        if result.returncode == 0:
+            limiter.record(False)
+            return result
+
+        stderr = _stderr_text(result.stderr)
+        retryable, throttled = classify_stderr(stderr)
+        limiter.record(throttled, success=False)
+
+        if not retryable or attempt == max_attempts - 1:
+            break
+
+        delay = backoff_delay(attempt, base=2.0)
+        log_debug(f"yt-dlp 失败 ({host})，{delay:.1f}s 后重试 ({attempt + 1}/{max_attempts})")
+        await asyncio.sleep(delay)
+
+    if check:
+        raise subprocess.CalledProcessError(
+            result.returncode, cmd, output=result.stdout, stderr=_stderr_text(result.stderr)
+        )
+    return result
+
+
+def section_args(time_range: TimeRange) -> List[str]:
+    """只下载时间范围内音频的 yt-dlp 参数
+
+    yt-dlp 把片段交给 ffmpeg，按时间定位后只拉取该范围的数据（分片/Range 请求），
+    下载量与片段时长成正比；输出文件的时间轴从片段开头算起。
+    """
+    end = "inf" if time_range.end is None else f"{time_range.end:.3f}"
+    return ['--format', SECTION_FORMAT, '--download-sections', f"*{time_range.start:.3f}-{end}"]
@@ -7,11 +7,27 @@
 import argparse
 import asyncio
 import json
+import os
 import sys
 
 from service import get_service
+from service.local_batch import (
+    DEFAULT_INTERVAL,
+    DEFAULT_JOBS,
+    MAX_ATTEMPTS,
+    OUTPUT_FORMATS,
+    DirectoryBatch,
+)
+from core.cache import get_cache_dir
+from core.compact import CompactOptions
+from core.export import DEFAULT_EXPORT_FORMATS, ExportOptions, parse_formats
 from core.formatter import ResponseFormat
 from core.logging import log_info, set_verbose_log
+from core.metrics import track_request
+from core.profiler import start_profiler, stop_profiler
+from core.search import DEFAULT_LIMIT, search_captions
+from core.timerange import make_time_range
+from handler.daemon import DISABLE_ENV, call_daemon, daemon_main
 
 
 def print_result(result: dict, format: ResponseFormat, verbose: bool) -> None:
@@ -28,6 +44,13 @@ def print_result(result: dict, format: ResponseFormat, verbose: bool) -> None:
         print(json.dumps(result, ensure_ascii=False))
         return
 
+    if "metrics" in result:
+        print(json.dumps({"metrics": result["metrics"]}, ensure_ascii=False), file=sys.stderr)
+    for path in result.get("exported", {}).values():
+        print(f"已导出: {path}", file=sys.stderr)
+    if "export_error" in result:
+        print(f"导出失败: {result['export_error']}", file=sys.stderr)
+
     content = result.get("content")
     if content:
         print(content)
@@ -39,8 +62,121 @@ def print_result(result: dict, format: ResponseFormat, verbose: bool) -> None:
         print(f"共 {subtitle_count} 条字幕", file=sys.stderr)
 
 
+def print_profile() -> None:
+    """停止剖析，写出折叠栈和汇总表，并把汇总表输出到 stderr"""
+    profiler = stop_profiler()
+    if profiler is None:
+        return
+    folded_path, table_path = profiler.write()
+    print(profiler.render_table(), file=sys.stderr)
+    print(f"折叠栈（火焰图）: {folded_path}", file=sys.stderr)
+    print(f"阶段汇总: {table_path}", file=sys.stderr)
+
+
+def search_main(argv: list) -> None:
+    """video-captions search 子命令：在本地索引中检索字幕"""
+    parser = argparse.ArgumentParser(
+        prog="video-captions search",
+        description="在已获取过的字幕中全文检索",
+    )
+    parser.add_argument("query", nargs="+", help="检索关键词（多个词需出现在同一片段中）")
+    parser.add_argument(
+        "--limit", type=int, default=DEFAULT_LIMIT, help=f"最多返回的片段数（默认 {DEFAULT_LIMIT}）"
+    )
+    parser.add_argument(
+        "--service", choices=["bilibili", "youtube", "local"], help="只检索指定平台"
+    )
+    parser.add_argument("--video-id", help="只检索指定视频")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args(argv)
+
+    result = search_captions(" ".join(args.query), args.limit, args.service, args.video_id)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    if not result["results"]:
+        print("未找到匹配的字幕", file=sys.stderr)
+        sys.exit(1)
+    for item in result["results"]:
+        start = int(item["start"])
+        origin = f"{item['service']}:{item['video_id']}"
+        print(f"[{start // 60:02}:{start % 60:02}] {item['title']} ({origin})")
+        print(f"  {item['text']}")
+
+
+def batch_main(argv: list) -> None:
+    """video-captions batch 子命令：批量转录目录中新增或变更的音频/视频文件"""
+    parser = argparse.ArgumentParser(
+        prog="video-captions batch",
+        description="批量转录目录（含子目录）中的音频/视频文件，结果写到同名 .srt/.json 文件；"
+                    "清单记录已处理的文件，再次运行只转录新增或变更的文件",
+    )
+    parser.add_argument("directory", help="目录路径")
+    parser.add_argument(
+        "--model", choices=["base", "small", "medium", "large", "auto"], default="large",
+        help="Whisper ASR 模型大小（默认 large）",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=DEFAULT_JOBS,
+        help=f"同时转录的文件数（默认 {DEFAULT_JOBS}）",
+    )
+    default_formats = ",".join(fmt.value for fmt in OUTPUT_FORMATS)
+    parser.add_argument(
+        "--formats", default=default_formats,
+        help=f"输出格式，逗号分隔，可选 text/srt/json/compact（默认 {default_formats}）",
+    )
+    parser.add_argument("--watch", action="store_true", help="处理完已有文件后持续监听新文件")
+    parser.add_argument(
+        "--interval", type=float, default=DEFAULT_INTERVAL,
+        help=f"监听模式的扫描间隔（秒，默认 {DEFAULT_INTERVAL:.0f}）",
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true",
+        help=f"立即重试清单中失败的文件（默认按退避自动重试，"
+             f"连续失败 {MAX_ATTEMPTS} 次后不再重试）",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="显示详细日志")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"错误: 目录不存在: {args.directory}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError:
+        print(f"错误: 不支持的输出格式: {args.formats}", file=sys.stderr)
+        sys.exit(1)
+    if args.verbose:
+        set_verbose_log(True)
+
+    batch = DirectoryBatch(
+        args.directory, args.model, args.jobs, formats, retry_failed=args.retry_failed
+    )
+    if args.watch:
+        try:
+            asyncio.run(batch.watch(args.interval))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    summary = asyncio.run(batch.run_once())
+    print(json.dumps(summary, ensure_ascii=False))
+    if summary["failed"]:
+        sys.exit(1)
+
+
 def main() -> None:
     """CLI 入口点"""
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        search_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        daemon_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="视频字幕下载工具，支持 B站、YouTube 和本地文件",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -49,7 +185,14 @@ def main() -> None:
   video-captions https://www.bilibili.com/video/BV1xx
   video-captions --format json https://youtube.com/watch?v=xxx
   video-captions --browser chrome --format srt /path/to/video.mp4
-  video-captions --model small -v https://youtu.be/xxx""",
+  video-captions --model small -v https://youtu.be/xxx
+  video-captions --model auto --deadline 300 /path/to/long.mp4
+  video-captions --format compact --max-tokens 4000 https://youtu.be/xxx
+  video-captions -o ./archive --formats text,srt,json https://youtu.be/xxx
+  video-captions --start 10:00 --end 15:00 https://youtu.be/xxx
+  video-captions search 缓存 一致性
+  video-captions batch --watch /path/to/recordings
+  video-captions daemon          # 常驻守护进程，之后的调用自动转发""",
     )
     parser.add_argument("source", help="视频 URL 或本地文件路径")
     parser.add_argument(
@@ -60,14 +203,54 @@ def main() -> None:
     )
     parser.add_argument(
         "--model",
-        choices=["base", "small", "medium", "large"],
+        choices=["base", "small", "medium", "large", "auto"],
         default="large",
-        help="Whisper ASR 模型大小（默认 large）",
+        help="Whisper ASR 模型大小（默认 large；auto 按音频时长和 --deadline 自动选择）",
     )
     parser.add_argument(
-        "--format", choices=["text", "srt", "json"], default="text", help="输出格式（默认 text）"
+        "--deadline", type=float, help="时间预算（秒），--model auto 时用于选择模型（默认 600）"
+    )
+    parser.add_argument(
+        "--format", choices=["text", "srt", "json", "compact"], default="text",
+        help="输出格式（默认 text）",
+    )
+    parser.add_argument("--max-tokens", type=int, help="compact 格式的 token 预算（估算值）")
+    parser.add_argument("--max-chars", type=int, help="compact 格式的字符预算（默认 50000）")
+    parser.add_argument(
+        "--timestamp-interval", type=int, default=60,
+        help="compact 格式的时间戳间隔（秒，0 为不输出）",
+    )
+    parser.add_argument(
+        "--start", metavar="TIME", help="只获取从该时间开始的字幕（秒数或 mm:ss / hh:mm:ss）"
+    )
+    parser.add_argument(
+        "--end", metavar="TIME", help="只获取到该时间为止的字幕（ASR 只下载和转录这一段）"
+    )
+    parser.add_argument(
+        "--output-dir", "-o", metavar="DIR",
+        help="同时把字幕导出为多种格式文件到该目录（只获取一次，文件名取自视频标题）",
+    )
+    parser.add_argument(
+        "--formats", default=",".join(fmt.value for fmt in DEFAULT_EXPORT_FORMATS),
+        help="--output-dir 导出的格式，逗号分隔（默认 text,srt,json）",
     )
     parser.add_argument("--verbose", "-v", action="store_true", help="显示详细日志和元信息")
+    parser.add_argument(
+        "--no-daemon", action="store_true",
+        help=f"不转发给守护进程，在当前进程内执行（或设置 {DISABLE_ENV}=1）",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true",
+        help="附带各阶段耗时（json 格式写入结果，其他格式输出到 stderr）",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="剖析各阶段 CPU、内存峰值和子进程耗时，写出火焰图折叠栈",
+    )
+    parser.add_argument(
+        "--profile-dir", metavar="DIR",
+        help="剖析结果的输出目录（默认 ~/.cache/video-captions/profiles，指定时启用剖析）",
+    )
 
     args = parser.parse_args()
 
@@ -75,6 +258,10 @@ def main() -> None:
         set_verbose_log(True)
         log_info("详细日志模式已启用")
 
+    profile = args.profile or args.profile_dir is not None
+    if profile:
+        start_profiler(args.profile_dir or get_cache_dir("profiles"))
+
     service = get_service(args.source, args.browser)
     if not service:
         print(f"错误: 不支持的来源: {args.source}", file=sys.stderr)
@@ -84,9 +271,67 @@ def main() -> None:
     log_info(f"检测到平台: {service.name}")
 
     format = ResponseFormat(args.format)
+    try:
+        time_range = make_time_range(args.start, args.end)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    export = None
+    if args.output_dir:
+        try:
+            export = ExportOptions(os.path.abspath(args.output_dir), parse_formats(args.formats))
+        except ValueError:
+            print(f"错误: 不支持的导出格式: {args.formats}", file=sys.stderr)
+            sys.exit(1)
+
+    # 本地文件转为绝对路径，守护进程的工作目录可能不同
+    source = os.path.abspath(args.source) if os.path.exists(args.source) else args.source
+
+    # 守护进程在运行时转发给它，否则在当前进程内执行（剖析时始终在本进程内执行）
+    response = None
+    if not args.no_daemon and not os.environ.get(DISABLE_ENV) and not profile:
+        response = call_daemon({
+            "op": "download",
+            "source": source,
+            "format": args.format,
+            "model_size": args.model,
+            "browser": args.browser,
+            "compact": {
+                "max_tokens": args.max_tokens,
+                "max_chars": args.max_chars,
+                "timestamp_interval": args.timestamp_interval,
+            },
+            "deadline": args.deadline,
+            "export": {
+                "output_dir": export.output_dir,
+                "formats": [fmt.value for fmt in export.formats],
+            } if export else None,
+            "time_range": time_range.to_dict() if time_range else None,
+        })
 
-    # 下载字幕
-    result = asyncio.run(service.download_subtitle(args.source, format, model_size=args.model))
+    # 下载字幕：请求已发给守护进程后不再在本进程内重复执行，守护进程的错误直接报告
+    if response is not None and "result" in response:
+        log_info("已由守护进程处理")
+        result, timings = response["result"], response.get("metrics", {})
+    elif response is not None:
+        result = {
+            "error": response["error"] if "error" in response else "守护进程响应无效",
+            "message": response.get("message", "守护进程未返回结果"),
+            "suggestion": f"可使用 --no-daemon 或设置 {DISABLE_ENV}=1 在当前进程内执行",
+        }
+        timings = {}
+    else:
+        with track_request() as timings:
+            compact = CompactOptions(args.max_tokens, args.max_chars, args.timestamp_interval)
+            result = asyncio.run(
+                service.download_subtitle(
+                    source, format, model_size=args.model, compact=compact,
+                    deadline=args.deadline, export=export, time_range=time_range
+                )
+            )
+    if args.metrics and "error" not in result:
+        result["metrics"] = timings
+    print_profile()
     print_result(result, format, args.verbose)
 
 
@@ -0,0 +1,288 @@
+"""
+本地守护进程 - 通过 Unix 域套接字为 CLI 提供常驻服务
+
+守护进程常驻内存，保持模块、Cookie、HTTP 连接池和 ASR worker（已加载的模型）
+处于就绪状态（启动后在后台预热，见 service/warmup.py）。`video-captions` 检测到
+守护进程在运行时把请求转发给它，否则在当前进程内执行，命令行用法不变。
+
+协议：每个连接发送一行 JSON 请求，守护进程返回一行 JSON 响应。
+
+    {"op": "download", "source": ..., "format": "text", ...}
+        → {"result": {...}, "metrics": {...}}
+    {"op": "ping"}      → {"pid": 123, "uptime": 1.5, "requests": 3, "warmup": {"ready": true, ...}}
+    {"op": "shutdown"}  → {"ok": true}
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from service import get_service, get_service_by_name
+from service.base import SubtitleService
+from core.cache import get_cache_dir
+from core.compact import CompactOptions
+from core.export import ExportOptions
+from core.formatter import ResponseFormat
+from core.http import close_http_client
+from core.logging import log_info, log_success, log_warning
+from core.metrics import record_error, track_request
+from core.timerange import TimeRange
+from service.warmup import get_warmup, start_warmup, warmup_status
+
+SOCKET_ENV = "VIDEO_CAPTIONS_DAEMON_SOCKET"
+DISABLE_ENV = "VIDEO_CAPTIONS_NO_DAEMON"
+
+# 连接守护进程的超时（秒）；连接建立后等待结果不设超时（ASR 可能需要几分钟）
+CONNECT_TIMEOUT = 1.0
+# 单个请求行的长度上限
+MAX_LINE = 1024 * 1024
+
+
+def get_socket_path() -> str:
+    """守护进程套接字路径（默认位于缓存目录）"""
+    return os.environ.get(SOCKET_ENV) or os.path.join(get_cache_dir(), "daemon.sock")
+
+
+def is_daemon_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def call_daemon(
+    request: Dict[str, Any], socket_path: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """向守护进程发送请求
+
+    Returns:
+        守护进程的响应；守护进程未运行（无法连接）时返回 None（调用方在本进程内执行）。
+        请求发出后连接中断或响应无效时返回 {"error": ..., "message": ...}，守护进程可能已经
+        执行了请求，调用方不应再在本进程内重复执行
+    """
+    path = socket_path or get_socket_path()
+    if not is_daemon_supported() or not os.path.exists(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+        except OSError:
+            return None
+        try:
+            sock.settimeout(None)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        except OSError as e:
+            return {"error": "守护进程连接中断", "message": str(e)}
+    if not line:
+        return {"error": "守护进程连接中断", "message": "守护进程未返回响应就关闭了连接"}
+    try:
+        response = json.loads(line)
+    except ValueError:
+        response = None
+    if not isinstance(response, dict):
+        return {"error": "守护进程响应无效", "message": line[:200].decode("utf-8", "replace")}
+    return response
+
+
+class DaemonRunningError(RuntimeError):
+    """套接字上已有守护进程在运行"""
+
+
+class CaptionsDaemon:
+    """守护进程：按 (服务, 浏览器) 复用服务实例，Cookie 只读取一次"""
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or get_socket_path()
+        self.started_at = time.time()
+        self.requests = 0
+        self._services: Dict[Tuple[str, Optional[str]], SubtitleService] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    def _get_service(self, source: str, browser: Optional[str]) -> Optional[SubtitleService]:
+        service = get_service(source, browser)
+        if service is None:
+            return None
+        key = (service.name, browser)
+        if key not in self._services:
+            self._services[key] = get_service_by_name(service.name, browser)
+        return self._services[key]
+
+    async def _download(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        source = request["source"]
+        service = self._get_service(source, request.get("browser", "auto"))
+        if service is None:
+            return {"result": {"error": "不支持的来源", "message": f"不支持的来源: {source}"}}
+
+        compact = CompactOptions(**request.get("compact", {}))
+        export = None
+        if request.get("export"):
+            export = ExportOptions(
+                request["export"]["output_dir"],
+                tuple(ResponseFormat(fmt) for fmt in request["export"]["formats"]),
+            )
+        time_range = TimeRange(**request["time_range"]) if request.get("time_range") else None
+        with track_request() as timings:
+            result = await service.download_subtitle(
+                source,
+                ResponseFormat(request.get("format", "text")),
+                model_size=request.get("model_size", "large"),
+                show_progress=False,
+                compact=compact,
+                deadline=request.get("deadline"),
+                export=export,
+                time_range=time_range,
+            )
+        return {"result": result, "metrics": timings}
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一个请求"""
+        op = request.get("op")
+        if op == "ping":
+            return {
+                "pid": os.getpid(),
+                "uptime": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "warmup": warmup_status(),
+            }
+        if op == "shutdown":
+            self.stop()
+            return {"ok": True}
+        if op == "download":
+            self.requests += 1
+            try:
+                return await self._download(request)
+            except Exception as e:
+                record_error(type(e).__name__)
+                return {"result": {
+                    "error": f"下载字幕时发生错误: {type(e).__name__}", "message": str(e)
+                }}
+        return {"error": f"未知操作: {op}"}
+
+    async def _on_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            if isinstance(request, dict):
+                response = await self.handle(request)
+            else:
+                response = {"error": "无效的请求"}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _claim_socket(self) -> None:
+        """清理残留的套接字文件；已有守护进程在运行时抛出 DaemonRunningError"""
+        if not os.path.exists(self.socket_path):
+            return
+        if call_daemon({"op": "ping"}, self.socket_path) is not None:
+            raise DaemonRunningError(f"守护进程已在运行: {self.socket_path}")
+        os.unlink(self.socket_path)
+
+    async def start(self) -> None:
+        """开始监听（套接字仅当前用户可访问）"""
+        self._claim_socket()
+        self._stopped = asyncio.Event()
+        old_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(
+                self._on_connection, path=self.socket_path, limit=MAX_LINE
+            )
+        finally:
+            os.umask(old_umask)
+
+    def stop(self) -> None:
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        await close_http_client()
+
+    async def serve_forever(self) -> None:
+        """运行直到收到 shutdown 请求或 SIGINT/SIGTERM"""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        log_success(f"守护进程已启动: {self.socket_path} (pid {os.getpid()})")
+        start_warmup()
+        try:
+            await self._stopped.wait()
+        finally:
+            warmup = get_warmup()
+            if warmup is not None:
+                await warmup.stop()
+            await self.close()
+            log_info("守护进程已停止")
+
+
+def daemon_main(argv: list) -> None:
+    """video-captions daemon [start|stop|status] 子命令"""
+    parser = argparse.ArgumentParser(
+        prog="video-captions daemon",
+        description="常驻守护进程：CLI 请求自动转发给它，复用 Cookie、连接和已加载的模型",
+    )
+    parser.add_argument(
+        "action", nargs="?", choices=["start", "stop", "status"], default="start",
+        help="start: 在前台运行（默认）；stop: 停止；status: 查看状态",
+    )
+    parser.add_argument(
+        "--socket", help=f"套接字路径（默认缓存目录下的 daemon.sock，或环境变量 {SOCKET_ENV}）"
+    )
+    args = parser.parse_args(argv)
+
+    if not is_daemon_supported():
+        print("错误: 当前平台不支持 Unix 域套接字", file=sys.stderr)
+        sys.exit(1)
+
+    socket_path = args.socket or get_socket_path()
+    if args.action == "status":
+        status = call_daemon({"op": "ping"}, socket_path)
+        if status is None:
+            print("守护进程未运行", file=sys.stderr)
+            sys.exit(1)
+        if "error" in status:
+            print(f"错误: {status['error']}: {status.get('message', '')}", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps({"socket": socket_path, **status}, ensure_ascii=False))
+        return
+    if args.action == "stop":
+        response = call_daemon({"op": "shutdown"}, socket_path)
+        if response is None:
+            print("守护进程未运行", file=sys.stderr)
+            sys.exit(1)
+        if "error" in response:
+            print(f"错误: {response['error']}: {response.get('message', '')}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        asyncio.run(CaptionsDaemon(socket_path).serve_forever())
+    except DaemonRunningError as e:
+        log_warning(str(e))
+        sys.exit(1)
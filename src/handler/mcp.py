@@ -3,26 +3,117 @@
 """
 视频字幕 MCP Server Handler
 
-处理 MCP 协议，调用 Service 层完成字幕下载
+处理 MCP 协议，调用 Service 层完成字幕下载。
+默认使用 stdio 传输；也可以以 streamable HTTP / SSE 方式长期运行，由多个客户端共享。
 """
 
-from typing import Literal
+import argparse
+import asyncio
+import hmac
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Literal, Optional, Union
 
 from mcp.server.fastmcp import FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
 from service import get_service
+from core.cache import get_cache_dir
+from core.compact import CompactOptions
+from core.export import DEFAULT_EXPORT_FORMATS, ExportOptions, resolve_export_dir
 from core.formatter import ResponseFormat
+from core.governor import get_governor
+from core.http import close_http_client
+from core.logging import log_info
+from core.metrics import record_error, render_prometheus, snapshot, track_request
+from core.profiler import PROFILE_ENV, get_profiler, start_profiler, stop_profiler
+from core.search import search_captions as search_index
+from core.timerange import make_time_range
+from service.warmup import WARMUP_ENV, WARMUP_MODELS_ENV, get_warmup, start_warmup, warmup_status
+
+
+@asynccontextmanager
+async def _server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """会话开始时确保启动预热已开始（stdio 模式下即进程启动时；重复调用无副作用）"""
+    start_warmup()
+    yield
+
 
 # 初始化 MCP 服务器
-mcp = FastMCP("video-captions")
+mcp = FastMCP("video-captions", lifespan=_server_lifespan)
+
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# 多进程模式下通过环境变量把启动参数传给各 worker
+ENV_TRANSPORT = "VIDEO_CAPTIONS_MCP_TRANSPORT"
+ENV_HOST = "VIDEO_CAPTIONS_MCP_HOST"
+ENV_STATELESS = "VIDEO_CAPTIONS_MCP_STATELESS"
+ENV_ALLOWED_HOSTS = "VIDEO_CAPTIONS_MCP_ALLOWED_HOSTS"
+ENV_ALLOWED_ORIGINS = "VIDEO_CAPTIONS_MCP_ALLOWED_ORIGINS"
+# 访问令牌：设置后除 /health、/ready 外的请求都需要 "Authorization: Bearer <令牌>"
+ENV_AUTH_TOKEN = "VIDEO_CAPTIONS_MCP_TOKEN"
+
+# 不需要令牌的端点（负载均衡器/编排系统探测用，不返回敏感信息）
+PUBLIC_PATHS = ("/health", "/ready")
+
+_started_at = time.time()
+
+
+def _start_profiler_from_env() -> None:
+    """设置了 VIDEO_CAPTIONS_PROFILE 时启用剖析（值为输出目录，空字符串表示默认目录）"""
+    output_dir = os.environ.get(PROFILE_ENV)
+    if output_dir is not None:
+        profiler = start_profiler(output_dir or get_cache_dir("profiles"))
+        log_info(f"已启用剖析，输出目录: {profiler.output_dir}")
+
+
+def _write_profile() -> None:
+    """停止剖析并写出结果"""
+    profiler = stop_profiler()
+    if profiler is not None:
+        folded_path, _ = profiler.write()
+        log_info(f"剖析结果已写入: {folded_path}")
+
+
+ExportFormat = Literal["text", "srt", "json", "compact"]
+
+
+def _export_options(
+    output_dir: Optional[str],
+    export_formats: Optional[List[str]]
+) -> Optional[ExportOptions]:
+    """构造导出选项（未指定输出目录时不导出）
+
+    Raises:
+        ValueError: 输出目录不在导出根目录（VIDEO_CAPTIONS_EXPORT_DIR）之内
+    """
+    if not output_dir:
+        return None
+    formats = None
+    if export_formats:
+        formats = tuple(dict.fromkeys(ResponseFormat(fmt) for fmt in export_formats))
+    return ExportOptions(resolve_export_dir(output_dir), formats or DEFAULT_EXPORT_FORMATS)
 
 
 @mcp.tool()
 async def download_captions(
         url: str,
-        format: Literal["text", "srt", "json"] = "text",
-        model_size: Literal["base", "small", "medium", "large"] = "large",
-        browser: Literal["auto", "chrome", "edge", "firefox", "brave"] = "auto"
+        format: Literal["text", "srt", "json", "compact"] = "text",
+        model_size: Literal["base", "small", "medium", "large", "auto"] = "large",
+        browser: Literal["auto", "chrome", "edge", "firefox", "brave"] = "auto",
+        max_tokens: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        deadline: Optional[float] = None,
+        include_metrics: bool = False,
+        output_dir: Optional[str] = None,
+        export_formats: Optional[List[ExportFormat]] = None,
+        start: Optional[Union[float, str]] = None,
+        end: Optional[Union[float, str]] = None
 ) -> dict:
     """下载视频字幕内容，支持多种格式。
 
@@ -37,17 +128,30 @@ async def download_captions(
             - "text": 纯文本，适合阅读和总结
             - "srt": SRT字幕格式，适合视频播放
             - "json": 结构化JSON数据，适合程序处理
+            - "compact": 紧凑文本，合并为段落并带稀疏时间戳，适合放入 LLM 上下文
         model_size: ASR 模型大小（当 API 无字幕时使用）
             - "base": 最快，精度较低
             - "small": 较快
             - "medium": 平衡
             - "large": 精度最高（默认，mlx-whisper 优化）
+            - "auto": 按音频时长和本机实测速度，选择能在 deadline 内完成的最高精度模型
         browser: 从哪个浏览器读取 Cookie
             - "auto": 自动尝试所有浏览器（默认）
             - "chrome": 仅从 Chrome 读取
             - "edge": 仅从 Edge 读取
             - "firefox": 仅从 Firefox 读取
             - "brave": 仅从 Brave 读取
+        max_tokens: compact 格式的 token 预算（估算值），超出时沿时间轴均匀采样段落
+        max_chars: compact 格式的字符预算（未指定 max_tokens 时生效，默认 50000）
+        deadline: 整个请求的时间预算（秒），model_size="auto" 时用于选择模型（默认 600）
+        include_metrics: 是否在结果中附带本次请求各阶段耗时（秒）
+        output_dir: 指定时把同一份字幕导出为多种格式文件到该目录（只获取一次，
+            文件名取自标题和视频 ID）；相对路径相对导出根目录 VIDEO_CAPTIONS_EXPORT_DIR，
+            不能位于根目录之外
+        export_formats: 导出的格式（默认 text、srt、json）
+        start: 只获取从该时间开始的字幕，秒数或 "mm:ss" / "hh:mm:ss"（如 "10:00"）
+        end: 只获取到该时间为止的字幕；只需要长视频中的一段时指定 start/end，
+            ASR 只下载和转录这一段，耗时与片段长度成正比。时间戳仍相对视频开头
 
     Returns:
         成功时:
@@ -56,7 +160,11 @@ async def download_captions(
             "format": str,
             "subtitle_count": int,
             "content": str,
-            "video_title": str
+            "video_title": str,
+            "model_size": str,  # 仅 ASR 结果，auto 模式另附 "model_selection"
+            "metrics": {"metadata": 0.42, ..., "total": 1.3},  # include_metrics=True 时
+            "exported": {"srt": "/out/标题 [BV1xx].srt", ...},  # 指定 output_dir 时
+            "time_range": {"start": 600.0, "end": 900.0}  # 指定 start/end 时
         }
 
         错误时:
@@ -65,6 +173,15 @@ async def download_captions(
             "message": str
         }
     """
+    try:
+        time_range = make_time_range(start, end)
+    except ValueError as e:
+        return {"error": "时间范围无效", "message": str(e)}
+    try:
+        export = _export_options(output_dir, export_formats)
+    except ValueError as e:
+        return {"error": "输出目录无效", "message": str(e)}
+
     try:
         service = get_service(url, browser)
 
@@ -75,10 +192,18 @@ async def download_captions(
                 "suggestion": "支持的平台：B站 (bilibili.com)、YouTube (youtube.com)"
             }
 
-        result = await service.download_subtitle(url, ResponseFormat(format), model_size=model_size)
+        compact = CompactOptions(max_tokens=max_tokens, max_chars=max_chars)
+        with track_request() as timings:
+            result = await service.download_subtitle(
+                url, ResponseFormat(format), model_size=model_size, compact=compact,
+                deadline=deadline, export=export, time_range=time_range
+            )
+        if include_metrics:
+            result["metrics"] = timings
         return result
 
     except Exception as e:
+        record_error(type(e).__name__)
         return {
             "error": f"下载字幕时发生错误: {type(e).__name__}",
             "message": str(e)
@@ -88,8 +213,16 @@ async def download_captions(
 @mcp.tool()
 async def transcribe_local_file(
         file_path: str,
-        format: Literal["text", "srt", "json"] = "text",
-        model_size: Literal["base", "small", "medium", "large"] = "large"
+        format: Literal["text", "srt", "json", "compact"] = "text",
+        model_size: Literal["base", "small", "medium", "large", "auto"] = "large",
+        max_tokens: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        deadline: Optional[float] = None,
+        include_metrics: bool = False,
+        output_dir: Optional[str] = None,
+        export_formats: Optional[List[ExportFormat]] = None,
+        start: Optional[Union[float, str]] = None,
+        end: Optional[Union[float, str]] = None
 ) -> dict:
     """对本地音频/视频文件进行 ASR 语音识别生成字幕。
 
@@ -103,11 +236,23 @@ async def transcribe_local_file(
             - "text": 纯文本，适合阅读和总结
             - "srt": SRT字幕格式，适合视频播放
             - "json": 结构化JSON数据，适合程序处理
+            - "compact": 紧凑文本，合并为段落并带稀疏时间戳，适合放入 LLM 上下文
         model_size: ASR 模型大小
             - "base": 最快，精度较低
             - "small": 较快
             - "medium": 平衡（默认）
             - "large": 精度最高（mlx-whisper 优化）
+            - "auto": 按音频时长和本机实测速度，选择能在 deadline 内完成的最高精度模型
+        max_tokens: compact 格式的 token 预算（估算值）
+        max_chars: compact 格式的字符预算
+        deadline: 整个请求的时间预算（秒），model_size="auto" 时用于选择模型（默认 600）
+        include_metrics: 是否在结果中附带本次请求各阶段耗时（秒）
+        output_dir: 指定时把同一份字幕导出为多种格式文件到该目录（只获取一次，
+            文件名取自标题和视频 ID）；相对路径相对导出根目录 VIDEO_CAPTIONS_EXPORT_DIR，
+            不能位于根目录之外
+        export_formats: 导出的格式（默认 text、srt、json）
+        start: 只转录从该时间开始的部分，秒数或 "mm:ss" / "hh:mm:ss"
+        end: 只转录到该时间为止的部分（时间戳仍相对文件开头）
 
     Returns:
         成功时:
@@ -116,7 +261,8 @@ async def transcribe_local_file(
             "format": str,
             "subtitle_count": int,
             "content": str,
-            "video_title": str
+            "video_title": str,
+            "exported": {"srt": "/out/标题.srt", ...}  # 指定 output_dir 时
         }
 
         错误时:
@@ -126,6 +272,15 @@ async def transcribe_local_file(
             "suggestion": str
         }
     """
+    try:
+        time_range = make_time_range(start, end)
+    except ValueError as e:
+        return {"error": "时间范围无效", "message": str(e)}
+    try:
+        export = _export_options(output_dir, export_formats)
+    except ValueError as e:
+        return {"error": "输出目录无效", "message": str(e)}
+
     try:
         from service.local import LocalService
 
@@ -139,19 +294,342 @@ async def transcribe_local_file(
                               "支持的视频格式: mp4, avi, mkv, mov, flv, wmv, webm, m4v"
             }
 
-        return await service.download_subtitle(
-            file_path, ResponseFormat(format), model_size=model_size, show_progress=False
-        )
+        with track_request() as timings:
+            result = await service.download_subtitle(
+                file_path, ResponseFormat(format), model_size=model_size, show_progress=False,
+                compact=CompactOptions(max_tokens=max_tokens, max_chars=max_chars),
+                deadline=deadline, export=export, time_range=time_range
+            )
+        if include_metrics:
+            result["metrics"] = timings
+        return result
     except Exception as e:
+        record_error(type(e).__name__)
         return {
             "error": f"ASR转录时发生错误: {type(e).__name__}",
             "message": str(e)
         }
 
 
+@mcp.tool()
+async def search_captions(
+        query: str,
+        limit: int = 20,
+        service: Optional[Literal["bilibili", "youtube", "local"]] = None,
+        video_id: Optional[str] = None
+) -> dict:
+    """在已获取过的字幕中全文检索，返回匹配的片段及时间戳。
+
+    每次成功下载/转录字幕后会自动写入本地索引，检索无需重新下载字幕。
+    中文按单字索引，可检索任意子串；空白分隔的多个词需出现在同一片段中。
+
+    Args:
+        query: 检索关键词，如 "缓存 一致性"
+        limit: 最多返回的片段数（默认 20）
+        service: 只检索指定平台
+        video_id: 只检索指定视频（B站 BV号、YouTube 视频 ID 或本地文件绝对路径）
+
+    Returns:
+        {
+            "query": str,
+            "count": int,
+            "results": [{
+                "service": str, "video_id": str, "title": str, "url": str,
+                "start": float, "end": float, "text": str
+            }]
+        }
+    """
+    try:
+        return await asyncio.to_thread(search_index, query, limit, service, video_id)
+    except Exception as e:
+        record_error(type(e).__name__)
+        return {
+            "error": f"检索字幕时发生错误: {type(e).__name__}",
+            "message": str(e)
+        }
+
+
+@mcp.tool()
+async def get_metrics(format: Literal["json", "prometheus"] = "json") -> dict:
+    """获取服务器性能指标（进程启动以来的累计值）。
+
+    Args:
+        format: 输出格式
+            - "json": 结构化快照，含各阶段耗时统计和计数器
+            - "prometheus": Prometheus 文本格式
+
+    Returns:
+        json 格式:
+        {
+            "stages": {"metadata": {"count": int, "sum": float, "avg": float, "max": float}, ...},
+            "counters": {"cache_hits": [{"labels": {"cache": "asr"}, "value": int}], ...},
+            "resources": {
+                "stages": {"asr": {"active": int, "waiting": int, ...}},
+                "memory": {...},
+                "disk": {...}
+            },
+            "profile": {  # 仅在启用剖析时（--profile），同时刷新折叠栈文件
+                "stages": [{"stage": str, "calls": int, "wall": float, "cpu": float,
+                            "child_wall": float, "child_cpu": float, "peak_mb": float,
+                            "samples": int}],
+                "folded": str
+            }
+        }
+
+        prometheus 格式:
+        {
+            "content": str
+        }
+    """
+    if format == "prometheus":
+        return {"content": render_prometheus()}
+    result = {**snapshot(), "resources": get_governor().stats()}
+    profiler = get_profiler()
+    if profiler is not None:
+        folded_path, _ = await asyncio.to_thread(profiler.write)
+        result["profile"] = {"stages": profiler.summary(), "folded": folded_path}
+    return result
+
+
+@mcp.tool()
+async def get_status() -> dict:
+    """获取服务器状态：启动预热是否完成，以及各预热步骤的进度。
+
+    服务启动后在后台预热（加载繁简转换词典、读取 Cookie 并校验 B站登录状态、
+    建立连接、预加载 ASR 模型），预热期间服务照常可用，只是首个请求可能较慢。
+
+    Returns:
+        {
+            "pid": int,
+            "uptime": float,
+            "ready": bool,  # 所有预热步骤已结束（未启用预热时为 true）
+            "progress": {"finished": int, "total": int},
+            "elapsed": float,
+            "steps": {
+                "bilibili": {
+                    "status": "done", "seconds": 0.8, "detail": {"logged_in": true}, "error": null
+                },
+                "asr": {"status": "skipped" | "pending" | "running" | "failed", ...},
+                ...
+            }
+        }
+    """
+    return {"pid": os.getpid(), "uptime": round(time.time() - _started_at, 1), **warmup_status()}
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Prometheus 抓取端点（HTTP 传输模式下可用）"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health_endpoint(request: Request) -> JSONResponse:
+    """健康检查端点（HTTP 传输模式下可用）"""
+    return JSONResponse({
+        "status": "ok",
+        "pid": os.getpid(),
+        "uptime": round(time.time() - _started_at, 1),
+        "transport": os.environ.get(ENV_TRANSPORT, "stdio"),
+        "ready": warmup_status()["ready"],
+    })
+
+
+@mcp.custom_route("/ready", methods=["GET"])
+async def ready_endpoint(request: Request) -> JSONResponse:
+    """就绪检查端点：启动预热完成前返回 503（HTTP 传输模式下可用）
+
+    该端点不需要令牌，只返回是否就绪和进度，不含各步骤的详情和错误信息
+    """
+    status = warmup_status()
+    body = {"ready": status["ready"], "progress": status["progress"]}
+    return JSONResponse(body, status_code=200 if status["ready"] else 503)
+
+
+def _env_list(name: str) -> List[str]:
+    return [part.strip() for part in os.environ.get(name, "").split(",") if part.strip()]
+
+
+def _transport_security(host: str) -> TransportSecuritySettings:
+    """Host/Origin 校验（DNS 重绑定防护）
+
+    显式配置了允许的 Host/Origin 时使用配置；否则本机地址只允许本机名访问（与 FastMCP
+    的默认设置相同），其他地址只允许以监听地址访问。
+    """
+    if host in LOOPBACK_HOSTS:
+        default_hosts = ["127.0.0.1:*", "localhost:*", "[::1]:*"]
+        default_origins = ["http://127.0.0.1:*", "http://localhost:*", "http://[::1]:*"]
+    else:
+        default_hosts = [host, f"{host}:*"]
+        default_origins = []
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=_env_list(ENV_ALLOWED_HOSTS) or default_hosts,
+        allowed_origins=_env_list(ENV_ALLOWED_ORIGINS) or default_origins,
+    )
+
+
+class BearerAuthMiddleware:
+    """校验 "Authorization: Bearer <令牌>"（PUBLIC_PATHS 除外），失败返回 401"""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.expected = f"Bearer {token}".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in PUBLIC_PATHS:
+            provided = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(provided, self.expected):
+                response = JSONResponse({"error": "未授权"}, status_code=401,
+                                        headers={"WWW-Authenticate": "Bearer"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def create_app() -> Starlette:
+    """创建 HTTP 传输的 ASGI 应用（uvicorn 工厂函数，每个 worker 进程调用一次）
+
+    配置从环境变量读取，由 main() 在启动 uvicorn 前设置。
+    """
+    transport = os.environ.get(ENV_TRANSPORT, "streamable-http")
+    host = os.environ.get(ENV_HOST, "127.0.0.1")
+    _start_profiler_from_env()
+
+    token = os.environ.get(ENV_AUTH_TOKEN, "")
+    if host not in LOOPBACK_HOSTS and not token:
+        raise RuntimeError(
+            f"监听非本机地址 {host} 时必须设置访问令牌（--auth-token 或 {ENV_AUTH_TOKEN}）"
+        )
+    mcp.settings.transport_security = _transport_security(host)
+
+    if transport == "sse":
+        app = mcp.sse_app()
+    else:
+        mcp.settings.stateless_http = os.environ.get(ENV_STATELESS) == "1"
+        app = mcp.streamable_http_app()
+
+    inner_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        async with inner_lifespan(app):
+            start_warmup()
+            yield
+        # uvicorn 已停止接收新请求并等待进行中的请求完成
+        warmup = get_warmup()
+        if warmup is not None:
+            await warmup.stop()
+        await close_http_client()
+        _write_profile()
+        log_info(f"MCP worker {os.getpid()} 已退出")
+
+    app.router.lifespan_context = lifespan
+    if token:
+        app.add_middleware(BearerAuthMiddleware, token=token)
+    return app
+
+
 def main() -> None:
     """MCP 服务器入口点"""
-    mcp.run()
+    parser = argparse.ArgumentParser(description="视频字幕 MCP 服务器")
+    parser.add_argument(
+        "--transport", choices=TRANSPORTS, default="stdio", help="传输方式（默认 stdio）"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP 监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8000, help="HTTP 监听端口（默认 8000）")
+    parser.add_argument("--workers", type=int, default=1, help="worker 进程数（默认 1）")
+    parser.add_argument(
+        "--stateless", action="store_true", help="无状态 streamable HTTP（多 worker 时自动启用）"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=30, help="关闭时等待进行中请求的秒数（默认 30）"
+    )
+    parser.add_argument(
+        "--auth-token", metavar="TOKEN",
+        help=f"访问令牌，客户端以 Bearer 方式提供"
+             f"（监听非本机地址时必须设置；或设置 {ENV_AUTH_TOKEN}）",
+    )
+    parser.add_argument(
+        "--allowed-hosts", metavar="HOSTS",
+        help=f"允许的 Host 请求头，逗号分隔，如 mcp.example.com,10.0.0.5:*"
+             f"（或设置 {ENV_ALLOWED_HOSTS}）",
+    )
+    parser.add_argument(
+        "--allowed-origins", metavar="ORIGINS",
+        help=f"允许的 Origin 请求头，逗号分隔（或设置 {ENV_ALLOWED_ORIGINS}）",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help=f"启用剖析（各 worker 分别写出火焰图折叠栈和阶段汇总；或设置 {PROFILE_ENV}）",
+    )
+    parser.add_argument(
+        "--profile-dir", metavar="DIR",
+        help="剖析结果的输出目录（默认 ~/.cache/video-captions/profiles，指定时启用剖析）",
+    )
+    parser.add_argument(
+        "--warmup", metavar="STEPS",
+        help=f"启动预热步骤，逗号分隔：text,bilibili,youtube,asr"
+             f"（默认全部，off 禁用；或设置 {WARMUP_ENV}）",
+    )
+    parser.add_argument(
+        "--warmup-models", metavar="SIZES",
+        help=f"预热时预加载的 ASR 模型，如 large,small"
+             f"（第一个常驻 worker；或设置 {WARMUP_MODELS_ENV}）",
+    )
+    args = parser.parse_args()
+
+    if args.profile or args.profile_dir is not None:
+        os.environ[PROFILE_ENV] = args.profile_dir or os.environ.get(PROFILE_ENV, "")
+    if args.warmup is not None:
+        os.environ[WARMUP_ENV] = args.warmup
+    if args.warmup_models is not None:
+        os.environ[WARMUP_MODELS_ENV] = args.warmup_models
+
+    if args.transport == "stdio":
+        _start_profiler_from_env()
+        try:
+            mcp.run()
+        finally:
+            _write_profile()
+        return
+
+    if args.workers < 1:
+        parser.error("--workers 必须大于 0")
+    if args.transport == "sse" and args.workers > 1:
+        # SSE 的会话保存在进程内，消息请求可能被分配到其他 worker
+        parser.error("SSE 传输不支持多 worker，请使用 --transport streamable-http")
+
+    if args.auth_token is not None:
+        os.environ[ENV_AUTH_TOKEN] = args.auth_token
+    if args.allowed_hosts is not None:
+        os.environ[ENV_ALLOWED_HOSTS] = args.allowed_hosts
+    if args.allowed_origins is not None:
+        os.environ[ENV_ALLOWED_ORIGINS] = args.allowed_origins
+    if args.host not in LOOPBACK_HOSTS:
+        if not os.environ.get(ENV_AUTH_TOKEN):
+            parser.error(f"监听非本机地址时必须设置访问令牌：--auth-token 或 {ENV_AUTH_TOKEN}")
+        if args.host in ("0.0.0.0", "::") and not os.environ.get(ENV_ALLOWED_HOSTS):
+            parser.error(f"监听 {args.host} 时需用 --allowed-hosts 指定客户端访问使用的主机名")
+
+    import uvicorn
+
+    os.environ[ENV_TRANSPORT] = args.transport
+    os.environ[ENV_HOST] = args.host
+    os.environ[ENV_STATELESS] = "1" if args.stateless or args.workers > 1 else "0"
+
+    log_info(
+        f"MCP 服务器启动: {args.transport} http://{args.host}:{args.port} ({args.workers} workers)"
+    )
+    uvicorn.run(
+        "handler.mcp:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level="warning",
+    )
 
 
 if __name__ == "__main__":
@@ -2,10 +2,22 @@
 Service 层基类 - 定义所有字幕服务必须实现的接口
 """
 
+import asyncio
+import os
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
-from core.formatter import ResponseFormat
+from core.cache import get_audio_cache
+from core.compact import CompactOptions
+from core.export import ExportOptions, export_subtitles
+from core.formatter import ResponseFormat, format_subtitle
+from core.governor import ResourceBusyError, get_download_reserve, get_governor
+from core.logging import log_debug, log_error, log_success
+from core.metadata import load_metadata, store_metadata
+from core.metrics import record_cache, record_error
+from core.search import safe_index_transcript
+from core.timerange import TimeRange, clip_segments, shift_segments
 
 
 class SubtitleService(ABC):
@@ -29,6 +41,17 @@ class SubtitleService(ABC):
         """
         pass
 
+    def get_video_id(self, source: str) -> Optional[str]:
+        """获取来源对应的规范视频 ID（用于缓存索引）
+
+        Args:
+            source: 视频来源
+
+        Returns:
+            视频 ID，无法确定时返回 None（不使用缓存）
+        """
+        return None
+
     @abstractmethod
     async def get_info(self, source: str) -> Dict[str, Any]:
         """获取视频/文件信息
@@ -48,6 +71,32 @@ class SubtitleService(ABC):
         """
         pass
 
+    def _cache_video_id(self, source: str) -> Optional[str]:
+        try:
+            return self.get_video_id(source)
+        except ValueError:
+            return None
+
+    async def get_cached_info(self, source: str) -> Tuple[Dict[str, Any], Optional[bool]]:
+        """经元信息缓存获取视频信息（见 core/metadata.py），未命中时调用 get_info 并缓存
+
+        Returns:
+            (info, subtitles) - get_info() 的结果，以及缓存中的字幕探测结果：
+            True 有字幕，False 近期确认过没有字幕（可直接走 ASR），None 未知
+        """
+        video_id = self._cache_video_id(source)
+        entry = load_metadata(self.name, video_id)
+        if entry is not None:
+            log_debug(f"命中元信息缓存: {video_id}")
+            return entry["info"], entry.get("subtitles")
+        info = await self.get_info(source)
+        store_metadata(self.name, video_id, info)
+        return info, None
+
+    def _record_subtitles(self, source: str, info: Dict[str, Any], available: bool) -> None:
+        """记录字幕探测结果（无字幕时写入负向条目，之后的请求跳过探测）"""
+        store_metadata(self.name, self._cache_video_id(source), info, available)
+
     @abstractmethod
     async def list_subtitles(self, source: str) -> Dict[str, Any]:
         """列出可用的字幕
@@ -68,13 +117,15 @@ class SubtitleService(ABC):
     async def download_subtitle(
         self,
         source: str,
-        format: ResponseFormat = ResponseFormat.TEXT
+        format: ResponseFormat = ResponseFormat.TEXT,
+        time_range: Optional[TimeRange] = None
     ) -> Dict[str, Any]:
         """下载字幕（API 优先，ASR 兜底）
 
         Args:
             source: 视频来源
-            format: 输出格式 (text/srt/json)
+            format: 输出格式 (text/srt/json/compact)
+            time_range: 只获取该时间范围的字幕（ASR 只下载和转录这一段，时间戳仍相对视频开头）
 
         Returns:
             {
@@ -92,7 +143,8 @@ class SubtitleService(ABC):
         self,
         source: str,
         output_dir: str,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> tuple[str, str, str]:
         """下载视频
 
@@ -100,6 +152,7 @@ class SubtitleService(ABC):
             source: 视频来源
             output_dir: 输出目录
             show_progress: 是否显示进度提示
+            time_range: 只下载该时间范围的音频（文件时间轴从范围开头算起）
 
         Returns:
             (video_file, video_title, video_id) - 视频文件路径、视频标题、视频ID
@@ -111,7 +164,8 @@ class SubtitleService(ABC):
         self,
         video_file: str,
         output_dir: Optional[str] = None,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> str:
         """从视频文件中提取音频
 
@@ -119,6 +173,7 @@ class SubtitleService(ABC):
             video_file: 视频文件路径
             output_dir: 输出目录（默认与视频文件同目录）
             show_progress: 是否显示进度提示
+            time_range: 只提取该时间范围
 
         Returns:
             音频文件路径
@@ -129,24 +184,197 @@ class SubtitleService(ABC):
         self,
         source: str,
         output_dir: str,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> tuple[str, str, str]:
         """下载视频并提取音频（组合函数，默认实现）
 
+        视频从下载到提取完成期间预占临时磁盘，提取后立即删除视频文件。
+        download_video 不是下载临时文件的服务（如本地文件）需要重写此方法。
+
         Args:
             source: 视频来源
             output_dir: 输出目录
             show_progress: 是否显示进度提示
+            time_range: 只下载并提取该时间范围
 
         Returns:
             (audio_file, video_title, video_id) - 音频文件路径、视频标题、视频ID
         """
-        # 下载视频
-        video_file, video_title, video_id = await self.download_video(
-            source, output_dir, show_progress
+        async with get_governor().reserve_disk(get_download_reserve()):
+            # 下载视频
+            video_file, video_title, video_id = await self.download_video(
+                source, output_dir, show_progress, time_range
+            )
+
+            # 提取音频（下载的已经只是该时间范围）
+            audio_file = await self._extract_audio_limited(video_file, output_dir, show_progress)
+
+            os.remove(video_file)
+
+        return audio_file, video_title, video_id
+
+    async def _extract_audio_limited(
+        self,
+        video_file: str,
+        output_dir: Optional[str],
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> str:
+        """占用 extract 名额，在线程中提取音频（ffmpeg 不阻塞事件循环）"""
+        async with get_governor().slot("extract"):
+            return await asyncio.to_thread(
+                self.extract_audio, video_file, output_dir, show_progress, time_range
+            )
+
+    @staticmethod
+    def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+        """距离截止时间（time.monotonic() 时刻）的剩余秒数，未设置时返回 None"""
+        if deadline_at is None:
+            return None
+        return max(0.0, deadline_at - time.monotonic())
+
+    @staticmethod
+    def _busy_error(e: ResourceBusyError) -> Dict[str, Any]:
+        """资源繁忙（等待队列已满）时的错误响应"""
+        return {
+            "error": "资源繁忙",
+            "message": str(e),
+            "retry_after": e.retry_after,
+            "suggestion": f"请在 {e.retry_after:.0f} 秒后重试",
+        }
+
+    @staticmethod
+    def _check_time_range(time_range: Optional[TimeRange], duration: Optional[float]) -> None:
+        """时间范围必须从视频时长以内开始
+
+        Raises:
+            ValueError: 开始时间不早于视频时长
+        """
+        if time_range is not None and duration and time_range.start >= duration:
+            raise ValueError(f"开始时间 ({time_range.start:.0f}s) 超出视频时长 ({duration:.0f}s)")
+
+    @staticmethod
+    def _to_video_timeline(
+        segments: List[Dict[str, Any]], time_range: Optional[TimeRange]
+    ) -> List[Dict[str, Any]]:
+        """只转录了一段音频时，把片段平移回视频时间轴并去掉超出范围的部分"""
+        if time_range is None:
+            return segments
+        return clip_segments(shift_segments(segments, time_range.start), time_range)
+
+    @staticmethod
+    def _render(
+        segments: List[Dict[str, Any]],
+        video_title: str,
+        format: ResponseFormat,
+        source: str,
+        compact: Optional[CompactOptions] = None,
+        export: Optional[ExportOptions] = None,
+        video_id: Optional[str] = None,
+        time_range: Optional[TimeRange] = None
+    ) -> Dict[str, Any]:
+        """按请求的格式格式化字幕；指定 export 时同一组片段再导出为多种格式文件
+
+        导出失败不影响返回的字幕，错误记录在 "export_error" 中。指定 time_range 时
+        结果附带 "time_range"，导出文件名加上范围标识，不覆盖整个视频的导出文件。
+        """
+        result = format_subtitle(segments, video_title, format, source=source, compact=compact)
+        if time_range is not None:
+            result["time_range"] = time_range.to_dict()
+        if export is not None:
+            try:
+                result["exported"] = export_subtitles(
+                    segments, video_title, export, source=source, compact=compact,
+                    video_id=video_id, suffix=f".{time_range.label()}" if time_range else ""
+                )
+                log_success(f"已导出 {len(result['exported'])} 个文件到 {export.output_dir}")
+            except OSError as e:
+                record_error(type(e).__name__)
+                log_error(f"导出字幕文件失败: {e}")
+                result["export_error"] = str(e)
+        return result
+
+    @staticmethod
+    def _with_asr_model(result: Dict[str, Any], asr_result: Dict[str, Any]) -> Dict[str, Any]:
+        """在 ASR 结果中标注实际使用的模型（及自动选择的依据）"""
+        if "model_size" in asr_result:
+            result["model_size"] = asr_result["model_size"]
+        if asr_result.get("model_selection"):
+            result["model_selection"] = asr_result["model_selection"]
+        return result
+
+    async def _index_transcript(
+        self,
+        video_id: Optional[str],
+        title: str,
+        segments: List[Dict[str, Any]],
+        origin: str,
+        url: str
+    ) -> None:
+        """把获取到的字幕写入全文检索索引（失败不影响下载）
+
+        SQLite 写入、繁简转换和分词在线程中执行，不阻塞事件循环。
+        """
+        if video_id:
+            await asyncio.to_thread(
+                safe_index_transcript, self.name, video_id, title, segments, origin, url
+            )
+
+    async def prepare_audio(
+        self,
+        source: str,
+        output_dir: str,
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> tuple[str, str, str]:
+        """获取 ASR 输入音频，优先命中音频缓存
+
+        缓存按 "<服务名>:<视频ID>" 索引，只保存提取后的 16kHz 音频；
+        未命中时下载视频并提取音频，然后存入缓存。
+
+        指定时间范围时：已缓存整个视频的音频则直接从中截取；否则只下载这一段，
+        按 "<服务名>:<视频ID>@<范围>" 单独缓存。
+
+        Args:
+            source: 视频来源
+            output_dir: 临时输出目录（缓存禁用时音频留在此目录）
+            show_progress: 是否显示进度提示
+            time_range: 只获取该时间范围的音频（时间轴从范围开头算起）
+
+        Returns:
+            (audio_file, video_title, video_id) - 音频文件路径、视频标题、视频ID
+        """
+        video_id = self._cache_video_id(source)
+
+        audio_cache = get_audio_cache()
+        cache_key = f"{self.name}:{video_id}" if video_id else None
+
+        if cache_key and time_range is not None:
+            entry = audio_cache.lookup(cache_key)
+            if entry:
+                log_success(f"命中音频缓存: {video_id}，截取 {time_range.label()}")
+                record_cache("audio", True)
+                audio_file = await self._extract_audio_limited(
+                    entry["path"], output_dir, show_progress, time_range
+                )
+                return audio_file, entry["meta"].get("title", video_id), video_id
+            cache_key = f"{cache_key}@{time_range.label()}"
+
+        if cache_key:
+            entry = audio_cache.lookup(cache_key)
+            record_cache("audio", entry is not None)
+            if entry:
+                log_success(f"命中音频缓存: {video_id}")
+                return entry["path"], entry["meta"].get("title", video_id), video_id
+
+        audio_file, video_title, video_id = await self.download_and_extract_audio(
+            source, output_dir, show_progress, time_range
         )
 
-        # 提取音频
-        audio_file = self.extract_audio(video_file, output_dir, show_progress)
+        if cache_key:
+            audio_file = audio_cache.put_file(
+                cache_key, audio_file, ".wav", meta={"title": video_title}, move=True
+            )
 
         return audio_file, video_title, video_id
@@ -2,23 +2,29 @@
 B站服务 - 字幕下载和处理
 """
 
-import logging
+import asyncio
 import os
 import re
 import subprocess
 import tempfile
+import time
 import urllib.parse
 from typing import Dict, Any, Optional, List
 
 import httpx
 
-# 禁用 httpx 的 HTTP 请求日志
-logging.getLogger("httpx").setLevel(logging.WARNING)
-
 from .base import SubtitleService
-from core.formatter import ResponseFormat, format_subtitle
+from core.compact import CompactOptions
+from core.export import ExportOptions
+from core.formatter import ResponseFormat
 from core.audio import extract_audio
 from core.asr import transcribe_with_asr
+from core.http import get_json
+from core.governor import ResourceBusyError
+from core.metrics import inc_counter, record_error, stage
+from core.ratelimit import backoff_delay
+from core.timerange import TimeRange, clip_segments
+from core.ytdlp import run_yt_dlp, section_args
 from core.logging import (
     log_debug,
     log_success,
@@ -27,9 +33,85 @@ from core.logging import (
 )
 from core.text import make_safe_filename
 from core.cookie import get_sessdata
+from .bilibili_wbi import get_wbi_keys, invalidate_wbi_keys, sign_request_params
+
+
+# B站 API 地址，可通过环境变量替换（如压测时指向本地桩服务）
+API_BASE_URL = os.environ.get("VIDEO_CAPTIONS_BILIBILI_API", "https://api.bilibili.com")
+
+# B站风控错误码：-352 风控校验失败，-412 请求被拦截，-509 请求过于频繁，-799 请求过于频繁
+RISK_CONTROL_CODES = {-352, -412, -509, -799}
+# WBI 签名接口返回 -352 通常是签名所用的 key 已更换，重新签名即可，不按限流处理
+WBI_SIGNATURE_CODE = -352
+
+# 播放器接口偶尔返回空字幕列表或其他视频的字幕，判定"无字幕"前最多请求的次数
+SUBTITLE_MAX_ATTEMPTS = 3
+# 字幕结束时间允许超出视频时长的比例和秒数
+DURATION_TOLERANCE = 0.05
+DURATION_SLACK = 10.0
 
+# 字幕语言优先级
+PREFERRED_LANGS = ['ai-zh', 'zh-Hans', 'zh-CN', 'zh']
 
-API_BASE_URL = "https://api.bilibili.com"
+
+def _is_risk_controlled(response: httpx.Response) -> bool:
+    """判断 API 响应是否为风控拦截（HTTP 200 但业务码为风控错误）"""
+    try:
+        return response.json().get('code') in RISK_CONTROL_CODES
+    except ValueError:
+        return False
+
+
+def _is_risk_controlled_signed(response: httpx.Response) -> bool:
+    """WBI 签名接口的风控判断（-352 由调用方重新签名处理，不计为限流）"""
+    try:
+        return response.json().get('code') in RISK_CONTROL_CODES - {WBI_SIGNATURE_CODE}
+    except ValueError:
+        return False
+
+
+def parse_subtitle_body(body: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将 B站字幕 JSON 的 body 字段转换为统一的字幕片段列表"""
+    return [
+        {"start": item.get("from", 0), "end": item.get("to", 0), "content": item.get("content", "")}
+        for item in body
+    ]
+
+
+def validate_subtitle(
+    body: List[Dict[str, Any]],
+    video_info: Dict[str, Any],
+    player_cid: Optional[int] = None
+) -> Optional[str]:
+    """校验字幕是否属于该视频
+
+    Args:
+        body: 字幕 JSON 的 body 字段
+        video_info: get_info() 的返回值（含 cid、duration）
+        player_cid: 播放器接口响应中的 cid
+
+    Returns:
+        校验失败的原因，通过时返回 None
+    """
+    if not body:
+        return "字幕内容为空"
+    cid = video_info.get('cid')
+    if player_cid and cid and player_cid != cid:
+        return f"播放器返回的 cid ({player_cid}) 与视频 cid ({cid}) 不一致"
+    duration = video_info.get('duration') or 0
+    end = max((item.get('to', 0) for item in body), default=0)
+    if duration and end > duration * (1 + DURATION_TOLERANCE) + DURATION_SLACK:
+        return f"字幕结束时间 ({end:.0f}s) 超出视频时长 ({duration}s)"
+    return None
+
+
+def select_subtitle(subtitles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按语言优先级选择字幕轨道"""
+    for lang in PREFERRED_LANGS:
+        for sub in subtitles:
+            if sub['lan'] == lang:
+                return sub
+    return subtitles[0]
 
 
 class BilibiliService(SubtitleService):
@@ -72,12 +154,16 @@ class BilibiliService(SubtitleService):
             return last_part
         raise ValueError(f"无法从 URL 中提取 BV 号: {url}")
 
+    def get_video_id(self, source: str) -> Optional[str]:
+        return self._extract_bvid(source)
+
     def _ensure_sessdata(self) -> str:
         """确保获取 SESSDATA，如果没有则抛出异常"""
         if self._sessdata:
             return self._sessdata
 
-        sessdata = get_sessdata(self.browser)
+        with stage("cookie"):
+            sessdata = get_sessdata(self.browser)
         if not sessdata:
             raise ValueError(
                 "未找到 B站 SESSDATA。请通过以下方式之一提供：\n"
@@ -90,6 +176,28 @@ class BilibiliService(SubtitleService):
     def _get_cookies(self) -> dict:
         return {'SESSDATA': self._ensure_sessdata()}
 
+    async def warm_up(self) -> Dict[str, Any]:
+        """启动预热：读取 Cookie、建立到 API 的连接、校验登录状态并预取 WBI key
+
+        Returns:
+            {"logged_in": True}（不返回用户名等账号信息，预热结果会出现在状态查询中）
+
+        Raises:
+            ValueError: 未找到 SESSDATA
+        """
+        cookies = await asyncio.to_thread(self._get_cookies)
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+            'Referer': 'https://www.bilibili.com/',
+        }
+        nav_url = f"{API_BASE_URL}/x/web-interface/nav"
+        data = await get_json(nav_url, headers=headers, cookies=cookies)
+        await get_wbi_keys(nav_url, headers, cookies)
+        nav = data.get("data") or {}
+        if not nav.get("isLogin"):
+            log_warning("B站 SESSDATA 已失效（nav 接口返回未登录），请在浏览器中重新登录")
+        return {"logged_in": bool(nav.get("isLogin"))}
+
     async def get_info(self, source: str) -> Dict[str, Any]:
         """获取 B站视频基本信息"""
         bvid = self._extract_bvid(source)
@@ -100,10 +208,11 @@ class BilibiliService(SubtitleService):
             'Referer': 'https://www.bilibili.com/'
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers, cookies=self._get_cookies())
-            response.raise_for_status()
-            data = response.json()
+        cookies = self._get_cookies()
+        with stage("metadata"):
+            data = await get_json(
+                url, headers=headers, cookies=cookies, is_throttled=_is_risk_controlled
+            )
 
         if data['code'] != 0:
             raise ValueError(f"B站 API 返回错误: {data.get('message', '未知错误')}")
@@ -121,24 +230,45 @@ class BilibiliService(SubtitleService):
 
     async def list_subtitles(self, source: str) -> Dict[str, Any]:
         """列出 B站视频可用的字幕"""
-        video_info = await self.get_info(source)
+        video_info, _ = await self.get_cached_info(source)
+        return await self._list_player_subtitles(video_info)
+
+    async def _list_player_subtitles(self, video_info: Dict[str, Any]) -> Dict[str, Any]:
+        """请求播放器接口获取字幕列表（video_info 为 get_info() 的返回值）"""
         bvid = video_info['id']
         cid = video_info.get('cid')
 
-        url = f"{API_BASE_URL}/x/player/wbi/v2?bvid={bvid}&cid={cid}"
+        url = f"{API_BASE_URL}/x/player/wbi/v2"
 
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
             'Referer': f'https://www.bilibili.com/video/{bvid}',
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers, cookies=self._get_cookies())
-            response.raise_for_status()
-            data = response.json()
+        cookies = self._get_cookies()
+        with stage("subtitle_fetch"):
+            for attempt in range(2):
+                params = await sign_request_params(
+                    {"bvid": bvid, "cid": cid},
+                    f"{API_BASE_URL}/x/web-interface/nav",
+                    headers,
+                    cookies,
+                )
+                data = await get_json(
+                    url, headers=headers, cookies=cookies, params=params,
+                    is_throttled=_is_risk_controlled_signed
+                )
+                if data['code'] != WBI_SIGNATURE_CODE or attempt:
+                    break
+                # 签名校验失败，可能是 key 已更换：丢弃 key，立即重新签名重试一次
+                log_debug("WBI 签名被拒绝，重新获取 key 后重试")
+                invalidate_wbi_keys()
 
         if data['code'] != 0:
-            return {"available": False, "subtitles": [], "subtitle_count": 0, "error": data.get('message')}
+            return {
+                "available": False, "subtitles": [], "subtitle_count": 0,
+                "error": data.get('message'), "code": data['code'],
+            }
 
         subtitle_list = data['data'].get('subtitle', {}).get('subtitles', [])
         subtitles = [
@@ -146,54 +276,123 @@ class BilibiliService(SubtitleService):
             for sub in subtitle_list
         ]
 
-        return {"available": len(subtitles) > 0, "subtitles": subtitles, "subtitle_count": len(subtitles)}
+        result = {
+            "available": len(subtitles) > 0,
+            "subtitles": subtitles,
+            "subtitle_count": len(subtitles),
+            "cid": data['data'].get('cid'),
+        }
+        if not subtitles and "w_rid" not in params:
+            # 获取 WBI key 失败时退回未签名请求，未签名请求可能返回空字幕列表，不能据此判定没有字幕
+            result["error"] = "WBI 签名失败，未签名请求未返回字幕"
+        return result
+
+    async def _fetch_validated_subtitle(
+        self,
+        video_info: Dict[str, Any],
+        failures: Optional[List[str]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """获取并校验字幕，失败时有限次重试播放器接口
+
+        Args:
+            video_info: get_info() 的返回值
+            failures: 传入时追加接口报错和校验失败的原因（为空说明每次都确认没有字幕）
+
+        Returns:
+            通过校验的字幕 body；多次尝试后仍无可用字幕时返回 None
+        """
+        for attempt in range(SUBTITLE_MAX_ATTEMPTS):
+            if attempt:
+                inc_counter("subtitle_retries", service=self.name)
+                await asyncio.sleep(backoff_delay(attempt - 1))
+
+            subtitle_info = await self._list_player_subtitles(video_info)
+            if not subtitle_info['available']:
+                log_debug(f"播放器接口未返回字幕 ({attempt + 1}/{SUBTITLE_MAX_ATTEMPTS})")
+                if failures is not None and subtitle_info.get('error'):
+                    failures.append(subtitle_info['error'])
+                code = subtitle_info.get('code')
+                if code is not None and code not in RISK_CONTROL_CODES:
+                    # 视频不存在（-404）、cid 无效等错误重试也不会变，只重试风控和空列表
+                    log_debug(f"播放器接口返回错误码 {code}，不再重试")
+                    break
+                continue
+
+            subtitle_url = select_subtitle(subtitle_info['subtitles'])['subtitle_url']
+            if not subtitle_url.startswith('http'):
+                subtitle_url = 'https:' + subtitle_url
+
+            with stage("subtitle_fetch"):
+                subtitle_json = await get_json(subtitle_url, cache=True)
+
+            body = subtitle_json.get('body', [])
+            reason = validate_subtitle(body, video_info, subtitle_info.get('cid'))
+            if reason is None:
+                return body
+            log_warning(f"字幕校验失败: {reason} ({attempt + 1}/{SUBTITLE_MAX_ATTEMPTS})")
+            if failures is not None:
+                failures.append(reason)
+        return None
 
     async def download_subtitle(
         self,
         source: str,
         format: ResponseFormat = ResponseFormat.TEXT,
         model_size: str = "large",
-        show_progress: bool = True
+        show_progress: bool = True,
+        compact: Optional[CompactOptions] = None,
+        deadline: Optional[float] = None,
+        export: Optional[ExportOptions] = None,
+        time_range: Optional[TimeRange] = None
     ) -> Dict[str, Any]:
-        """下载 B站视频字幕，无字幕时自动 ASR 兜底"""
-        try:
-            subtitle_info = await self.list_subtitles(source)
+        """下载 B站视频字幕，无字幕时自动 ASR 兜底
 
-            if subtitle_info['available']:
+        指定 export 时，获取到的字幕同时导出为多种格式文件（只获取一次）；
+        指定 time_range 时只返回该时间范围的字幕（ASR 只下载和转录这一段）。
+        """
+        inc_counter("requests", service=self.name)
+        deadline_at = time.monotonic() + deadline if deadline else None
+        try:
+            video_info, subtitles = await self.get_cached_info(source)
+            self._check_time_range(time_range, video_info.get('duration'))
+            if subtitles is False:
+                # 近期确认过没有字幕，跳过播放器接口探测
+                log_debug("元信息缓存：该视频近期确认没有字幕")
+                body = None
+            else:
+                failures: List[str] = []
+                body = await self._fetch_validated_subtitle(video_info, failures)
+                # 接口报错或校验失败时不记为"没有字幕"
+                if (body is not None) != subtitles and (body is not None or not failures):
+                    self._record_subtitles(source, video_info, body is not None)
+
+            if body is not None:
                 # 有 API 字幕
-                zh_subtitle = None
-                for sub in subtitle_info['subtitles']:
-                    if sub['lan'] in ['ai-zh', 'zh-Hans', 'zh-CN', 'zh']:
-                        zh_subtitle = sub
-                        break
-                if not zh_subtitle:
-                    zh_subtitle = subtitle_info['subtitles'][0]
-
-                video_info = await self.get_info(source)
-                subtitle_url = zh_subtitle['subtitle_url']
-                if not subtitle_url.startswith('http'):
-                    subtitle_url = 'https:' + subtitle_url
-
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(subtitle_url)
-                    response.raise_for_status()
-                    subtitle_json = response.json()
-
-                body = subtitle_json.get('body', [])
                 log_success(f"API 获取成功，共 {len(body)} 条字幕")
 
-                segments = [
-                    {"start": item.get("from", 0), "end": item.get("to", 0), "content": item.get("content", "")}
-                    for item in body
-                ]
+                segments = parse_subtitle_body(body)
+                await self._index_transcript(
+                    video_info['id'], video_info['title'], segments, "bilibili_api", source
+                )
+                if time_range is not None:
+                    segments = clip_segments(segments, time_range)
 
-                return format_subtitle(segments, video_info['title'], format, source="bilibili_api")
+                return self._render(
+                    segments, video_info['title'], format, "bilibili_api", compact, export,
+                    video_info['id'], time_range
+                )
 
             # 无 API 字幕，ASR 兜底
             log_warning("该视频没有可用字幕，切换到 ASR 模式")
-            return await self._download_with_asr(source, format, model_size, show_progress)
+            inc_counter("asr_fallbacks", service=self.name)
+            return await self._download_with_asr(
+                source, format, model_size, show_progress, compact, deadline_at, export, time_range
+            )
 
+        except ResourceBusyError as e:
+            return self._busy_error(e)
         except Exception as e:
+            record_error(type(e).__name__)
             return {"error": f"下载字幕失败: {type(e).__name__}", "message": str(e)}
 
     async def _download_with_asr(
@@ -201,19 +400,25 @@ class BilibiliService(SubtitleService):
         source: str,
         format: ResponseFormat,
         model_size: str,
-        show_progress: bool
+        show_progress: bool,
+        compact: Optional[CompactOptions] = None,
+        deadline_at: Optional[float] = None,
+        export: Optional[ExportOptions] = None,
+        time_range: Optional[TimeRange] = None
     ) -> Dict[str, Any]:
-        """ASR 兜底下载"""
+        """ASR 兜底下载（指定 time_range 时只下载和转录这一段）"""
         with tempfile.TemporaryDirectory() as temp_dir:
             try:
                 log_step("下载视频并提取音频")
-                audio_file, video_title, video_id = await self.download_and_extract_audio(
-                    source, temp_dir, show_progress
+                audio_file, video_title, video_id = await self.prepare_audio(
+                    source, temp_dir, show_progress, time_range
                 )
                 log_success(f"音频提取完成: {os.path.basename(audio_file)}")
 
                 log_step("ASR 语音识别", "这可能需要几分钟...")
-                asr_result = await transcribe_with_asr(audio_file, model_size, show_progress)
+                asr_result = await transcribe_with_asr(
+                    audio_file, model_size, show_progress, deadline=self._remaining(deadline_at)
+                )
 
                 segments = asr_result.get("segments", [])
                 log_success(f"ASR 完成，共 {len(segments)} 个片段")
@@ -222,31 +427,50 @@ class BilibiliService(SubtitleService):
                     {"start": seg["start"], "end": seg["end"], "content": seg["text"]}
                     for seg in segments
                 ]
-
-                return format_subtitle(formatted, video_title, format, source="whisper_asr")
+                if time_range is None:
+                    await self._index_transcript(
+                        video_id, video_title, formatted, "whisper_asr", source
+                    )
+                formatted = self._to_video_timeline(formatted, time_range)
+
+                result = self._render(
+                    formatted, video_title, format, "whisper_asr", compact, export, video_id,
+                    time_range
+                )
+                return self._with_asr_model(result, asr_result)
 
             except subprocess.CalledProcessError as e:
+                record_error(type(e).__name__)
                 stderr = e.stderr if isinstance(e.stderr, str) else e.stderr.decode('utf-8', errors='ignore') if e.stderr else ''
                 suggestion = "请检查网络连接"
                 if 'not found' in stderr.lower():
                     suggestion = "请确保已安装 yt-dlp 和 ffmpeg"
                 return {"error": f"ASR失败: {type(e).__name__}", "message": str(e), "suggestion": suggestion}
+            except ResourceBusyError as e:
+                return self._busy_error(e)
             except Exception as e:
+                record_error(type(e).__name__)
                 return {"error": f"ASR失败: {type(e).__name__}", "message": str(e)}
 
     async def download_video(
         self,
         source: str,
         output_dir: str,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> tuple[str, str, str]:
-        """下载 B站视频"""
-        info = await self.get_info(source)
+        """下载 B站视频（指定 time_range 时只下载该时间范围的音频）"""
+        info, _ = await self.get_cached_info(source)
         video_title = info.get("title", "video")
         bvid = info.get("id", self._extract_bvid(source))
 
         safe_title = make_safe_filename(video_title)
-        video_filename = os.path.join(output_dir, f"{safe_title}.mp4")
+        if time_range is None:
+            video_filename = os.path.join(output_dir, f"{safe_title}.mp4")
+            range_args = []
+        else:
+            video_filename = os.path.join(output_dir, f"{safe_title}.{time_range.label()}.m4a")
+            range_args = section_args(time_range)
 
         os.makedirs(output_dir, exist_ok=True)
 
@@ -254,13 +478,26 @@ class BilibiliService(SubtitleService):
             return video_filename, video_title, bvid
 
         if show_progress:
-            log_step("正在下载视频")
-
-        result = subprocess.run(['yt-dlp', '--quiet', '--no-progress', '-o', video_filename, f"https://www.bilibili.com/video/{bvid}"], capture_output=True)
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(result.returncode, result.args, stderr=result.stderr.decode('utf-8', errors='ignore'))
+            if time_range is None:
+                log_step("正在下载视频")
+            else:
+                log_step(f"正在下载音频片段 {time_range.label()}")
+
+        with stage("media_download"):
+            await run_yt_dlp(
+                ['--quiet', '--no-progress', '-o', video_filename] + range_args
+                + [f"https://www.bilibili.com/video/{bvid}"],
+                host="bilibili.com",
+                resource="download"
+            )
 
         return video_filename, video_title, bvid
 
-    def extract_audio(self, video_file: str, output_dir: Optional[str] = None, show_progress: bool = True) -> str:
-        return extract_audio(video_file, output_dir, show_progress)
+    def extract_audio(
+        self,
+        video_file: str,
+        output_dir: Optional[str] = None,
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> str:
+        return extract_audio(video_file, output_dir, show_progress, time_range)
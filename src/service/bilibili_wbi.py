@@ -0,0 +1,159 @@
+"""
+B站 WBI 签名 - 为 /x/player/wbi/* 等接口生成 w_rid / wts 参数
+
+未签名的请求越来越多地被返回空字幕列表，导致有字幕的视频误走 ASR 兜底。
+
+签名所需的 img_key / sub_key 来自 nav 接口（未登录时同样返回），每天更换一次；
+这里在进程内共享，并写入缓存目录供其他进程复用，日期变化后重新获取。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+from core.cache import atomic_write, get_cache_dir
+from core.http import get_json
+from core.logging import log_debug, log_warning
+
+# 由 img_key + sub_key 生成 mixin key 的重排表
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52,
+]
+
+# 参数值中需要去除的字符
+_FILTERED_CHARS = "!'()*"
+
+_KEYS_FILE = "wbi_keys.json"
+
+_keys: Optional[Tuple[str, str, str]] = None  # (日期, img_key, sub_key)
+_keys_lock: Optional[asyncio.Lock] = None
+_keys_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_mixin_key(img_key: str, sub_key: str) -> str:
+    """按重排表打乱 img_key + sub_key，取前 32 位"""
+    orig = img_key + sub_key
+    return "".join(orig[i] for i in MIXIN_KEY_ENC_TAB)[:32]
+
+
+def sign_params(
+    params: Dict[str, Any],
+    img_key: str,
+    sub_key: str,
+    wts: Optional[int] = None
+) -> Dict[str, Any]:
+    """为请求参数添加 wts 和 w_rid
+
+    Args:
+        params: 原始查询参数
+        img_key: nav 接口返回的 img_key
+        sub_key: nav 接口返回的 sub_key
+        wts: 时间戳（秒），默认当前时间
+
+    Returns:
+        按键排序、附带 wts 和 w_rid 的新参数字典
+    """
+    signed = dict(params)
+    signed["wts"] = int(time.time()) if wts is None else wts
+    signed = {
+        key: "".join(ch for ch in str(value) if ch not in _FILTERED_CHARS)
+        for key, value in sorted(signed.items())
+    }
+    query = urllib.parse.urlencode(signed)
+    mixin_key = get_mixin_key(img_key, sub_key)
+    signed["w_rid"] = hashlib.md5((query + mixin_key).encode("utf-8")).hexdigest()
+    return signed
+
+
+def _key_from_url(url: str) -> str:
+    """从 https://i0.hdslb.com/bfs/wbi/<key>.png 中取出 key"""
+    return os.path.splitext(os.path.basename(urllib.parse.urlparse(url).path))[0]
+
+
+def _today() -> str:
+    return time.strftime("%Y%m%d")
+
+
+def _load_cached_keys() -> Optional[Tuple[str, str, str]]:
+    try:
+        with open(os.path.join(get_cache_dir(), _KEYS_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["date"], data["img_key"], data["sub_key"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def invalidate_wbi_keys() -> None:
+    """丢弃已缓存的 key（签名被拒绝时调用，下次请求重新获取）"""
+    global _keys
+    _keys = None
+    try:
+        os.unlink(os.path.join(get_cache_dir(), _KEYS_FILE))
+    except OSError:
+        pass
+
+
+async def get_wbi_keys(
+    nav_url: str,
+    headers: Optional[Dict[str, str]] = None,
+    cookies: Optional[Dict[str, str]] = None
+) -> Tuple[str, str]:
+    """获取当天的 (img_key, sub_key)：依次查找进程内缓存、磁盘缓存、nav 接口
+
+    Raises:
+        ValueError: nav 接口未返回 wbi_img
+    """
+    global _keys, _keys_lock, _keys_lock_loop
+    today = _today()
+    if _keys and _keys[0] == today:
+        return _keys[1], _keys[2]
+
+    # 同一事件循环内的并发请求只获取一次 key
+    loop = asyncio.get_running_loop()
+    if _keys_lock is None or _keys_lock_loop is not loop:
+        _keys_lock = asyncio.Lock()
+        _keys_lock_loop = loop
+    async with _keys_lock:
+        if _keys and _keys[0] == today:
+            return _keys[1], _keys[2]
+
+        cached = _load_cached_keys()
+        if cached and cached[0] == today:
+            _keys = cached
+            return cached[1], cached[2]
+
+        # 未登录时 nav 返回 code=-101，但 wbi_img 仍然有效，因此不检查 code
+        data = await get_json(nav_url, headers=headers, cookies=cookies)
+        wbi_img = (data.get("data") or {}).get("wbi_img") or {}
+        img_key = _key_from_url(wbi_img.get("img_url", ""))
+        sub_key = _key_from_url(wbi_img.get("sub_url", ""))
+        if not img_key or not sub_key:
+            raise ValueError(f"nav 接口未返回 WBI key: {data.get('message', '未知错误')}")
+
+        _keys = (today, img_key, sub_key)
+        payload = {"date": today, "img_key": img_key, "sub_key": sub_key}
+        atomic_write(os.path.join(get_cache_dir(), _KEYS_FILE), json.dumps(payload).encode("utf-8"))
+        log_debug("已更新 WBI key")
+        return img_key, sub_key
+
+
+async def sign_request_params(
+    params: Dict[str, Any],
+    nav_url: str,
+    headers: Optional[Dict[str, str]] = None,
+    cookies: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """为请求参数签名；无法获取 key 时返回未签名的参数（退回旧行为）"""
+    try:
+        img_key, sub_key = await get_wbi_keys(nav_url, headers, cookies)
+    except Exception as e:
+        log_warning(f"获取 WBI key 失败，使用未签名请求: {type(e).__name__}: {e}")
+        return dict(params)
+    return sign_params(params, img_key, sub_key)
@@ -5,13 +5,19 @@
 import os
 import subprocess
 import tempfile
+import time
 from typing import Dict, Any, Optional
 
 from .base import SubtitleService
-from core.formatter import ResponseFormat, format_subtitle
-from core.audio import extract_audio, is_video_file, is_audio_file
+from core.compact import CompactOptions
+from core.export import ExportOptions
+from core.formatter import ResponseFormat
+from core.audio import extract_audio, get_audio_duration, is_video_file, is_audio_file
 from core.asr import transcribe_with_asr
 from core.logging import log_step, log_success, log_info
+from core.governor import ResourceBusyError
+from core.metrics import inc_counter, record_error
+from core.timerange import TimeRange
 
 
 class LocalService(SubtitleService):
@@ -51,9 +57,18 @@ class LocalService(SubtitleService):
         source: str,
         format: ResponseFormat = ResponseFormat.TEXT,
         model_size: str = "large",
-        show_progress: bool = True
+        show_progress: bool = True,
+        compact: Optional[CompactOptions] = None,
+        deadline: Optional[float] = None,
+        export: Optional[ExportOptions] = None,
+        time_range: Optional[TimeRange] = None
     ) -> Dict[str, Any]:
-        """对本地音频/视频文件进行 ASR 转录"""
+        """对本地音频/视频文件进行 ASR 转录（指定 export 时同时导出为多种格式文件）
+
+        指定 time_range 时 ffmpeg 直接定位到开始时间，只提取和转录这一段。
+        """
+        inc_counter("requests", service=self.name)
+        deadline_at = time.monotonic() + deadline if deadline else None
         if not os.path.exists(source):
             return {"error": "文件不存在", "message": f"文件不存在: {source}"}
 
@@ -64,15 +79,26 @@ class LocalService(SubtitleService):
         log_info("字幕来源: Whisper ASR语音识别 (AI生成)")
 
         try:
-            if is_video_file(source):
+            if time_range is not None:
+                self._check_time_range(time_range, get_audio_duration(source))
+            if is_video_file(source) or (time_range is not None and is_audio_file(source)):
                 with tempfile.TemporaryDirectory() as temp_dir:
-                    log_step("提取音频")
-                    audio_file = extract_audio(source, temp_dir, show_progress)
+                    if time_range is None:
+                        log_step("提取音频")
+                    else:
+                        log_step(f"提取音频片段 {time_range.label()}")
+                    audio_file = await self._extract_audio_limited(
+                        source, temp_dir, show_progress, time_range
+                    )
                     log_step("ASR 语音识别", "这可能需要几分钟...")
-                    asr_result = await transcribe_with_asr(audio_file, model_size, show_progress)
+                    asr_result = await transcribe_with_asr(
+                        audio_file, model_size, show_progress, deadline=self._remaining(deadline_at)
+                    )
             elif is_audio_file(source):
                 log_step("ASR 语音识别", "这可能需要几分钟...")
-                asr_result = await transcribe_with_asr(source, model_size, show_progress)
+                asr_result = await transcribe_with_asr(
+                    source, model_size, show_progress, deadline=self._remaining(deadline_at)
+                )
             else:
                 return {
                     "error": "不支持的文件格式",
@@ -88,10 +114,20 @@ class LocalService(SubtitleService):
                 {"start": seg["start"], "end": seg["end"], "content": seg["text"]}
                 for seg in segments
             ]
-
-            return format_subtitle(formatted, file_title, format, source="whisper_asr")
+            if time_range is None:
+                await self._index_transcript(
+                    os.path.abspath(source), file_title, formatted, "whisper_asr", source
+                )
+            formatted = self._to_video_timeline(formatted, time_range)
+
+            result = self._render(
+                formatted, file_title, format, "whisper_asr", compact, export, file_title,
+                time_range
+            )
+            return self._with_asr_model(result, asr_result)
 
         except subprocess.CalledProcessError as e:
+            record_error(type(e).__name__)
             stderr = e.stderr if isinstance(e.stderr, str) else e.stderr.decode('utf-8', errors='ignore') if e.stderr else ''
             return {
                 "error": "ASR转录失败",
@@ -99,27 +135,48 @@ class LocalService(SubtitleService):
                 "stderr": stderr[:200] if stderr else None,
                 "suggestion": "请确保已安装 ffmpeg: brew install ffmpeg"
             }
+        except ResourceBusyError as e:
+            return self._busy_error(e)
         except Exception as e:
+            record_error(type(e).__name__)
             return {"error": f"ASR转录失败: {type(e).__name__}", "message": str(e)}
 
     async def download_video(
         self,
         source: str,
         output_dir: str,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> tuple[str, str, str]:
-        """本地文件不需要下载，直接返回文件路径"""
+        """本地文件不需要下载，直接返回文件路径（时间范围在提取音频时定位）"""
         if not os.path.exists(source):
             raise FileNotFoundError(f"文件不存在: {source}")
 
         file_title = os.path.splitext(os.path.basename(source))[0]
         return source, file_title, file_title
 
+    async def download_and_extract_audio(
+        self,
+        source: str,
+        output_dir: str,
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> tuple[str, str, str]:
+        """直接从源文件提取音频（不预占下载磁盘，也不删除源文件）"""
+        video_file, file_title, file_id = await self.download_video(
+            source, output_dir, show_progress
+        )
+        audio_file = await self._extract_audio_limited(
+            video_file, output_dir, show_progress, time_range
+        )
+        return audio_file, file_title, file_id
+
     def extract_audio(
         self,
         video_file: str,
         output_dir: Optional[str] = None,
-        show_progress: bool = True
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
     ) -> str:
         """从视频文件中提取音频"""
-        return extract_audio(video_file, output_dir, show_progress)
+        return extract_audio(video_file, output_dir, show_progress, time_range)
@@ -0,0 +1,286 @@
+"""
+本地目录批量转录 - 遍历目录树，只转录新增或变更的文件
+
+清单文件（目录下的 .video-captions-manifest.json）记录每个文件的大小、修改时间、
+内容指纹和输出文件。重新扫描只需 stat：大小和修改时间都未变的文件直接跳过；
+变了但内容指纹相同（复制、touch）的只更新清单。结果经 core.export 写到媒体文件旁的
+同名 .srt / .json 等文件（原子写入，读到的总是完整文件）；同一目录下有主名相同的
+其他媒体文件（如 talk.mp4 和 talk.wav）时保留扩展名（talk.mp4.srt），互不覆盖。
+
+监听模式定时重新扫描，新文件的大小和修改时间在连续两次扫描中不变（已写完）后才处理。
+转录失败的文件按指数退避重试（5 分钟、10 分钟……），连续失败 MAX_ATTEMPTS 次后
+只在内容变化或指定 retry_failed 时重试。
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .local import LocalService
+from core.audio import is_audio_file, is_video_file
+from core.cache import atomic_write, fingerprint_file
+from core.export import ExportOptions
+from core.formatter import ResponseFormat
+from core.logging import log_error, log_info, log_success, log_warning
+
+MANIFEST_NAME = ".video-captions-manifest.json"
+
+# 默认同时转录的文件数（ASR 本身还受资源调度的名额限制）
+DEFAULT_JOBS = 2
+# 监听模式的扫描间隔（秒）
+DEFAULT_INTERVAL = 30.0
+# 旁路输出格式
+OUTPUT_FORMATS = (ResponseFormat.SRT, ResponseFormat.JSON)
+# 失败重试：第 n 次失败后等待 RETRY_DELAY * 2^(n-1) 秒，连续失败 MAX_ATTEMPTS 次后不再自动重试
+RETRY_DELAY = 300.0
+MAX_ATTEMPTS = 5
+
+
+def _rel_key(root: str, path: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def _is_media(path: str) -> bool:
+    return is_video_file(path) or is_audio_file(path)
+
+
+def sidecar_stem(path: str) -> str:
+    """旁路文件名主体：通常为去掉扩展名的文件名；同目录下有主名相同的其他媒体文件时保留扩展名"""
+    directory, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    try:
+        siblings = os.listdir(directory)
+    except OSError:
+        siblings = []
+    for other in siblings:
+        if other == name or os.path.splitext(other)[0] != stem:
+            continue
+        if _is_media(os.path.join(directory, other)):
+            return name
+    return stem
+
+
+class DirectoryBatch:
+    """目录批量转录：维护清单，只处理新增或变更的文件"""
+
+    def __init__(
+        self,
+        root: str,
+        model_size: str = "large",
+        jobs: int = DEFAULT_JOBS,
+        formats: Tuple[ResponseFormat, ...] = OUTPUT_FORMATS,
+        service: Optional[LocalService] = None,
+        retry_failed: bool = False
+    ):
+        self.root = os.path.abspath(root)
+        self.model_size = model_size
+        self.jobs = max(1, jobs)
+        self.formats = formats
+        self.service = service or LocalService()
+        # 忽略退避和次数上限，立即重试清单中所有失败的文件
+        self.retry_failed = retry_failed
+        self.manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        self.entries: Dict[str, Dict[str, Any]] = self._load_manifest()
+        self.scanned = 0
+        # 监听模式：上一次扫描时未处理文件的 (大小, 修改时间)
+        self._last_seen: Dict[str, Tuple[int, float]] = {}
+
+    # ---- 清单 ----
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log_warning(f"清单文件无法读取，将重新处理全部文件: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        data = {"version": 1, "files": self.entries}
+        atomic_write(
+            self.manifest_path, json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")
+        )
+
+    # ---- 扫描 ----
+
+    def _walk(self) -> List[Tuple[str, os.stat_result]]:
+        """目录树中的音频/视频文件（跳过隐藏目录和文件）"""
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for name in sorted(filenames):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                if not _is_media(path):
+                    continue
+                try:
+                    found.append((path, os.stat(path)))
+                except OSError:
+                    continue
+        return found
+
+    def _retry_due(self, entry: Dict[str, Any]) -> bool:
+        """失败的文件是否到了重试时间"""
+        if self.retry_failed:
+            return True
+        attempts = entry.get("attempts", 1)
+        if attempts >= MAX_ATTEMPTS:
+            return False
+        return time.time() - entry.get("failed_at", 0.0) >= RETRY_DELAY * 2 ** (attempts - 1)
+
+    def _is_current(self, path: str, st: os.stat_result, entry: Optional[Dict[str, Any]]) -> bool:
+        """清单记录仍然有效（文件未变且输出齐全，或上次失败后文件未变且未到重试时间）
+
+        内容指纹相同但修改时间变了时就地更新 entry 的修改时间。
+        """
+        if entry is None or entry.get("size") != st.st_size:
+            return False
+        if "error" in entry:
+            if self._retry_due(entry):
+                return False
+        else:
+            directory = os.path.dirname(path)
+            outputs = entry.get("outputs", {})
+            if set(outputs) != {fmt.value for fmt in self.formats}:
+                return False
+            if not all(os.path.exists(os.path.join(directory, name)) for name in outputs.values()):
+                return False
+        if entry.get("mtime") == st.st_mtime:
+            return True
+        # 修改时间变了：内容指纹相同（复制、touch）时只更新清单
+        if entry.get("fingerprint") == fingerprint_file(path):
+            entry["mtime"] = st.st_mtime
+            return True
+        return False
+
+    def scan(self, settle: bool = False) -> List[str]:
+        """找出需要转录的文件
+
+        Args:
+            settle: 只返回大小和修改时间与上次扫描相同的文件（监听模式，跳过仍在写入的文件）
+        """
+        pending = []
+        seen = set()
+        changed = False
+        files = self._walk()
+        self.scanned = len(files)
+        for path, st in files:
+            key = _rel_key(self.root, path)
+            seen.add(key)
+            entry = self.entries.get(key)
+            recorded_mtime = entry.get("mtime") if entry else None
+            if self._is_current(path, st, entry):
+                changed = changed or recorded_mtime != st.st_mtime
+                continue
+            observed = (st.st_size, st.st_mtime)
+            if settle and self._last_seen.get(key) != observed:
+                self._last_seen[key] = observed
+                continue
+            self._last_seen.pop(key, None)
+            pending.append(path)
+
+        removed = [key for key in self.entries if key not in seen]
+        for key in removed:
+            del self.entries[key]
+        if removed or changed:
+            self._save_manifest()
+        return pending
+
+    # ---- 转录 ----
+
+    async def _process(self, path: str) -> Dict[str, Any]:
+        """转录一个文件并写出旁路文件，返回该文件的处理结果"""
+        key = _rel_key(self.root, path)
+        st = os.stat(path)
+        fingerprint = await asyncio.to_thread(fingerprint_file, path)
+        directory = os.path.dirname(path)
+        result = await self.service.download_subtitle(
+            path, self.formats[0], model_size=self.model_size, show_progress=False,
+            export=ExportOptions(directory, self.formats, sidecar_stem(path))
+        )
+        entry: Dict[str, Any] = {
+            "size": st.st_size, "mtime": st.st_mtime, "fingerprint": fingerprint
+        }
+
+        if "error" in result:
+            if "retry_after" in result:
+                # 资源繁忙：不记入清单，下次扫描重试
+                log_warning(f"{key}: {result['message']}")
+                return {"file": key, "status": "busy"}
+            log_error(f"{key}: {result.get('message', result['error'])}")
+            # 内容未变时累计失败次数，用于退避；内容变化后从头计数
+            previous = self.entries.get(key, {})
+            same = "error" in previous and previous.get("fingerprint") == fingerprint
+            entry["error"] = result["error"]
+            entry["attempts"] = previous.get("attempts", 1) + 1 if same else 1
+            entry["failed_at"] = time.time()
+            self.entries[key] = entry
+            self._save_manifest()
+            return {"file": key, "status": "failed", "error": result["error"]}
+
+        if "export_error" in result:
+            log_error(f"{key}: {result['export_error']}")
+            return {"file": key, "status": "failed", "error": result["export_error"]}
+
+        outputs = {fmt: os.path.basename(output) for fmt, output in result["exported"].items()}
+        # 文件名变了（如后来出现同名的其他媒体文件）：删除上次写出、本次不再使用的旁路文件
+        previous = self.entries.get(key, {}).get("outputs", {})
+        for name in set(previous.values()) - set(outputs.values()):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        entry.update({
+            "outputs": outputs,
+            "model_size": result.get("model_size", self.model_size),
+            "subtitle_count": result["subtitle_count"],
+            "transcribed_at": time.time(),
+        })
+        self.entries[key] = entry
+        self._save_manifest()
+        log_success(f"{key}: {result['subtitle_count']} 条字幕 → {', '.join(outputs.values())}")
+        return {"file": key, "status": "transcribed", "subtitle_count": result["subtitle_count"]}
+
+    async def run_once(self, settle: bool = False) -> Dict[str, Any]:
+        """扫描一次并转录所有新增或变更的文件（最多 jobs 个并发）
+
+        Returns:
+            {"root": "...", "scanned": 120, "pending": 3, "transcribed": 2, "failed": 1,
+             "files": [...]}
+        """
+        pending = self.scan(settle)
+        if pending:
+            log_info(f"待转录 {len(pending)} 个文件（并发 {self.jobs}）")
+        semaphore = asyncio.Semaphore(self.jobs)
+
+        async def worker(path: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self._process(path)
+                except OSError as e:
+                    # 处理期间文件被移动或删除
+                    log_warning(f"{_rel_key(self.root, path)}: {e}")
+                    return {"file": _rel_key(self.root, path), "status": "skipped", "error": str(e)}
+
+        files = await asyncio.gather(*(worker(path) for path in pending))
+        return {
+            "root": self.root,
+            "scanned": self.scanned,
+            "pending": len(pending),
+            "transcribed": sum(1 for f in files if f["status"] == "transcribed"),
+            "failed": sum(1 for f in files if f["status"] == "failed"),
+            "files": files,
+        }
+
+    async def watch(self, interval: float = DEFAULT_INTERVAL) -> None:
+        """持续监听目录：先处理已有文件，之后每 interval 秒扫描一次新文件（直到被取消）"""
+        await self.run_once()
+        log_info(f"正在监听 {self.root}（每 {interval:.0f} 秒扫描一次，Ctrl+C 退出）")
+        while True:
+            await asyncio.sleep(interval)
+            await self.run_once(settle=True)
@@ -0,0 +1,182 @@
+"""
+启动预热 - 服务启动后在后台完成首个请求原本要承担的准备工作
+
+刚启动的 MCP 服务器（或守护进程）处理第一个请求时，要同时承担 Cookie 读取、
+建立 HTTPS 连接、加载繁简转换词典，以及 ASR 模型的下载和加载。启动后各预热步骤
+在后台并发执行，不阻塞服务；就绪状态和各步骤进度通过 MCP get_status 工具、
+HTTP /ready 端点和守护进程 status 查询。
+
+步骤（VIDEO_CAPTIONS_WARMUP，逗号分隔，0/off 禁用，默认全部）：
+- text: 加载繁简转换词典
+- bilibili: 读取 Cookie、建立到 API 的连接、校验登录状态、预取 WBI key
+- youtube: 运行一次 yt-dlp
+- asr: 下载 VIDEO_CAPTIONS_WARMUP_MODELS（如 large,small）中的模型权重，
+  并在每个 ASR worker 中加载第一个模型；未配置模型时跳过
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .bilibili import BilibiliService
+from .youtube import YouTubeService
+from core.asr import is_asr_available, preload_models
+from core.logging import log_debug, log_success, log_warning
+from core.text import convert_to_simplified
+
+WARMUP_ENV = "VIDEO_CAPTIONS_WARMUP"
+WARMUP_MODELS_ENV = "VIDEO_CAPTIONS_WARMUP_MODELS"
+
+STEPS = ("text", "bilibili", "youtube", "asr")
+
+# 已结束的步骤状态
+FINISHED = ("done", "failed", "skipped")
+
+
+class WarmupSkipped(Exception):
+    """步骤不适用（如未配置预加载模型），跳过"""
+
+
+@dataclass
+class StepState:
+    """单个预热步骤的状态"""
+    status: str = "pending"   # pending / running / done / failed / skipped
+    seconds: Optional[float] = None
+    detail: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class Warmup:
+    """一次启动预热（各步骤并发执行，失败的步骤只记录错误）"""
+
+    def __init__(self, steps: List[str], models: List[str], browser: Optional[str] = "auto"):
+        self.steps = {name: StepState() for name in steps}
+        self.models = models
+        self.browser = browser
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """所有步骤都已结束（成功、失败或跳过）"""
+        return all(state.status in FINISHED for state in self.steps.values())
+
+    async def _run_step(self, name: str) -> None:
+        state = self.steps[name]
+        state.status = "running"
+        start = time.perf_counter()
+        try:
+            state.detail = await _STEP_RUNNERS[name](self)
+            state.status = "done"
+        except WarmupSkipped as e:
+            state.status = "skipped"
+            state.error = str(e)
+        except Exception as e:
+            state.status = "failed"
+            state.error = f"{type(e).__name__}: {e}"
+            log_warning(f"预热步骤 {name} 失败: {state.error}")
+        state.seconds = round(time.perf_counter() - start, 3)
+        log_debug(f"预热步骤 {name}: {state.status}（{state.seconds}s）")
+
+    async def run(self) -> None:
+        """执行全部步骤"""
+        await asyncio.gather(*(self._run_step(name) for name in self.steps))
+        self.finished_at = time.time()
+        log_success(f"启动预热完成（{self.finished_at - self.started_at:.1f}s）")
+
+    def start(self) -> None:
+        """在当前事件循环中后台执行"""
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """取消未完成的预热"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        """就绪状态与各步骤进度（JSON 可序列化）"""
+        finished = sum(1 for state in self.steps.values() if state.status in FINISHED)
+        end = self.finished_at or time.time()
+        return {
+            "ready": self.ready,
+            "progress": {"finished": finished, "total": len(self.steps)},
+            "elapsed": round(end - self.started_at, 3),
+            "steps": {name: asdict(state) for name, state in self.steps.items()},
+        }
+
+
+async def _warm_text(warmup: Warmup) -> Optional[Dict[str, Any]]:
+    await asyncio.to_thread(convert_to_simplified, "預熱繁簡轉換")
+    return None
+
+
+async def _warm_bilibili(warmup: Warmup) -> Dict[str, Any]:
+    return await BilibiliService(warmup.browser).warm_up()
+
+
+async def _warm_youtube(warmup: Warmup) -> Dict[str, Any]:
+    return await YouTubeService(warmup.browser).warm_up()
+
+
+async def _warm_asr(warmup: Warmup) -> Dict[str, Any]:
+    if not warmup.models:
+        raise WarmupSkipped(f"未配置预加载模型（{WARMUP_MODELS_ENV}）")
+    if not is_asr_available():
+        raise WarmupSkipped("未安装 mlx-whisper")
+    return await preload_models(warmup.models)
+
+
+_STEP_RUNNERS: Dict[str, Callable[[Warmup], Awaitable[Optional[Dict[str, Any]]]]] = {
+    "text": _warm_text,
+    "bilibili": _warm_bilibili,
+    "youtube": _warm_youtube,
+    "asr": _warm_asr,
+}
+
+
+def load_warmup_steps() -> List[str]:
+    """读取要执行的预热步骤（未知步骤忽略）"""
+    value = os.environ.get(WARMUP_ENV, ",".join(STEPS)).strip().lower()
+    if value in ("0", "false", "no", "off", ""):
+        return []
+    names = dict.fromkeys(part.strip() for part in value.split(","))
+    return [name for name in names if name in STEPS]
+
+
+def load_warmup_models() -> List[str]:
+    """读取要预加载的 ASR 模型（按优先级，第一个常驻 worker）"""
+    value = os.environ.get(WARMUP_MODELS_ENV, "")
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+_warmup: Optional[Warmup] = None
+
+
+def start_warmup(browser: Optional[str] = "auto") -> Optional[Warmup]:
+    """在当前事件循环中启动预热（重复调用返回已有的预热；禁用时返回 None）"""
+    global _warmup
+    if _warmup is None:
+        steps = load_warmup_steps()
+        if not steps:
+            return None
+        _warmup = Warmup(steps, load_warmup_models(), browser)
+        _warmup.start()
+    return _warmup
+
+
+def get_warmup() -> Optional[Warmup]:
+    return _warmup
+
+
+def warmup_status() -> Dict[str, Any]:
+    """当前进程的预热状态；未启用预热时视为就绪"""
+    if _warmup is None:
+        return {"ready": True, "progress": {"finished": 0, "total": 0}, "steps": {}}
+    return _warmup.status()
@@ -7,21 +7,156 @@ import os
 import re
 import subprocess
 import tempfile
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Iterator, Optional, List, Tuple
 
 from .base import SubtitleService
-from core.formatter import ResponseFormat, format_subtitle
+from core.compact import CompactOptions
+from core.export import ExportOptions
+from core.formatter import ResponseFormat
 from core.audio import extract_audio
 from core.asr import transcribe_with_asr
 from core.logging import log_debug, log_success, log_warning, log_step
+from core.governor import ResourceBusyError
+from core.metrics import inc_counter, record_error, stage
 from core.text import make_safe_filename
+from core.timerange import TimeRange, clip_segments
+from core.ytdlp import run_yt_dlp, section_args
 
 
+YOUTUBE_HOST = "youtube.com"
+
 YOUTUBE_LANG_PRIORITY = [
     "zh-Hans-en", "zh-Hant-en", "zh-Hans", "zh-Hant", "zh-CN", "zh-TW", "zh-HK", "zh", "en"
 ]
 
 
+def iter_json3_events(content: str) -> Iterator[Dict[str, Any]]:
+    """逐个解析 json3 的 events 数组元素，不构建完整的对象树
+
+    顶层的其他字段（pens、wsWinStyles 等）会被解析后丢弃。
+
+    Raises:
+        ValueError: JSON 格式错误
+    """
+    decoder = json.JSONDecoder()
+    length = len(content)
+
+    def skip(pos: int, *chars: str) -> int:
+        while pos < length and content[pos] in " \t\r\n":
+            pos += 1
+        if chars:
+            if pos >= length or content[pos] not in chars:
+                raise ValueError(f"json3 格式错误: 位置 {pos} 处应为 {'/'.join(chars)}")
+            pos += 1
+        return pos
+
+    pos = skip(0, "{")
+    if skip(pos) < length and content[skip(pos)] == "}":
+        return
+    while True:
+        key, pos = decoder.raw_decode(content, skip(pos))
+        pos = skip(pos, ":")
+        if key == "events":
+            pos = skip(pos, "[")
+            if content[skip(pos)] == "]":
+                pos = skip(pos) + 1
+            else:
+                while True:
+                    event, pos = decoder.raw_decode(content, skip(pos))
+                    if isinstance(event, dict):
+                        yield event
+                    pos = skip(pos)
+                    if content[pos] == "]":
+                        pos += 1
+                        break
+                    pos = skip(pos, ",")
+        else:
+            _, pos = decoder.raw_decode(content, skip(pos))
+        pos = skip(pos)
+        if pos >= length or content[pos] == "}":
+            return
+        pos = skip(pos, ",")
+
+
+def _merge_rolling(
+    segments: List[Dict[str, Any]], start: float, end: float, lines: List[str]
+) -> None:
+    """将一个字幕事件合并进已有片段，去除滚动窗口带来的重复
+
+    - 与上一事件完全相同，或以其为前缀（逐词增长）：把新增部分并入上一条并延长
+    - 开头若干行与上一事件末尾若干行相同（滚动换行，末行可继续增长）：只保留新增的文本
+    """
+    text = " ".join(lines)
+    if segments:
+        prev = segments[-1]
+        prev_text = " ".join(prev["_lines"])
+        if text.startswith(prev_text):
+            prev["content"] = (prev["content"] + text[len(prev_text):]).strip()
+            prev["_lines"] = lines
+            prev["end"] = max(prev["end"], end)
+            return
+        prev_lines = prev["_lines"]
+        for overlap in range(min(len(prev_lines), len(lines)), 0, -1):
+            # 重叠部分的最后一行可能在新事件中继续增长
+            if (prev_lines[len(prev_lines) - overlap:-1] == lines[:overlap - 1]
+                    and lines[overlap - 1].startswith(prev_lines[-1])):
+                grown = lines[overlap - 1][len(prev_lines[-1]):].strip()
+                rest = ([grown] if grown else []) + lines[overlap:]
+                if not rest:
+                    prev["end"] = max(prev["end"], end)
+                    return
+                text = " ".join(rest)
+                break
+    segments.append({"start": start, "end": end, "content": text, "_lines": lines})
+
+
+def parse_json3(content: str) -> Optional[List[Dict[str, Any]]]:
+    """解析 YouTube json3 字幕为统一的字幕片段列表
+
+    逐事件流式解析；跳过空事件和仅含换行的 aAppend 事件，并裁剪结束时间使相邻
+    片段不重叠。只有自动字幕（事件带 aAppend / wWinId 滚动窗口标记）才合并滚动
+    窗口中重复的文本，人工字幕的每个事件原样保留（包括相同或共享前缀的相邻行）。
+
+    Returns:
+        [{"start", "end", "content"}]，格式错误时返回 None
+    """
+    events: List[Tuple[float, float, List[str]]] = []
+    rolling = False
+    try:
+        for event in iter_json3_events(content):
+            if "aAppend" in event or "wWinId" in event:
+                rolling = True
+            if "segs" in event:
+                text = "".join(seg.get("utf8", "") for seg in event["segs"])
+            else:
+                text = event.get("text", "")
+            lines = [line.strip() for line in text.split("\n") if line.strip()]
+            if not lines:
+                continue
+            start_ms = event.get("tStartMs", 0)
+            end_ms = start_ms + event.get("dDurationMs", 0)
+            events.append((start_ms / 1000.0, end_ms / 1000.0, lines))
+    except (ValueError, IndexError, AttributeError, TypeError):
+        return None
+
+    segments: List[Dict[str, Any]] = []
+    for start, end, lines in events:
+        if rolling:
+            _merge_rolling(segments, start, end, lines)
+        else:
+            segments.append(
+                {"start": start, "end": end, "content": " ".join(lines), "_lines": lines}
+            )
+
+    for current, following in zip(segments, segments[1:]):
+        if following["start"] > current["start"]:
+            current["end"] = min(current["end"], following["start"])
+    for segment in segments:
+        del segment["_lines"]
+    return segments
+
+
 class YouTubeService(SubtitleService):
     """YouTube 字幕服务"""
 
@@ -55,17 +190,38 @@ class YouTubeService(SubtitleService):
             return url.split('/v/')[1].split('?')[0].split('/')[0]
         raise ValueError(f"无法从 URL 中提取 YouTube 视频 ID: {url}")
 
+    def get_video_id(self, source: str) -> Optional[str]:
+        return self._extract_video_id(source)
+
     def _get_cookie_args(self) -> List[str]:
         if self.browser and self.browser != "auto":
             return ['--cookies-from-browser', self.browser]
         return []
 
+    async def warm_up(self) -> Dict[str, Any]:
+        """启动预热：运行一次 yt-dlp（把可执行文件和 Python 模块读入页缓存）
+
+        Returns:
+            {"yt_dlp": "2025.01.15"}
+
+        Raises:
+            FileNotFoundError: 未安装 yt-dlp
+        """
+        # 与实际请求一样经 run_yt_dlp 运行（VIDEO_CAPTIONS_YT_DLP 指定的可执行文件）
+        result = await run_yt_dlp(["--version"], host=YOUTUBE_HOST, text=True, max_attempts=1)
+        return {"yt_dlp": result.stdout.strip()}
+
     async def get_info(self, source: str) -> Dict[str, Any]:
         video_id = self._extract_video_id(source)
-        cmd = ['yt-dlp', '--quiet', '--no-progress', '--dump-json', '--no-download'] + self._get_cookie_args() + [source]
+        args = (
+            ['--quiet', '--no-progress', '--dump-json', '--no-download']
+            + self._get_cookie_args()
+            + [source]
+        )
 
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            with stage("metadata"):
+                result = await run_yt_dlp(args, host=YOUTUBE_HOST, text=True)
             info = json.loads(result.stdout)
 
             subtitles = list(info.get('subtitles', {}).keys())
@@ -90,7 +246,7 @@ class YouTubeService(SubtitleService):
 
     async def list_subtitles(self, source: str) -> Dict[str, Any]:
         try:
-            info = await self.get_info(source)
+            info, _ = await self.get_cached_info(source)
             langs = info.get('available_subtitles', [])
             subtitles = [{"lan": lang, "lan_doc": lang} for lang in langs]
             return {"available": len(subtitles) > 0, "subtitles": subtitles, "subtitle_count": len(subtitles)}
@@ -111,12 +267,26 @@ class YouTubeService(SubtitleService):
         source: str,
         format: ResponseFormat = ResponseFormat.TEXT,
         model_size: str = "large",
-        show_progress: bool = True
+        show_progress: bool = True,
+        compact: Optional[CompactOptions] = None,
+        deadline: Optional[float] = None,
+        export: Optional[ExportOptions] = None,
+        time_range: Optional[TimeRange] = None
     ) -> Dict[str, Any]:
-        """下载 YouTube 视频字幕，无字幕时自动 ASR 兜底"""
+        """下载 YouTube 视频字幕，无字幕时自动 ASR 兜底
+
+        指定 export 时，获取到的字幕同时导出为多种格式文件（只获取一次）；
+        指定 time_range 时只返回该时间范围的字幕（ASR 只下载和转录这一段）。
+        """
+        inc_counter("requests", service=self.name)
+        deadline_at = time.monotonic() + deadline if deadline else None
         try:
-            info = await self.get_info(source)
-            available = info.get('available_subtitles', [])
+            info, subtitles = await self.get_cached_info(source)
+            self._check_time_range(time_range, info.get('duration'))
+            # 近期确认过没有可用字幕时跳过字幕下载
+            available = info.get('available_subtitles', []) if subtitles is not False else []
+            # 确认没有字幕（视频没有字幕轨道或字幕内容为空）时才记为负向条目，下载失败不记录
+            confirmed_none = subtitles is not False and not available
 
             if available:
                 lang = self._select_lang(available)
@@ -125,13 +295,14 @@ class YouTubeService(SubtitleService):
 
                 with tempfile.TemporaryDirectory() as temp_dir:
                     output = os.path.join(temp_dir, '%(id)s')
-                    cmd = [
-                        'yt-dlp', '--quiet', '--no-progress', '--write-subs', '--write-auto-subs',
+                    args = [
+                        '--quiet', '--no-progress', '--write-subs', '--write-auto-subs',
                         '--sub-lang', lang, '--skip-download', '--sub-format', 'json3',
                         '-o', output
                     ] + self._get_cookie_args() + [source]
 
-                    subprocess.run(cmd, capture_output=True, text=True)
+                    with stage("subtitle_fetch"):
+                        await run_yt_dlp(args, host=YOUTUBE_HOST, text=True, check=False)
 
                     sub_file = None
                     for f in os.listdir(temp_dir):
@@ -143,81 +314,133 @@ class YouTubeService(SubtitleService):
                         with open(sub_file, 'r', encoding='utf-8') as f:
                             content = f.read()
 
-                        segments = self._parse_json3(content)
+                        segments = parse_json3(content)
+                        confirmed_none = segments == []
                         if segments:
                             log_success(f"YouTube 字幕获取成功，共 {len(segments)} 条")
-                            return format_subtitle(segments, info['title'], format, source="youtube_api")
+                            if subtitles is not True:
+                                self._record_subtitles(source, info, True)
+                            await self._index_transcript(
+                                info['id'], info['title'], segments, "youtube_api", source
+                            )
+                            if time_range is not None:
+                                segments = clip_segments(segments, time_range)
+                            return self._render(
+                                segments, info['title'], format, "youtube_api", compact,
+                                export, info['id'], time_range
+                            )
 
             # 无字幕，ASR 兜底
             log_warning("该视频没有可用字幕，切换到 ASR 模式")
-            return await self._download_with_asr(source, format, model_size, show_progress)
-
+            if confirmed_none:
+                self._record_subtitles(source, info, False)
+            inc_counter("asr_fallbacks", service=self.name)
+            return await self._download_with_asr(
+                source, format, model_size, show_progress, compact, deadline_at, export, time_range
+            )
+
+        except ResourceBusyError as e:
+            return self._busy_error(e)
         except Exception as e:
+            record_error(type(e).__name__)
             return {"error": f"下载字幕失败: {type(e).__name__}", "message": str(e)}
 
-    def _parse_json3(self, content: str) -> Optional[List[Dict]]:
-        try:
-            data = json.loads(content)
-            segments = []
-            for event in data.get('events', []):
-                text = ''.join(s.get('utf8', '') for s in event.get('segs', [])) if 'segs' in event else event.get('text', '')
-                if text.strip():
-                    segments.append({
-                        'start': event.get('tStartMs', 0) / 1000.0,
-                        'end': (event.get('tStartMs', 0) + event.get('dDurationMs', 0)) / 1000.0,
-                        'content': text.strip()
-                    })
-            return segments
-        except Exception:
-            return None
-
-    async def _download_with_asr(self, source: str, format: ResponseFormat, model_size: str, show_progress: bool) -> Dict[str, Any]:
-        """ASR 兜底下载"""
+    async def _download_with_asr(
+        self,
+        source: str,
+        format: ResponseFormat,
+        model_size: str,
+        show_progress: bool,
+        compact: Optional[CompactOptions] = None,
+        deadline_at: Optional[float] = None,
+        export: Optional[ExportOptions] = None,
+        time_range: Optional[TimeRange] = None
+    ) -> Dict[str, Any]:
+        """ASR 兜底下载（指定 time_range 时只下载和转录这一段）"""
         with tempfile.TemporaryDirectory() as temp_dir:
             try:
                 log_step("下载视频并提取音频")
-                audio_file, video_title, video_id = await self.download_and_extract_audio(source, temp_dir, show_progress)
+                audio_file, video_title, video_id = await self.prepare_audio(
+                    source, temp_dir, show_progress, time_range
+                )
                 log_success(f"音频提取完成: {os.path.basename(audio_file)}")
 
                 log_step("ASR 语音识别", "这可能需要几分钟...")
-                asr_result = await transcribe_with_asr(audio_file, model_size, show_progress)
+                asr_result = await transcribe_with_asr(
+                    audio_file, model_size, show_progress, deadline=self._remaining(deadline_at)
+                )
 
                 segments = asr_result.get("segments", [])
                 log_success(f"ASR 完成，共 {len(segments)} 个片段")
 
                 formatted = [{"start": s["start"], "end": s["end"], "content": s["text"]} for s in segments]
-                return format_subtitle(formatted, video_title, format, source="whisper_asr")
+                if time_range is None:
+                    await self._index_transcript(
+                        video_id, video_title, formatted, "whisper_asr", source
+                    )
+                formatted = self._to_video_timeline(formatted, time_range)
+                result = self._render(
+                    formatted, video_title, format, "whisper_asr", compact, export, video_id,
+                    time_range
+                )
+                return self._with_asr_model(result, asr_result)
 
             except subprocess.CalledProcessError as e:
+                record_error(type(e).__name__)
                 stderr = e.stderr if isinstance(e.stderr, str) else e.stderr.decode('utf-8', errors='ignore') if e.stderr else ''
                 return {"error": "ASR失败", "message": stderr[:200] or str(e)}
+            except ResourceBusyError as e:
+                return self._busy_error(e)
             except Exception as e:
+                record_error(type(e).__name__)
                 return {"error": f"ASR失败: {type(e).__name__}", "message": str(e)}
 
-    async def download_video(self, source: str, output_dir: str, show_progress: bool = True) -> tuple[str, str, str]:
-        info = await self.get_info(source)
+    async def download_video(
+        self,
+        source: str,
+        output_dir: str,
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> tuple[str, str, str]:
+        info, _ = await self.get_cached_info(source)
         title = make_safe_filename(info.get("title", "video"))
         video_id = info.get("id", self._extract_video_id(source))
-        filename = os.path.join(output_dir, f"{title}.mp4")
+        if time_range is None:
+            filename = os.path.join(output_dir, f"{title}.mp4")
+        else:
+            filename = os.path.join(output_dir, f"{title}.{time_range.label()}.m4a")
 
         os.makedirs(output_dir, exist_ok=True)
         if os.path.exists(filename):
             return filename, info.get("title", "video"), video_id
 
         if show_progress:
-            log_step("正在下载 YouTube 视频")
-
-        cmd = [
-            'yt-dlp', '--quiet', '--no-progress', '-o', filename,
-            '--format', 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            '--merge-output-format', 'mp4',
-        ] + self._get_cookie_args() + [source]
-
-        result = subprocess.run(cmd, capture_output=True)
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(result.returncode, cmd, stderr=result.stderr.decode('utf-8', errors='ignore'))
+            if time_range is None:
+                log_step("正在下载 YouTube 视频")
+            else:
+                log_step(f"正在下载音频片段 {time_range.label()}")
+
+        if time_range is None:
+            args = [
+                '--quiet', '--no-progress', '-o', filename,
+                '--format', 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+                '--merge-output-format', 'mp4',
+            ]
+        else:
+            # 只下载该时间范围的音频流
+            args = ['--quiet', '--no-progress', '-o', filename] + section_args(time_range)
+        args += self._get_cookie_args() + [source]
+
+        with stage("media_download"):
+            await run_yt_dlp(args, host=YOUTUBE_HOST, resource="download")
 
         return filename, info.get("title", "video"), video_id
 
-    def extract_audio(self, video_file: str, output_dir: Optional[str] = None, show_progress: bool = True) -> str:
-        return extract_audio(video_file, output_dir, show_progress)
+    def extract_audio(
+        self,
+        video_file: str,
+        output_dir: Optional[str] = None,
+        show_progress: bool = True,
+        time_range: Optional[TimeRange] = None
+    ) -> str:
+        return extract_audio(video_file, output_dir, show_progress, time_range)
@@ -0,0 +1,89 @@
+"""
+测试用例 - ASR worker 进程
+
+使用假的转录函数（在 worker 进程中运行）验证:
+1. 音频经共享内存传入 worker，结果经队列返回
+2. worker 的 stdout 输出不会写入主进程
+3. worker 异常退出时任务失败并自动重启
+4. 预加载任务分派到每个 worker
+"""
+
+import os
+import struct
+import wave
+
+import pytest
+
+from core.asr_worker import ASRWorkerError, ASRWorkerPool
+
+SAMPLE_RATE = 16000
+
+
+def fake_transcribe(audio, path_or_hf_repo: str, **options):
+    """假的转录函数：返回采样数与最大振幅，并向 stdout 输出干扰内容"""
+    print("model noise on stdout")
+    if path_or_hf_repo == "crash":
+        os._exit(3)
+    if path_or_hf_repo == "fail":
+        raise ValueError("decode failed")
+    return {
+        "segments": [{
+            "start": 0.0,
+            "end": len(audio) / SAMPLE_RATE,
+            "text": f" {len(audio)} {float(abs(audio).max()):.2f} {options.get('language')} ",
+        }],
+        "language": options.get("language", "zh"),
+    }
+
+
+@pytest.fixture
+def wav_file(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack("<h", 16384) * SAMPLE_RATE)
+    return path
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path / "cache"))
+    pool = ASRWorkerPool(1, transcriber=f"{__name__}:fake_transcribe")
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_transcribe_in_worker(pool, wav_file, capfd):
+    """测试音频经共享内存传入 worker 并返回结果"""
+    result = await pool.transcribe(wav_file, "model", {"language": "zh"})
+
+    assert result["segments"][0]["text"] == f"{SAMPLE_RATE} 0.50 zh"
+    assert result["segments"][0]["end"] == 1.0
+    assert set(result["timings"]) == {"model_load", "asr_decode"}
+    assert "model noise" not in capfd.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_worker_errors(pool, wav_file):
+    """测试转录异常和 worker 崩溃都以 ASRWorkerError 返回，且 worker 会重启"""
+    with pytest.raises(ASRWorkerError, match="decode failed"):
+        await pool.transcribe(wav_file, "fail", {})
+
+    with pytest.raises(ASRWorkerError, match="异常退出"):
+        await pool.transcribe(wav_file, "crash", {})
+
+    result = await pool.transcribe(wav_file, "model", {"language": "zh"})
+    assert result["segments"]
+
+
+@pytest.mark.asyncio
+async def test_preload(pool, wav_file):
+    """测试预加载任务在每个 worker 中执行，之后正常转录"""
+    timings = await pool.preload("model")
+    assert len(timings) == 1
+
+    result = await pool.transcribe(wav_file, "model", {"language": "zh"})
+    assert result["segments"]
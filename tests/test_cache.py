@@ -0,0 +1,106 @@
+"""
+测试用例 - 磁盘缓存
+
+覆盖:
+1. 文件存取与元信息
+2. 超过容量上限时按 LRU 淘汰
+3. 缓存禁用时直接返回源文件
+4. 内容指纹与 ASR 结果缓存
+"""
+
+import os
+import shutil
+
+import pytest
+
+from core.asr import MODEL_MAP, _asr_cache_key, _store_cached_result, transcribe_with_asr
+from core.cache import DiskCache, fingerprint_file
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+def _make_file(directory, name: str, size: int) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_put_and_lookup(cache_dir):
+    """测试存入后可命中，且 move 会移走源文件"""
+    cache = DiskCache("audio", 1024)
+    src = _make_file(cache_dir, "a.wav", 100)
+
+    path = cache.put_file("bilibili:BV1", src, ".wav", meta={"title": "标题"}, move=True)
+    assert not os.path.exists(src)
+    assert os.path.exists(path)
+
+    entry = cache.lookup("bilibili:BV1")
+    assert entry["path"] == path
+    assert entry["meta"]["title"] == "标题"
+    assert cache.lookup("bilibili:BV2") is None
+
+
+def test_lru_eviction(cache_dir):
+    """测试超过容量上限时淘汰最久未访问的条目"""
+    cache = DiskCache("audio", 250)
+    cache.put_file("k1", _make_file(cache_dir, "1.wav", 100))
+    cache.put_file("k2", _make_file(cache_dir, "2.wav", 100))
+
+    # 访问 k1，使 k2 成为最久未使用
+    assert cache.lookup("k1")
+    cache.put_file("k3", _make_file(cache_dir, "3.wav", 100))
+
+    assert cache.lookup("k1") is not None
+    assert cache.lookup("k2") is None
+    assert cache.lookup("k3") is not None
+    assert cache.total_size() <= 250
+
+
+def test_bytes_roundtrip_and_disabled(cache_dir):
+    """测试字节存取，以及容量为 0 时缓存禁用"""
+    cache = DiskCache("asr", 1024)
+    cache.put_bytes("key", b"payload", ".bin")
+    assert cache.get_bytes("key") == b"payload"
+
+    disabled = DiskCache("off", 0)
+    src = _make_file(cache_dir, "x.wav", 10)
+    assert disabled.put_file("key", src) == src
+    assert disabled.lookup("key") is None
+
+
+def test_fingerprint_ignores_path(cache_dir):
+    """测试内容相同的文件指纹一致，内容不同则不一致"""
+    src = os.path.join(cache_dir, "meeting.wav")
+    with open(src, "wb") as f:
+        f.write(os.urandom(3 * 1024 * 1024))
+    copy = os.path.join(cache_dir, "renamed.wav")
+    shutil.copyfile(src, copy)
+
+    assert fingerprint_file(src) == fingerprint_file(copy)
+
+    with open(copy, "r+b") as f:
+        f.write(b"changed")
+    assert fingerprint_file(src) != fingerprint_file(copy)
+
+
+@pytest.mark.asyncio
+async def test_asr_cache_hit_skips_backend(cache_dir):
+    """测试相同音频换路径后直接命中 ASR 缓存"""
+    src = os.path.join(cache_dir, "a.wav")
+    with open(src, "wb") as f:
+        f.write(os.urandom(1024))
+    segments = [{"start": 0.0, "end": 1.5, "text": "你好"}]
+    _store_cached_result(_asr_cache_key(src, MODEL_MAP["large"], vad=True), segments, "zh")
+
+    renamed = os.path.join(cache_dir, "b.wav")
+    shutil.copyfile(src, renamed)
+    result = await transcribe_with_asr(renamed, "large", show_progress=False)
+
+    assert result["cached"] is True
+    assert result["segments"] == segments
+    assert result["text"] == "你好"
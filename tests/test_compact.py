@@ -0,0 +1,62 @@
+"""
+测试用例 - 紧凑文本格式
+
+覆盖:
+1. 段落合并与稀疏时间戳
+2. 幻觉行与连续重复行去除
+3. 超出预算时沿时间轴均匀采样
+"""
+
+from core.compact import CompactOptions, build_compact, estimate_tokens
+from core.formatter import ResponseFormat, format_subtitle
+
+
+def _segments(texts, step: float = 2.0):
+    return [
+        {"start": i * step, "end": i * step + step - 0.2, "content": text}
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_merge_and_timestamps():
+    """测试短片段合并为段落，时间戳按间隔稀疏输出"""
+    segments = _segments(["今天我们", "聊一聊缓存。"] * 60)
+
+    result = build_compact(segments, CompactOptions(timestamp_interval=60))
+    lines = result["content"].split("\n")
+
+    assert result["paragraph_count"] < len(segments)
+    assert lines[0].startswith("[00:00] 今天我们 聊一聊缓存。今天我们")
+    stamped = [line for line in lines if line.startswith("[")]
+    assert 1 < len(stamped) <= len(lines)
+    assert not result["sampled"]
+
+
+def test_drop_hallucinations():
+    """测试 ASR 幻觉文本和连续重复行被去除"""
+    segments = _segments(["你好", "你好。", "谢谢观看", "再见"], step=0.5)
+
+    asr = build_compact(segments, CompactOptions(timestamp_interval=0), asr=True)
+    api = build_compact(segments, CompactOptions(timestamp_interval=0), asr=False)
+
+    assert asr["content"] == "你好 再见"
+    assert "谢谢观看" in api["content"]
+
+
+def test_budget_samples_whole_timeline():
+    """测试超出预算时保留开头、中间和结尾附近的内容"""
+    segments = [
+        {"start": i * 10.0, "end": i * 10.0 + 5, "content": f"第{i}段内容。"}
+        for i in range(200)
+    ]
+
+    result = format_subtitle(
+        segments, "标题", ResponseFormat.COMPACT, compact=CompactOptions(max_tokens=300)
+    )
+
+    assert result["format"] == "compact"
+    assert result["sampled"]
+    assert estimate_tokens(result["content"]) <= 300
+    assert "[00:" in result["content"]
+    # 末尾附近的段落也被保留（不是截掉结尾）
+    assert any(f"第{i}段" in result["content"] for i in range(180, 200))
@@ -0,0 +1,77 @@
+"""
+测试用例 - 本地守护进程
+
+覆盖:
+1. 守护进程未运行时 call_daemon 返回 None（CLI 在本进程内执行）
+2. ping / 不支持的来源 / 未知操作
+3. 套接字上已有守护进程时拒绝重复启动
+4. 请求发出后连接中断返回错误而不是 None（CLI 不重复执行），非对象请求返回无效请求
+"""
+
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+from handler.daemon import CaptionsDaemon, DaemonRunningError, call_daemon
+
+
+def test_call_without_daemon(tmp_path):
+    """测试套接字不存在时返回 None"""
+    assert call_daemon({"op": "ping"}, str(tmp_path / "missing.sock")) is None
+
+
+def _send_raw(path, data: bytes):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(data)
+        with sock.makefile("rb") as reader:
+            return json.loads(reader.readline())
+
+
+@pytest.mark.asyncio
+async def test_daemon_requests(tmp_path):
+    """测试守护进程处理请求并拒绝重复启动"""
+    path = str(tmp_path / "d.sock")
+    daemon = CaptionsDaemon(path)
+    await daemon.start()
+    try:
+        assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+        status = await asyncio.to_thread(call_daemon, {"op": "ping"}, path)
+        assert status["pid"] == os.getpid()
+
+        response = await asyncio.to_thread(
+            call_daemon, {"op": "download", "source": "https://example.com/x"}, path
+        )
+        assert response["result"]["error"] == "不支持的来源"
+        assert daemon.requests == 1
+
+        assert "error" in await asyncio.to_thread(call_daemon, {"op": "nope"}, path)
+        assert await asyncio.to_thread(_send_raw, path, b"[1, 2]\n") == {"error": "无效的请求"}
+
+        with pytest.raises(DaemonRunningError):
+            await asyncio.to_thread(CaptionsDaemon(path)._claim_socket)
+    finally:
+        await daemon.close()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.asyncio
+async def test_connection_dropped_after_send(tmp_path):
+    """测试请求发出后守护进程断开连接时返回错误（守护进程可能已执行，不能回退到本进程）"""
+    path = str(tmp_path / "d.sock")
+
+    async def drop(reader, writer):
+        await reader.readline()
+        writer.close()
+
+    server = await asyncio.start_unix_server(drop, path=path)
+    try:
+        response = await asyncio.to_thread(call_daemon, {"op": "download", "source": "x"}, path)
+    finally:
+        server.close()
+        await server.wait_closed()
+    assert response["error"] == "守护进程连接中断"
@@ -0,0 +1,98 @@
+"""
+测试用例 - 多格式导出
+
+覆盖:
+1. 同一组片段写出 text/srt/json，文件名由标题清理得到，标题为空时使用视频 ID
+2. 服务层按请求格式返回结果的同时导出，写入失败记录在 export_error 中
+3. 格式列表解析（去重、非法格式报错）
+4. 同名的不同视频文件名带视频 ID；MCP 指定的输出目录限制在导出根目录之内
+"""
+
+import json
+import os
+
+import pytest
+
+from core.export import (
+    ExportOptions,
+    export_filename,
+    export_subtitles,
+    parse_formats,
+    resolve_export_dir,
+)
+from core.formatter import ResponseFormat
+from service.base import SubtitleService
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "content": "第一句"},
+    {"start": 1.5, "end": 3.0, "content": "第二句"},
+]
+
+
+def test_export_all_formats(tmp_path):
+    """测试一次写出多种格式，文件名确定"""
+    written = export_subtitles(
+        SEGMENTS, 'A/B: "测试"?', ExportOptions(str(tmp_path)), source="bilibili_api"
+    )
+
+    assert written == {
+        "text": str(tmp_path / "AB 测试.txt"),
+        "srt": str(tmp_path / "AB 测试.srt"),
+        "json": str(tmp_path / "AB 测试.json"),
+    }
+    assert (tmp_path / "AB 测试.txt").read_text(encoding="utf-8") == "第一句\n第二句"
+    assert "00:00:01,500 --> 00:00:03,000" in (tmp_path / "AB 测试.srt").read_text(encoding="utf-8")
+    data = json.loads((tmp_path / "AB 测试.json").read_text(encoding="utf-8"))
+    assert data["subtitle_count"] == 2 and data["source"] == "bilibili_api"
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+    assert export_filename("???", "BV1xx") == "BV1xx"
+    assert export_filename("", None) == "subtitle"
+
+
+def test_render_with_export(tmp_path):
+    """测试服务层返回请求格式的结果并附带导出路径，写入失败不影响结果"""
+    options = ExportOptions(str(tmp_path / "out"), (ResponseFormat.SRT, ResponseFormat.COMPACT))
+    result = SubtitleService._render(
+        SEGMENTS, "标题", ResponseFormat.TEXT, "whisper_asr", export=options
+    )
+    assert result["content"] == "第一句\n第二句"
+    assert sorted(result["exported"]) == ["compact", "srt"]
+    assert os.path.exists(tmp_path / "out" / "标题.compact.txt")
+
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    result = SubtitleService._render(
+        SEGMENTS, "标题", ResponseFormat.TEXT, "whisper_asr",
+        export=ExportOptions(str(blocker / "out"))
+    )
+    assert result["content"] == "第一句\n第二句"
+    assert "exported" not in result and result["export_error"]
+
+
+def test_parse_formats():
+    """测试格式列表解析"""
+    assert parse_formats("srt, json,srt") == (ResponseFormat.SRT, ResponseFormat.JSON)
+    with pytest.raises(ValueError):
+        parse_formats("srt,docx")
+    with pytest.raises(ValueError):
+        parse_formats(" , ")
+
+
+def test_same_title_and_export_root(tmp_path, monkeypatch):
+    """测试同名视频不互相覆盖，输出目录不能逃出导出根目录"""
+    assert export_filename("直播回放", "BV1a") == "直播回放 [BV1a]"
+    assert export_filename("直播回放", "BV1b") != export_filename("直播回放", "BV1a")
+    assert export_filename("talk", "talk") == "talk"
+
+    root = tmp_path / "exports"
+    monkeypatch.setenv("VIDEO_CAPTIONS_EXPORT_DIR", str(root))
+    assert resolve_export_dir("notes") == os.path.realpath(root / "notes")
+    assert resolve_export_dir(str(root / "a" / "b")) == os.path.realpath(root / "a" / "b")
+    for bad in ("../outside", "/etc", str(tmp_path)):
+        with pytest.raises(ValueError):
+            resolve_export_dir(bad)
+    root.mkdir()
+    (root / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        resolve_export_dir("link/escape")
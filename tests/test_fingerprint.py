@@ -0,0 +1,142 @@
+"""
+测试用例 - 音频指纹
+
+使用合成的宽带音频验证:
+1. 截取片段（音量变化、加噪）能匹配到原音频，偏移正确，转录对齐到片段时间轴
+2. 无关音频不匹配，低精度模型的转录不用于高精度请求
+3. 转录片段按偏移平移并截断到查询音频范围
+4. 指纹匹配的转录只写入其实际模型的 ASR 缓存键，指纹查找在 asr 名额内进行
+"""
+
+import contextlib
+import wave
+
+import numpy as np
+import pytest
+
+import core.asr as asr
+from core.fingerprint import align_segments, compute_fingerprint, find_match, index_fingerprint
+
+SAMPLE_RATE = 16000
+BLOCK = 800
+
+
+def synth_audio(seconds: float, seed: int) -> np.ndarray:
+    """每 50ms 换一次频谱包络的带限噪声（近似语音/音乐的频谱变化）"""
+    rng = np.random.default_rng(seed)
+    freqs = np.fft.rfftfreq(BLOCK * 2, 1 / SAMPLE_RATE)
+    blocks = []
+    for _ in range(int(seconds * SAMPLE_RATE) // BLOCK):
+        center, width = rng.uniform(200, 3000), rng.uniform(100, 800)
+        envelope = np.exp(-((freqs - center) / width) ** 2)
+        spectrum = (rng.normal(size=len(freqs)) + 1j * rng.normal(size=len(freqs))) * envelope
+        blocks.append(np.fft.irfft(spectrum)[:BLOCK] * rng.uniform(0.2, 1))
+    audio = np.concatenate(blocks)
+    return (audio / np.abs(audio).max() * 20000).astype(np.int16)
+
+
+@pytest.fixture
+def indexed(tmp_path, monkeypatch):
+    """索引一段 60 秒音频（每 5 秒一个片段）"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+    audio = synth_audio(60, seed=1)
+    segments = [
+        {"start": float(t), "end": float(t + 5), "text": f"第{t}秒"} for t in range(0, 60, 5)
+    ]
+    assert index_fingerprint("original", compute_fingerprint(audio), segments, "zh", "medium", 60.0)
+    return audio
+
+
+def test_match_excerpt(indexed):
+    """测试截取的片段（音量减半、加噪）匹配到原音频"""
+    start = int(12.3 * SAMPLE_RATE)
+    excerpt = indexed[start:start + 30 * SAMPLE_RATE].astype(np.float64) * 0.5
+    excerpt += np.random.default_rng(2).normal(0, 200, len(excerpt))
+    match = find_match(excerpt.astype(np.int16), "small")
+
+    assert match is not None
+    assert match["content_key"] == "original"
+    assert match["model_size"] == "medium"
+    assert abs(match["offset"] - 12.3) < 0.02
+    assert match["bit_error_rate"] < 0.15
+    assert match["segments"][0]["text"] == "第10秒"
+    assert match["segments"][0]["start"] == 0.0
+    assert match["segments"][-1]["end"] <= 30.0
+
+
+def test_no_match(indexed):
+    """测试无关音频不匹配，medium 的转录不用于 large 请求"""
+    assert find_match(synth_audio(30, seed=9), "base") is None
+    assert find_match(indexed[:30 * SAMPLE_RATE], "large") is None
+    assert find_match(indexed[:30 * SAMPLE_RATE], "medium") is not None
+
+
+def test_align_segments():
+    """测试片段平移与截断"""
+    segments = [
+        {"start": 0.0, "end": 4.0, "text": "a"},
+        {"start": 4.0, "end": 9.0, "text": "b"},
+        {"start": 9.0, "end": 12.0, "text": "c"},
+    ]
+    assert align_segments(segments, 5.0, 5.0) == [
+        {"start": 0.0, "end": 4.0, "text": "b"},
+        {"start": 4.0, "end": 5.0, "text": "c"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_match_cached_under_its_own_model(tmp_path, monkeypatch):
+    """测试 large 的匹配结果不写入 small 的缓存键，指纹查找在 asr 名额内进行"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("VIDEO_CAPTIONS_ASR_WORKERS", "0")
+    audio_file = str(tmp_path / "clip.wav")
+    with wave.open(audio_file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(synth_audio(12, seed=4).tobytes())
+
+    def fake_lookup(path, model_size):
+        return None, {
+            "content_key": "original", "offset": 0.0, "bit_error_rate": 0.1, "language": "zh",
+            "model_size": "large", "segments": [{"start": 0.0, "end": 5.0, "text": "匹配"}],
+        }
+
+    def fake_transcribe(path, model_path, vad):
+        return {"segments": [{"start": 0.0, "end": 5.0, "text": "转录"}], "language": "zh",
+                "audio_seconds": 12.0, "timings": {"model_load": 0.0, "asr_decode": 0.1}}
+
+    monkeypatch.setattr(asr, "_fingerprint_lookup", fake_lookup)
+    monkeypatch.setattr(asr, "_transcribe_in_process", fake_transcribe)
+
+    result = await asr.transcribe_with_asr(audio_file, "small", show_progress=False)
+    assert result["model_size"] == "large" and result["fingerprint_match"]
+    vad = asr.is_vad_enabled()
+    small_key = asr._asr_cache_key(audio_file, asr.MODEL_MAP["small"], vad)
+    large_key = asr._asr_cache_key(audio_file, asr.MODEL_MAP["large"], vad)
+    assert asr._load_cached_result(small_key) is None
+    assert asr._load_cached_result(large_key) is not None
+
+    # 指纹查找在 asr 名额内进行（预占内存）
+    slots, held, looked_up = [], [], []
+    original_slot = asr.get_governor().slot
+
+    @contextlib.asynccontextmanager
+    async def tracking_slot(stage, memory=0, disk=0):
+        slots.append((stage, memory))
+        async with original_slot(stage, memory=memory, disk=disk):
+            held.append(stage)
+            yield
+            held.remove(stage)
+
+    def fake_lookup(path, size):
+        looked_up.append(list(held))
+        return None, None
+
+    monkeypatch.setattr(asr.get_governor(), "slot", tracking_slot)
+    monkeypatch.setattr(asr, "_fingerprint_lookup", fake_lookup)
+    result = await asr.transcribe_with_asr(audio_file, "medium", show_progress=False)
+    assert result["model_size"] == "medium"
+    assert result["segments"][0]["text"] == "转录"
+    assert looked_up == [["asr"]]
+    assert slots == [("asr", asr.estimate_asr_memory("medium", 12.0))]
@@ -0,0 +1,129 @@
+"""
+测试用例 - 资源调度
+
+覆盖:
+1. 阶段名额用满后排队，队列满时立即拒绝并给出 retry_after
+2. 内存预算不足时等待，超出总预算的申请按总量计
+3. 排队中被取消不会泄漏名额
+4. 下载的视频提取后删除，本地源文件即使与输出目录相同也不删除
+"""
+
+import asyncio
+
+import pytest
+
+from core.governor import MB, ResourceBusyError, ResourceGovernor, StageLimit
+from service.local import LocalService
+from service.youtube import YouTubeService
+
+
+def _governor(slots: int = 1, queue: int = 1, memory: int = 100) -> ResourceGovernor:
+    return ResourceGovernor({"asr": StageLimit(slots, queue)}, memory_bytes=memory, disk_bytes=100)
+
+
+@pytest.mark.asyncio
+async def test_queue_and_reject():
+    """测试名额用满后排队，队列满时拒绝"""
+    governor = _governor()
+    order = []
+
+    async def job(name: str, release: asyncio.Event):
+        async with governor.slot("asr"):
+            order.append(name)
+            await release.wait()
+
+    first, second = asyncio.Event(), asyncio.Event()
+    tasks = [asyncio.create_task(job("a", first)), asyncio.create_task(job("b", second))]
+    await asyncio.sleep(0)
+    assert governor.stats()["stages"]["asr"] == {"active": 1, "waiting": 1, "slots": 1, "queue": 1}
+
+    with pytest.raises(ResourceBusyError) as exc:
+        async with governor.slot("asr"):
+            pass
+    assert exc.value.stage == "asr"
+    assert exc.value.retry_after >= 1.0
+
+    first.set()
+    second.set()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert governor.stats()["stages"]["asr"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_budget():
+    """测试内存预算不足时等待，超大申请按总预算计、可以单独运行"""
+    governor = _governor(slots=0, queue=4, memory=100 * MB)
+    release = asyncio.Event()
+    used = []
+
+    async def hold():
+        async with governor.slot("asr", memory=60 * MB):
+            await release.wait()
+
+    async def large():
+        async with governor.slot("asr", memory=500 * MB):
+            used.append(governor.stats()["memory"]["used_mb"])
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(large())
+    await asyncio.sleep(0)
+    assert not used
+
+    release.set()
+    await asyncio.gather(holder, waiting)
+    assert used == [100.0]
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_waiting():
+    """测试排队中取消后名额和队列计数恢复"""
+    governor = _governor(queue=2)
+    release = asyncio.Event()
+
+    async def hold():
+        async with governor.slot("asr"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert governor.stats()["stages"]["asr"]["waiting"] == 0
+    release.set()
+    await holder
+    async with governor.slot("asr"):
+        assert governor.stats()["stages"]["asr"]["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_only_downloaded_video(monkeypatch, tmp_path):
+    """测试只删除下载的临时视频，不删除本地源文件"""
+    def extract(self, video_file, output_dir=None, show_progress=True, time_range=None):
+        audio_file = str(tmp_path / "audio.wav")
+        open(audio_file, "wb").close()
+        return audio_file
+
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"video")
+    monkeypatch.setattr(LocalService, "extract_audio", extract)
+    await LocalService().download_and_extract_audio(str(source), str(tmp_path), show_progress=False)
+    assert source.exists()
+
+    downloaded = tmp_path / "downloaded.mp4"
+
+    async def download(self, source, output_dir, show_progress=True, time_range=None):
+        downloaded.write_bytes(b"video")
+        return str(downloaded), "标题", "id"
+
+    monkeypatch.setattr(YouTubeService, "download_video", download)
+    monkeypatch.setattr(YouTubeService, "extract_audio", extract)
+    await YouTubeService().download_and_extract_audio(
+        "https://youtu.be/x", str(tmp_path), show_progress=False
+    )
+    assert not downloaded.exists()
@@ -0,0 +1,130 @@
+"""
+测试用例 - 限流与重试
+
+覆盖:
+1. AIMD 并发上限的增长与减半，失败（5xx）时不增长
+2. 限流响应后自动退避重试
+3. 不可重试的错误直接抛出
+4. HTTP 缓存的条件请求与内容寻址 URL
+"""
+
+import httpx
+import pytest
+
+import core.http as http
+from core.ratelimit import AdaptiveConcurrency, configure_host_limit
+
+
+@pytest.fixture
+def mock_client(monkeypatch):
+    """用 MockTransport 替换共享客户端，并去掉退避等待"""
+    calls = []
+
+    def install(handler):
+        def transport_handler(request):
+            calls.append(request)
+            return handler(len(calls))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(transport_handler))
+        monkeypatch.setattr(http, "get_http_client", lambda: client)
+        monkeypatch.setattr(http, "backoff_delay", lambda attempt: 0.0)
+        configure_host_limit("api.test", rate=1000.0, burst=1000, max_concurrency=4)
+        return calls
+
+    return install
+
+
+def test_aimd_limit():
+    """测试成功时加性增长、限流时乘性减半"""
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=4)
+    for _ in range(8):
+        concurrency.on_success()
+    assert 5 <= concurrency.limit <= 6
+
+    concurrency.on_throttle()
+    assert concurrency.limit < 3
+    # 同一时刻的重复限流信号只减半一次
+    limit = concurrency.limit
+    concurrency.on_throttle()
+    assert concurrency.limit == limit
+
+
+@pytest.mark.asyncio
+async def test_retry_on_throttle(mock_client):
+    """测试 412 和业务风控码触发重试，最终返回成功响应"""
+    def handler(n):
+        if n == 1:
+            return httpx.Response(412)
+        if n == 2:
+            return httpx.Response(200, json={"code": -352})
+        return httpx.Response(200, json={"code": 0})
+
+    calls = mock_client(handler)
+    data = await http.get_json(
+        "https://api.test/x",
+        cookies={"SESSDATA": "abc"},
+        is_throttled=lambda r: r.json()["code"] == -352,
+    )
+
+    assert data == {"code": 0}
+    assert len(calls) == 3
+    assert calls[0].headers["Cookie"] == "SESSDATA=abc"
+
+
+@pytest.mark.asyncio
+async def test_server_errors_do_not_grow_limit(mock_client):
+    """测试 5xx 重试期间并发上限不增长，成功后才增长"""
+    configure_host_limit("flaky.test", rate=1000, burst=1000, max_concurrency=8, min_concurrency=1)
+    limiter = http.get_host_limiter("flaky.test")
+    limits = []
+
+    def handler(n):
+        limits.append(limiter.concurrency.limit)
+        return httpx.Response(503) if n < 3 else httpx.Response(200, json={"code": 0})
+
+    mock_client(handler)
+    await http.get_json("https://flaky.test/x")
+
+    assert limits[0] == limits[1] == limits[2]
+    assert limiter.concurrency.limit > limits[0]
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_error(mock_client):
+    """测试 404 不重试，直接抛出"""
+    calls = mock_client(lambda n: httpx.Response(404))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await http.get_json("https://api.test/missing")
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_conditional_revalidation(mock_client, tmp_path, monkeypatch):
+    """测试缓存的响应以 If-None-Match 重新验证，304 时使用缓存内容"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+
+    def handler(n):
+        if calls[-1].headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"body": [n]}, headers={"ETag": '"v1"'})
+
+    calls = mock_client(handler)
+    first = await http.get_json("https://api.test/sub.json?auth_key=1-a", cache=True)
+    second = await http.get_json("https://api.test/sub.json?auth_key=2-b", cache=True)
+
+    assert first == second == {"body": [1]}
+    assert len(calls) == 2
+    assert calls[1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_immutable_url_skips_request(mock_client, tmp_path, monkeypatch):
+    """测试内容寻址的字幕 URL 命中缓存后不再请求"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+    calls = mock_client(lambda n: httpx.Response(200, json={"n": n}))
+    url = "https://aisubtitle.hdslb.com/bfs/ai_subtitle/prod/123abc"
+
+    assert await http.get_json(url + "?auth_key=1", cache=True) == {"n": 1}
+    assert await http.get_json(url + "?auth_key=2", cache=True) == {"n": 1}
+    assert len(calls) == 1
@@ -0,0 +1,92 @@
+"""
+测试用例 - YouTube json3 字幕解析
+
+覆盖:
+1. 录制样本：跳过换行事件，相邻片段不重叠
+2. 滚动窗口去重（逐词增长、整行滚动）
+3. 人工字幕（无滚动窗口标记）相同或共享前缀的相邻行原样保留
+4. 格式错误返回 None
+"""
+
+import json
+import os
+
+from service.youtube import iter_json3_events, parse_json3
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks", "fixtures", "youtube_auto_zh.json3",
+)
+
+
+def _event(start_ms: int, duration_ms: int, text: str, append: bool = False) -> dict:
+    event = {"tStartMs": start_ms, "dDurationMs": duration_ms, "segs": [{"utf8": text}]}
+    if append:
+        event["aAppend"] = 1
+    return event
+
+
+def test_fixture_segments_do_not_overlap():
+    """测试录制样本：换行事件被折叠，片段时间不重叠"""
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    segments = parse_json3(content)
+    captions = [e for e in json.loads(content)["events"] if "segs" in e and not e.get("aAppend")]
+
+    assert len(segments) == len(captions)
+    assert all(s["content"] and "\n" not in s["content"] for s in segments)
+    for current, following in zip(segments, segments[1:]):
+        assert current["end"] <= following["start"]
+
+
+def test_rolling_window_dedup():
+    """测试滚动窗口中重复的文本只出现一次"""
+    content = json.dumps({
+        "pens": [{}],
+        "events": [
+            {"tStartMs": 0, "dDurationMs": 60000},
+            _event(0, 2000, "hello"),
+            _event(500, 2000, "hello world"),
+            _event(1000, 3000, "hello world\nhow are"),
+            _event(2500, 3000, "how are you\nfine"),
+            _event(4000, 1000, "\n", append=True),
+            _event(4500, 3000, "fine"),
+        ],
+    })
+
+    segments = parse_json3(content)
+
+    assert [s["content"] for s in segments] == ["hello world how are", "you fine"]
+    assert segments[0]["end"] == 2.5
+    assert segments[1]["end"] == 7.5
+
+
+def test_manual_track_unchanged():
+    """测试人工字幕不做滚动窗口合并"""
+    content = json.dumps({
+        "events": [
+            _event(0, 1000, "No."),
+            _event(1000, 1000, "No."),
+            _event(2000, 1000, "I know"),
+            _event(3000, 1000, "I know what you did"),
+        ],
+    })
+
+    segments = parse_json3(content)
+
+    assert [s["content"] for s in segments] == ["No.", "No.", "I know", "I know what you did"]
+    assert [(s["start"], s["end"]) for s in segments] == [(0, 1), (1, 2), (2, 3), (3, 4)]
+
+
+def test_iter_events_skips_other_fields():
+    """测试流式解析只产出 events 中的事件"""
+    content = '{"wireMagic": "pb3", "events": [{"tStartMs": 1}, {"tStartMs": 2}], "pens": [{}]}'
+    assert [e["tStartMs"] for e in iter_json3_events(content)] == [1, 2]
+    assert parse_json3('{"events": []}') == []
+
+
+def test_invalid_content():
+    """测试格式错误返回 None"""
+    assert parse_json3("not json") is None
+    assert parse_json3('{"events": [{"tStartMs": 1}') is None
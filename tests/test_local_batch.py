@@ -0,0 +1,144 @@
+"""
+测试用例 - 本地目录批量转录
+
+使用假的 LocalService 验证:
+1. 首次运行转录全部文件并写出 .srt/.json，再次运行全部跳过
+2. 只改修改时间（内容相同）不重新转录，内容变化、输出被删除时重新转录
+3. 监听模式下新文件在连续两次扫描中不变后才处理
+4. 同目录下主名相同的媒体文件旁路文件名保留扩展名，互不覆盖
+5. 失败的文件按退避重试，达到次数上限后只在 retry_failed 时重试
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+from service.local import LocalService
+import service.local_batch as local_batch
+from service.local_batch import MANIFEST_NAME, DirectoryBatch
+
+
+class FakeLocalService(LocalService):
+    """记录调用，返回固定片段（经基类渲染和导出）"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def download_subtitle(
+        self, source, format, model_size="large", show_progress=True, export=None, **kwargs
+    ):
+        self.calls.append(os.path.basename(source))
+        title = os.path.splitext(os.path.basename(source))[0]
+        segments = [{"start": 0.0, "end": 1.5, "content": "你好"}]
+        return self._render(segments, title, format, "whisper_asr", export=export, video_id=title)
+
+
+def _write(path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    _write(tmp_path / "a.mp3", b"a" * 1000)
+    _write(tmp_path / "sub" / "b.wav", b"b" * 1000)
+    _write(tmp_path / "notes.txt", b"not media")
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_incremental_runs(recordings):
+    """测试首次全部转录，之后只转录变化的文件"""
+    service = FakeLocalService()
+    summary = await DirectoryBatch(str(recordings), service=service).run_once()
+    assert summary["scanned"] == 2 and summary["transcribed"] == 2
+    assert sorted(service.calls) == ["a.mp3", "b.wav"]
+    assert "00:00:00,000 --> 00:00:01,500" in (recordings / "a.srt").read_text(encoding="utf-8")
+    exported = json.loads((recordings / "sub" / "b.json").read_text(encoding="utf-8"))
+    assert exported["subtitle_count"] == 1
+    manifest = json.loads((recordings / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert set(manifest["files"]) == {"a.mp3", "sub/b.wav"}
+
+    # 新实例从清单恢复：未变化的文件跳过
+    service = FakeLocalService()
+    batch = DirectoryBatch(str(recordings), service=service)
+    assert (await batch.run_once())["transcribed"] == 0
+
+    # 只改修改时间不重新转录；内容变化或输出被删除时重新转录
+    os.utime(recordings / "a.mp3", (1, 1))
+    _write(recordings / "sub" / "b.wav", b"c" * 1000)
+    assert (await batch.run_once())["transcribed"] == 1
+    os.remove(recordings / "a.srt")
+    assert (await batch.run_once())["transcribed"] == 1
+    assert service.calls == ["b.wav", "a.mp3"]
+
+
+@pytest.mark.asyncio
+async def test_same_stem_outputs_do_not_collide(recordings):
+    """测试 talk.mp4 和 talk.wav 各自写出旁路文件"""
+    _write(recordings / "talk.mp4", b"v" * 1000)
+    _write(recordings / "talk.wav", b"w" * 1000)
+
+    summary = await DirectoryBatch(str(recordings), service=FakeLocalService()).run_once()
+
+    assert summary["transcribed"] == 4
+    manifest = json.loads((recordings / MANIFEST_NAME).read_text(encoding="utf-8"))["files"]
+    assert manifest["talk.mp4"]["outputs"]["srt"] == "talk.mp4.srt"
+    assert manifest["talk.wav"]["outputs"]["srt"] == "talk.wav.srt"
+    assert manifest["a.mp3"]["outputs"]["srt"] == "a.srt"
+    assert (recordings / "talk.mp4.json").exists() and (recordings / "talk.wav.json").exists()
+    assert not (recordings / "talk.srt").exists()
+
+
+@pytest.mark.asyncio
+async def test_watch_waits_for_stable_files(recordings):
+    """测试监听模式下新文件写完（两次扫描间不变）后才处理"""
+    service = FakeLocalService()
+    batch = DirectoryBatch(str(recordings), service=service)
+    await batch.run_once()
+
+    _write(recordings / "c.m4a", b"partial")
+    assert batch.scan(settle=True) == []
+    _write(recordings / "c.m4a", b"partial and more")
+    assert batch.scan(settle=True) == []
+    assert (await batch.run_once(settle=True))["files"] == [
+        {"file": "c.m4a", "status": "transcribed", "subtitle_count": 1}
+    ]
+
+
+class FailingLocalService(FakeLocalService):
+    """每次转录都失败"""
+
+    async def download_subtitle(self, source, format, **kwargs):
+        self.calls.append(os.path.basename(source))
+        return {"error": "转录失败", "message": "模型输出为空"}
+
+
+@pytest.mark.asyncio
+async def test_failed_files_retry_with_backoff(recordings, monkeypatch):
+    """测试失败的文件到退避时间后重试，次数用尽后只在 retry_failed 时重试"""
+    os.remove(recordings / "sub" / "b.wav")
+    now = [time.time()]
+    monkeypatch.setattr(local_batch.time, "time", lambda: now[0])
+    service = FailingLocalService()
+    batch = DirectoryBatch(str(recordings), service=service)
+
+    assert (await batch.run_once())["failed"] == 1
+    assert batch.entries["a.mp3"]["attempts"] == 1
+    assert (await batch.run_once())["pending"] == 0
+
+    for attempt in range(1, local_batch.MAX_ATTEMPTS):
+        now[0] += local_batch.RETRY_DELAY * 2 ** (attempt - 1)
+        assert (await batch.run_once())["failed"] == 1
+    assert batch.entries["a.mp3"]["attempts"] == local_batch.MAX_ATTEMPTS
+
+    now[0] += 10 ** 6
+    assert (await batch.run_once())["pending"] == 0
+    assert len(service.calls) == local_batch.MAX_ATTEMPTS
+
+    service = FakeLocalService()
+    summary = await DirectoryBatch(str(recordings), service=service, retry_failed=True).run_once()
+    assert summary["transcribed"] == 1 and service.calls == ["a.mp3"]
@@ -0,0 +1,77 @@
+"""
+测试用例 - MCP HTTP 传输
+
+覆盖:
+1. 健康检查端点
+2. 多 worker 参数校验
+3. 访问令牌：非本机地址必须设置，除探测端点外都需要 Bearer 令牌；Host 校验不关闭
+4. /ready 只返回就绪状态和进度，不含预热步骤详情
+"""
+
+import sys
+
+import pytest
+from starlette.testclient import TestClient
+
+import service.warmup as warmup_module
+from handler.mcp import ENV_AUTH_TOKEN, ENV_HOST, ENV_TRANSPORT, create_app, main, mcp
+
+
+def test_health_endpoint(monkeypatch):
+    """测试 /health 返回进程状态"""
+    monkeypatch.setenv(ENV_TRANSPORT, "streamable-http")
+    app = create_app()
+
+    response = TestClient(app).get("/health")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["transport"] == "streamable-http"
+
+
+def test_ready_endpoint(monkeypatch):
+    """测试 /ready 不暴露预热步骤的详情和错误"""
+    monkeypatch.setenv(ENV_TRANSPORT, "streamable-http")
+    warmup = warmup_module.Warmup(["bilibili"], models=[])
+    warmup.steps["bilibili"].status = "done"
+    warmup.steps["bilibili"].detail = {"logged_in": True}
+    monkeypatch.setattr(warmup_module, "_warmup", warmup)
+
+    response = TestClient(create_app()).get("/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {"ready": True, "progress": {"finished": 1, "total": 1}}
+
+
+def test_sse_rejects_multiple_workers(monkeypatch):
+    """测试 SSE 传输不允许多 worker"""
+    monkeypatch.setattr(sys, "argv", ["video-captions-mcp", "--transport", "sse", "--workers", "2"])
+    with pytest.raises(SystemExit):
+        main()
+
+
+def test_auth_token(monkeypatch):
+    """测试非本机地址需要令牌，令牌在中间件中校验，Host 校验保持启用"""
+    monkeypatch.setenv(ENV_TRANSPORT, "streamable-http")
+    monkeypatch.setenv(ENV_HOST, "10.0.0.5")
+    monkeypatch.delenv(ENV_AUTH_TOKEN, raising=False)
+    with pytest.raises(RuntimeError):
+        create_app()
+    monkeypatch.setattr(
+        sys, "argv",
+        ["video-captions-mcp", "--transport", "streamable-http", "--host", "0.0.0.0"],
+    )
+    with pytest.raises(SystemExit):
+        main()
+
+    monkeypatch.setenv(ENV_AUTH_TOKEN, "s3cret")
+    client = TestClient(create_app())
+    security = mcp.settings.transport_security
+    assert security.enable_dns_rebinding_protection
+    assert security.allowed_hosts == ["10.0.0.5", "10.0.0.5:*"]
+
+    assert client.get("/health").status_code == 200
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,124 @@
+"""
+测试用例 - 视频元信息缓存
+
+覆盖:
+1. 正向/负向条目按各自的 TTL 过期
+2. 已知没有字幕的视频再次请求时不调用 get_info、跳过字幕探测，直接 ASR
+3. 播放器接口报错、或 WBI 签名失败退回未签名请求时不记为"没有字幕"
+"""
+
+import time
+
+import pytest
+
+from core.metadata import load_metadata, store_metadata
+from service.bilibili import BilibiliService
+
+VIDEO_INFO = {"id": "BV1meta", "title": "测试视频", "duration": 120, "cid": 1}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+
+
+def test_ttl(monkeypatch):
+    """测试正向条目与负向条目分别按各自的 TTL 过期"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_METADATA_TTL", "100")
+    monkeypatch.setenv("VIDEO_CAPTIONS_NO_SUBTITLE_TTL", "10")
+    store_metadata("bilibili", "BV1a", VIDEO_INFO, True)
+    store_metadata("bilibili", "BV1b", VIDEO_INFO, False)
+
+    entry = load_metadata("bilibili", "BV1a")
+    assert entry["info"] == VIDEO_INFO and entry["subtitles"] is True
+    assert load_metadata("bilibili", "BV1b")["subtitles"] is False
+    assert load_metadata("youtube", "BV1a") is None
+
+    now = time.time()
+    monkeypatch.setattr("core.metadata.time.time", lambda: now + 50)
+    assert load_metadata("bilibili", "BV1a") is not None
+    assert load_metadata("bilibili", "BV1b") is None
+
+    monkeypatch.setenv("VIDEO_CAPTIONS_METADATA_TTL", "0")
+    assert load_metadata("bilibili", "BV1a") is None
+
+
+def _patch_service(monkeypatch, service, player_result):
+    calls = {"info": 0, "probe": 0, "asr": 0}
+
+    async def get_info(source):
+        calls["info"] += 1
+        return VIDEO_INFO
+
+    async def list_player(video_info):
+        calls["probe"] += 1
+        return player_result
+
+    async def download_with_asr(source, *args, **kwargs):
+        calls["asr"] += 1
+        return {"success": True, "source": "asr"}
+
+    monkeypatch.setattr(service, "get_info", get_info)
+    monkeypatch.setattr(service, "_list_player_subtitles", list_player)
+    monkeypatch.setattr(service, "_download_with_asr", download_with_asr)
+    monkeypatch.setattr("service.bilibili.backoff_delay", lambda attempt: 0.0)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_known_without_subtitles(monkeypatch):
+    """测试确认没有字幕后，再次请求跳过 get_info 和字幕探测"""
+    service = BilibiliService()
+    calls = _patch_service(monkeypatch, service, {"available": False, "subtitles": []})
+
+    assert (await service.download_subtitle("BV1meta"))["source"] == "asr"
+    assert calls["info"] == 1 and calls["probe"] >= 1
+    assert load_metadata("bilibili", "BV1meta")["subtitles"] is False
+
+    probes = calls["probe"]
+    assert (await service.download_subtitle("BV1meta"))["source"] == "asr"
+    assert calls == {"info": 1, "probe": probes, "asr": 2}
+
+
+@pytest.mark.asyncio
+async def test_api_error_not_recorded(monkeypatch):
+    """测试播放器接口报错（如风控）时只缓存元信息，不记为没有字幕"""
+    service = BilibiliService()
+    calls = _patch_service(
+        monkeypatch, service, {"available": False, "subtitles": [], "error": "请求被拦截"}
+    )
+
+    assert (await service.download_subtitle("BV1meta"))["source"] == "asr"
+    assert load_metadata("bilibili", "BV1meta")["subtitles"] is None
+
+    await service.download_subtitle("BV1meta")
+    assert calls["info"] == 1
+    assert calls["probe"] > 1
+
+
+@pytest.mark.asyncio
+async def test_unsigned_empty_not_recorded(monkeypatch):
+    """测试获取 WBI key 失败（未签名请求返回空列表）时不记为没有字幕"""
+    service = BilibiliService()
+
+    async def get_info(source):
+        return VIDEO_INFO
+
+    async def no_keys(*args, **kwargs):
+        raise ValueError("nav 接口未返回 wbi_img")
+
+    async def get_json(url, **kwargs):
+        return {"code": 0, "data": {"cid": 1, "subtitle": {"subtitles": []}}}
+
+    async def download_with_asr(source, *args, **kwargs):
+        return {"success": True, "source": "asr"}
+
+    monkeypatch.setattr(service, "get_info", get_info)
+    monkeypatch.setattr(service, "_get_cookies", lambda: {})
+    monkeypatch.setattr(service, "_download_with_asr", download_with_asr)
+    monkeypatch.setattr("service.bilibili_wbi.get_wbi_keys", no_keys)
+    monkeypatch.setattr("service.bilibili.get_json", get_json)
+    monkeypatch.setattr("service.bilibili.backoff_delay", lambda attempt: 0.0)
+
+    assert (await service.download_subtitle("BV1meta"))["source"] == "asr"
+    assert load_metadata("bilibili", "BV1meta")["subtitles"] is None
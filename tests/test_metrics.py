@@ -0,0 +1,64 @@
+"""
+测试用例 - 性能指标
+
+覆盖:
+1. 阶段耗时统计与单次请求耗时收集
+2. 计数器与 Prometheus 文本输出
+"""
+
+import pytest
+
+from core.metrics import (
+    inc_counter,
+    record_cache,
+    render_prometheus,
+    reset_metrics,
+    snapshot,
+    stage,
+    track_request,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    reset_metrics()
+    yield
+    reset_metrics()
+
+
+def test_stage_and_request_timings():
+    """测试阶段耗时同时计入全局统计和当前请求"""
+    with track_request() as timings:
+        with stage("metadata"):
+            pass
+        with stage("metadata"):
+            pass
+    with stage("format"):
+        pass
+
+    assert set(timings) == {"metadata", "total"}
+    stages = snapshot()["stages"]
+    assert stages["metadata"]["count"] == 2
+    assert stages["format"]["count"] == 1
+
+
+def test_stage_records_on_error():
+    """测试异常时仍记录耗时"""
+    with pytest.raises(RuntimeError):
+        with stage("asr_decode"):
+            raise RuntimeError("boom")
+    assert snapshot()["stages"]["asr_decode"]["count"] == 1
+
+
+def test_prometheus_format():
+    """测试 Prometheus 文本格式"""
+    with stage("metadata"):
+        pass
+    record_cache("asr", True)
+    inc_counter("errors", type='Value"Error')
+
+    text = render_prometheus()
+    assert "# TYPE video_captions_stage_duration_seconds histogram" in text
+    assert 'video_captions_stage_duration_seconds_bucket{stage="metadata",le="+Inf"} 1' in text
+    assert 'video_captions_cache_hits_total{cache="asr"} 1' in text
+    assert 'video_captions_errors_total{type="Value\\"Error"} 1' in text
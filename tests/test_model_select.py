@@ -0,0 +1,61 @@
+"""
+测试用例 - ASR 模型自动选择
+
+覆盖:
+1. 短音频在默认截止时间内选择 large
+2. 长音频降级到更快的模型，全部超时时返回最快模型并标记 fits=False
+3. 实测 RTF 写入缓存目录并影响后续估算
+"""
+
+import pytest
+
+from core.model_select import (
+    DEFAULT_PROFILES,
+    MODEL_SIZES,
+    estimate_seconds,
+    load_rtf_table,
+    record_rtf,
+    select_model_size,
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+
+
+def test_short_audio_uses_large():
+    """测试短音频选择最高精度模型"""
+    selection = select_model_size(120)
+
+    assert selection["model_size"] == "large"
+    assert selection["fits"]
+    assert selection["estimated_seconds"] <= selection["deadline"]
+
+
+def test_long_audio_downgrades():
+    """测试长音频按截止时间降级，全部超时时选择最快模型"""
+    selection = select_model_size(3 * 3600, deadline=600)
+    assert selection["model_size"] not in ("large", "medium")
+    assert selection["fits"]
+
+    selection = select_model_size(3 * 3600, deadline=30)
+    assert selection["model_size"] == MODEL_SIZES[-1]
+    assert not selection["fits"]
+
+
+def test_record_rtf_updates_estimate():
+    """测试实测 RTF 覆盖先验值，过短的样本不计入"""
+    record_rtf("large", 5, 50, 1)
+    assert load_rtf_table() == {}
+
+    record_rtf("large", 600, 30, 5)
+    table = load_rtf_table()
+    assert table["large"] == {"rtf": 0.05, "load": 5.0, "samples": 1}
+    assert estimate_seconds("large", 3600, table) < estimate_seconds("large", 3600, {})
+
+    record_rtf("large", 600, 90, 5)
+    entry = load_rtf_table()["large"]
+    assert entry["samples"] == 2
+    assert 0.05 < entry["rtf"] < 0.15
+    assert DEFAULT_PROFILES["large"][0] == 0.12
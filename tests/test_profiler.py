@@ -0,0 +1,69 @@
+"""
+测试用例 - 性能剖析
+
+覆盖:
+1. 阶段的墙钟、CPU、内存峰值和子进程耗时（嵌套阶段分别统计）
+2. 折叠栈文件格式
+3. 未启用时 stage() 不记录剖析数据
+"""
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+from core.metrics import observe_stage, stage
+from core.profiler import child_process, get_profiler, start_profiler, stop_profiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = start_profiler(str(tmp_path), interval=0.001)
+    yield profiler
+    stop_profiler()
+
+
+def _busy(seconds: float) -> None:
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def test_stage_profile(profiler):
+    """测试阶段统计和子进程耗时"""
+    with stage("format"):
+        _busy(0.05)
+        with stage("audio_extract"):
+            data = bytearray(8 * 1024 * 1024)
+            del data
+            with child_process():
+                subprocess.run([sys.executable, "-c", "pass"], check=True)
+    observe_stage("asr_decode", 1.5, child_process=True)
+    stop_profiler()
+
+    rows = {row["stage"]: row for row in profiler.summary()}
+    assert rows["format"]["cpu"] >= 0.05
+    assert rows["format"]["samples"] > 0
+    assert rows["audio_extract"]["peak_mb"] >= 8
+    assert rows["audio_extract"]["child_wall"] > 0
+    assert rows["audio_extract"]["child_cpu"] > 0
+    # 嵌套阶段的内存峰值同样计入外层
+    assert rows["format"]["peak_mb"] >= 8
+    assert rows["asr_decode"] == {**rows["asr_decode"], "calls": 1, "wall": 1.5, "child_wall": 1.5}
+    assert "audio_extract" in profiler.render_table()
+
+    folded_path, table_path = profiler.write()
+    with open(folded_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert any(line.startswith("format;") and "_busy (test_profiler.py:" in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+
+def test_disabled_by_default():
+    """测试未启用时不创建剖析器"""
+    assert get_profiler() is None
+    with stage("format"), child_process():
+        pass
@@ -0,0 +1,73 @@
+"""
+测试用例 - 字幕全文检索
+
+覆盖:
+1. 中文子串、繁体查询和多词查询
+2. 重新写入同一视频时替换旧片段
+3. 按平台过滤
+4. 服务写入索引时不在事件循环线程中执行
+"""
+
+import threading
+
+import pytest
+
+from core.search import build_query, index_transcript, search_captions
+from service.bilibili import BilibiliService
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+
+
+def _segments(texts):
+    return [{"start": i * 5.0, "end": i * 5.0 + 4, "content": text} for i, text in enumerate(texts)]
+
+
+def test_chinese_substring_search():
+    """测试中文任意子串、繁体查询和中英混合多词查询"""
+    index_transcript("bilibili", "BV1", "缓存设计", _segments([
+        "大家好，今天聊聊缓存一致性",
+        "Redis 的过期策略",
+        "谢谢观看",
+    ]), "bilibili_api", "https://www.bilibili.com/video/BV1")
+
+    result = search_captions("存一致")
+    assert result["count"] == 1
+    assert result["results"][0]["start"] == 0.0
+    assert result["results"][0]["title"] == "缓存设计"
+
+    assert search_captions("緩存")["count"] == 1
+    assert search_captions("redis 过期")["results"][0]["start"] == 5.0
+    # 字符需相邻（短语匹配）
+    assert search_captions("缓一")["count"] == 0
+    assert build_query("  ") is None
+
+
+def test_reindex_and_filter():
+    """测试重新写入替换旧片段，并可按平台过滤"""
+    index_transcript("youtube", "abc", "v1", _segments(["旧内容 hello"]), "youtube_api")
+    index_transcript("youtube", "abc", "v2", _segments(["新内容 hello"]), "whisper_asr")
+    index_transcript("local", "/tmp/a.mp4", "a", _segments(["hello world"]), "whisper_asr")
+
+    assert search_captions("旧内容")["count"] == 0
+    result = search_captions("hello", service="youtube")
+    assert [r["title"] for r in result["results"]] == ["v2"]
+    assert search_captions("hello")["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_service_indexes_off_event_loop(monkeypatch):
+    """测试服务在线程中写入索引，不阻塞事件循环"""
+    threads = []
+
+    def fake_index(*args):
+        threads.append(threading.current_thread())
+
+    monkeypatch.setattr("service.base.safe_index_transcript", fake_index)
+    await BilibiliService()._index_transcript(
+        "BV1", "标题", _segments(["你好"]), "bilibili_api", "BV1"
+    )
+
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,101 @@
+"""
+测试用例 - B站字幕校验与重试
+
+覆盖:
+1. 空字幕、cid 不一致、超出视频时长的字幕被判定为无效
+2. 播放器接口先返回空列表/错误字幕时重试，最终取得有效字幕
+3. 多次尝试后仍无有效字幕时返回 None（交给 ASR 兜底）
+4. 风控以外的错误码（视频不存在、cid 无效）不重试
+"""
+
+import pytest
+
+import service.bilibili as bilibili
+from service.bilibili import BilibiliService, validate_subtitle
+
+VIDEO_INFO = {"id": "BV1", "title": "标题", "cid": 100, "duration": 120}
+
+
+def _body(end: float):
+    return [
+        {"from": 0, "to": 5, "content": "开头"},
+        {"from": end - 5, "to": end, "content": "结尾"},
+    ]
+
+
+def test_validate_subtitle():
+    """测试字幕校验规则"""
+    assert validate_subtitle(_body(118), VIDEO_INFO, 100) is None
+    assert validate_subtitle([], VIDEO_INFO) == "字幕内容为空"
+    assert "cid" in validate_subtitle(_body(118), VIDEO_INFO, 200)
+    assert "时长" in validate_subtitle(_body(600), VIDEO_INFO)
+    # 时长未知时不做时长校验
+    assert validate_subtitle(_body(600), {**VIDEO_INFO, "duration": 0}) is None
+
+
+@pytest.fixture
+def player(monkeypatch):
+    """依次返回预设的播放器接口响应，字幕 URL 对应的 body 由 bodies 提供"""
+    responses = []
+    bodies = {}
+
+    async def fake_list(self, video_info):
+        return responses.pop(0)
+
+    async def fake_get_json(url, **kwargs):
+        return {"body": bodies[url]}
+
+    monkeypatch.setattr(BilibiliService, "_list_player_subtitles", fake_list)
+    monkeypatch.setattr(bilibili, "get_json", fake_get_json)
+    monkeypatch.setattr(bilibili, "backoff_delay", lambda attempt: 0.0)
+    return responses, bodies
+
+
+def _listing(url: str, cid: int = 100):
+    return {"available": True, "subtitles": [{"lan": "ai-zh", "subtitle_url": url}], "cid": cid}
+
+
+@pytest.mark.asyncio
+async def test_retry_until_valid(player):
+    """测试空列表和其他视频的字幕触发重试"""
+    responses, bodies = player
+    bodies["https://cdn/other"] = _body(900)
+    bodies["https://cdn/good"] = _body(110)
+    responses += [
+        {"available": False, "subtitles": []},
+        _listing("https://cdn/other"),
+        _listing("//cdn/good"),
+    ]
+
+    body = await BilibiliService()._fetch_validated_subtitle(VIDEO_INFO)
+
+    assert body == _body(110)
+    assert not responses
+
+
+@pytest.mark.asyncio
+async def test_give_up_after_max_attempts(player):
+    """测试多次尝试后仍无字幕时返回 None"""
+    responses, _ = player
+    responses += [{"available": False, "subtitles": []}] * bilibili.SUBTITLE_MAX_ATTEMPTS
+
+    assert await BilibiliService()._fetch_validated_subtitle(VIDEO_INFO) is None
+    assert not responses
+
+
+@pytest.mark.asyncio
+async def test_no_retry_on_non_risk_control_error(player):
+    """测试 -404 等错误码不重试，风控错误码重试"""
+    responses, bodies = player
+    error = {"available": False, "subtitles": [], "error": "啥都木有", "code": -404}
+    responses += [error, _listing("https://cdn/good")]
+    failures = []
+
+    assert await BilibiliService()._fetch_validated_subtitle(VIDEO_INFO, failures) is None
+    assert failures == ["啥都木有"]
+    assert len(responses) == 1
+
+    bodies["https://cdn/good"] = _body(110)
+    responses.insert(0, {"available": False, "subtitles": [], "error": "请求被拦截", "code": -412})
+    assert await BilibiliService()._fetch_validated_subtitle(VIDEO_INFO) == _body(110)
+    assert not responses
@@ -0,0 +1,158 @@
+"""
+测试用例 - 时间范围
+
+覆盖:
+1. 时间解析（秒数、mm:ss、hh:mm:ss）与无效范围报错
+2. API 字幕按时间过滤，时间戳不变
+3. ASR 只转录一段音频时，片段平移回视频时间轴，并只下载该范围
+4. 只差小数秒的两个范围分别缓存音频片段
+5. ffmpeg 按时间范围提取音频（需要 ffmpeg）
+"""
+
+import shutil
+import struct
+import wave
+
+import pytest
+
+from core.audio import extract_audio, get_audio_duration
+from core.formatter import ResponseFormat
+from core.timerange import TimeRange, make_time_range, parse_time
+from service.bilibili import BilibiliService
+
+VIDEO_INFO = {"id": "BV1test", "title": "测试视频", "duration": 1200, "cid": 1}
+
+
+def test_parse_time():
+    """测试时间解析与范围校验"""
+    assert parse_time("90") == 90.0
+    assert parse_time(90) == 90.0
+    assert parse_time("1:30") == 90.0
+    assert parse_time("01:02:03.5") == 3723.5
+    assert parse_time("75:00") == 4500.0
+    for value in ("", "1:75", "a:10", "1:2:3:4", "-5"):
+        with pytest.raises(ValueError):
+            parse_time(value)
+
+    assert make_time_range() is None
+    assert make_time_range("0", None) is None
+    assert make_time_range("10:00", "15:00") == TimeRange(600.0, 900.0)
+    assert make_time_range(end=30).label() == "0m00s-0m30s"
+    assert TimeRange(3723).label() == "1h02m03s-end"
+    # 只差小数秒的范围标识不同（用于音频缓存键和文件名）
+    assert TimeRange(10.5, 20).label() == "0m10.500s-0m20s"
+    assert TimeRange(10.5, 20).label() != TimeRange(10, 20).label()
+    assert TimeRange(3723.25).label() == "1h02m03.250s-end"
+    with pytest.raises(ValueError):
+        make_time_range("15:00", "10:00")
+
+
+@pytest.mark.asyncio
+async def test_api_subtitles_filtered(monkeypatch, tmp_path):
+    """测试 API 字幕按时间过滤，时间戳仍相对视频开头"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+    service = BilibiliService()
+
+    async def get_info(source):
+        return VIDEO_INFO
+
+    async def fetch(video_info, failures=None):
+        return [{"from": t, "to": t + 10, "content": f"第{t}秒"} for t in range(0, 1200, 10)]
+
+    monkeypatch.setattr(service, "get_info", get_info)
+    monkeypatch.setattr(service, "_fetch_validated_subtitle", fetch)
+    monkeypatch.setattr("service.base.safe_index_transcript", lambda *args: None)
+
+    result = await service.download_subtitle(
+        "BV1test", ResponseFormat.JSON, time_range=TimeRange(605, 630)
+    )
+    assert [seg["content"] for seg in result["subtitles"]] == ["第600秒", "第610秒", "第620秒"]
+    assert result["subtitles"][0]["from"] == 600
+    assert result["time_range"] == {"start": 605, "end": 630}
+
+    result = await service.download_subtitle("BV1test", time_range=TimeRange(1300))
+    assert "超出视频时长" in result["message"]
+
+
+@pytest.mark.asyncio
+async def test_asr_window(monkeypatch, tmp_path):
+    """测试 ASR 只获取该时间范围的音频，片段平移回视频时间轴且不写入检索索引"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path / "cache"))
+    service = BilibiliService()
+    requested = {}
+    indexed = []
+
+    async def get_info(source):
+        return VIDEO_INFO
+
+    async def fetch(video_info, failures=None):
+        return None
+
+    async def prepare_audio(source, output_dir, show_progress=True, time_range=None):
+        requested["time_range"] = time_range
+        return str(tmp_path / "window.wav"), VIDEO_INFO["title"], VIDEO_INFO["id"]
+
+    async def transcribe(audio_file, model_size, show_progress, deadline=None):
+        # 相对片段开头的时间戳，最后一段略超出片段时长
+        return {"segments": [
+            {"start": 0.0, "end": 4.0, "text": "a"},
+            {"start": 4.0, "end": 30.0, "text": "b"},
+            {"start": 30.2, "end": 31.0, "text": "c"},
+        ], "model_size": "base"}
+
+    monkeypatch.setattr(service, "get_info", get_info)
+    monkeypatch.setattr(service, "_fetch_validated_subtitle", fetch)
+    monkeypatch.setattr(service, "prepare_audio", prepare_audio)
+    monkeypatch.setattr("service.bilibili.transcribe_with_asr", transcribe)
+    monkeypatch.setattr("service.base.safe_index_transcript", lambda *args: indexed.append(args))
+
+    time_range = TimeRange(600, 630)
+    result = await service.download_subtitle("BV1test", ResponseFormat.JSON, time_range=time_range)
+
+    assert requested["time_range"] == time_range
+    spans = [(seg["from"], seg["to"]) for seg in result["subtitles"]]
+    assert spans == [(600.0, 604.0), (604.0, 630.0)]
+    assert result["model_size"] == "base"
+    assert indexed == []
+
+
+@pytest.mark.asyncio
+async def test_fractional_ranges_cached_separately(monkeypatch, tmp_path):
+    """测试 10.5–20 秒不会命中 10–20 秒的音频缓存"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path / "cache"))
+    service = BilibiliService()
+    downloads = []
+
+    async def download_and_extract(source, output_dir, show_progress=True, time_range=None):
+        downloads.append(time_range)
+        audio_file = tmp_path / f"clip{len(downloads)}.wav"
+        audio_file.write_bytes(str(time_range.start).encode())
+        return str(audio_file), VIDEO_INFO["title"], VIDEO_INFO["id"]
+
+    monkeypatch.setattr(service, "download_and_extract_audio", download_and_extract)
+
+    first, _, _ = await service.prepare_audio("BV1test", str(tmp_path), False, TimeRange(10, 20))
+    second, _, _ = await service.prepare_audio("BV1test", str(tmp_path), False, TimeRange(10.5, 20))
+    again, _, _ = await service.prepare_audio("BV1test", str(tmp_path), False, TimeRange(10.5, 20))
+
+    assert downloads == [TimeRange(10, 20), TimeRange(10.5, 20)]
+    assert first != second and again == second
+    with open(second, "rb") as f:
+        assert f.read() == b"10.5"
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+def test_extract_window(tmp_path):
+    """测试 ffmpeg 按时间范围提取音频"""
+    source = str(tmp_path / "long.wav")
+    with wave.open(source, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(struct.pack("<h", 1000) * 16000 * 10)
+
+    audio_file = extract_audio(
+        source, str(tmp_path / "out"), show_progress=False, time_range=TimeRange(2, 5)
+    )
+    assert audio_file.endswith("long.0m02s-0m05s.wav")
+    assert abs(get_audio_duration(audio_file) - 3.0) < 0.05
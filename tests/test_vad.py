@@ -0,0 +1,72 @@
+"""
+测试用例 - 语音活动检测
+
+使用合成音频（静音 + 正弦波"语音"）验证:
+1. 只保留语音区间，短促爆音被丢弃
+2. 裁剪后音频上的时间戳映射回原始时间轴
+3. 语音占比很高时不裁剪
+"""
+
+import numpy as np
+
+from core.vad import PAD_MS, apply_vad, detect_speech, remap_segments
+
+SAMPLE_RATE = 16000
+
+
+def _tone(seconds: float, amplitude: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * 32767 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 20, int(seconds * SAMPLE_RATE)).astype(np.int16)
+
+
+def test_detect_speech_regions():
+    """测试检测出两段语音，忽略 60ms 的爆音"""
+    audio = np.concatenate([
+        _silence(10), _tone(3), _silence(5), _tone(0.06), _silence(5), _tone(2), _silence(10),
+    ])
+
+    regions = detect_speech(audio)
+
+    pad = PAD_MS / 1000
+    assert len(regions) == 2
+    assert abs(regions[0][0] / SAMPLE_RATE - (10 - pad)) < 0.05
+    assert abs(regions[0][1] / SAMPLE_RATE - (13 + pad)) < 0.05
+    assert abs(regions[1][0] / SAMPLE_RATE - (23.06 - pad)) < 0.05
+
+
+def test_apply_and_remap():
+    """测试拼接后的音频只含语音，片段时间戳映射回原始位置"""
+    audio = np.concatenate([_silence(20), _tone(4), _silence(30), _tone(4), _silence(5)])
+
+    speech, regions = apply_vad(audio)
+
+    assert len(regions) == 2
+    assert len(speech) < len(audio) * 0.25
+    first = (regions[0][1] - regions[0][0]) / SAMPLE_RATE
+    segments = [
+        {"start": 0.5, "end": first, "text": "一"},
+        {"start": first + 1.0, "end": first + 2.0, "text": "二"},
+    ]
+    remapped = remap_segments(segments, regions)
+
+    assert abs(remapped[0]["start"] - (20.5 - PAD_MS / 1000)) < 0.05
+    assert abs(remapped[0]["end"] - (24 + PAD_MS / 1000)) < 0.05
+    assert abs(remapped[1]["start"] - (55 - PAD_MS / 1000)) < 0.05
+    assert remapped[1]["text"] == "二"
+
+
+def test_mostly_speech_is_untouched():
+    """测试几乎全是语音时返回原音频，全静音时返回空区间"""
+    audio = np.concatenate([_tone(30), _silence(1), _tone(30)])
+    speech, regions = apply_vad(audio)
+    assert regions is None
+    assert speech is audio
+
+    speech, regions = apply_vad(_silence(10))
+    assert regions == []
+    assert len(speech) == 0
@@ -0,0 +1,100 @@
+"""
+测试用例 - 启动预热
+
+使用替换后的步骤函数验证:
+1. 各步骤并发执行，成功、失败、跳过的步骤都计入已结束，全部结束后就绪
+2. 预热进行中的状态与进度
+3. 未配置预加载模型时跳过 asr 步骤，步骤配置的解析
+4. youtube 步骤运行 VIDEO_CAPTIONS_YT_DLP 指定的可执行文件
+"""
+
+import asyncio
+import platform
+import sys
+
+import pytest
+
+from service import warmup as warmup_module
+from service.youtube import YouTubeService
+from service.warmup import Warmup, load_warmup_models, load_warmup_steps
+
+
+@pytest.mark.asyncio
+async def test_steps_finish(monkeypatch):
+    """测试成功、失败、跳过的步骤都结束后就绪"""
+    async def ok(w):
+        return {"logged_in": True}
+
+    async def boom(w):
+        raise RuntimeError("网络不可用")
+
+    monkeypatch.setitem(warmup_module._STEP_RUNNERS, "bilibili", ok)
+    monkeypatch.setitem(warmup_module._STEP_RUNNERS, "youtube", boom)
+
+    warmup = Warmup(["bilibili", "youtube", "asr"], models=[])
+    await warmup.run()
+    status = warmup.status()
+
+    assert status["ready"] is True
+    assert status["progress"] == {"finished": 3, "total": 3}
+    assert status["steps"]["bilibili"]["status"] == "done"
+    assert status["steps"]["bilibili"]["detail"] == {"logged_in": True}
+    assert status["steps"]["youtube"]["status"] == "failed"
+    assert "网络不可用" in status["steps"]["youtube"]["error"]
+    assert status["steps"]["asr"]["status"] == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_status_while_running(monkeypatch):
+    """测试预热进行中未就绪，结束后就绪；stop 取消未完成的预热"""
+    release = asyncio.Event()
+
+    async def slow(w):
+        await release.wait()
+
+    async def fast(w):
+        return None
+
+    monkeypatch.setitem(warmup_module._STEP_RUNNERS, "asr", slow)
+    monkeypatch.setitem(warmup_module._STEP_RUNNERS, "text", fast)
+
+    warmup = Warmup(["text", "asr"], models=["small"])
+    warmup.start()
+    await asyncio.sleep(0.05)
+    status = warmup.status()
+    assert status["ready"] is False
+    assert status["progress"] == {"finished": 1, "total": 2}
+    assert status["steps"]["asr"]["status"] == "running"
+
+    release.set()
+    await asyncio.sleep(0.05)
+    assert warmup.ready
+
+    stalled = Warmup(["asr"], models=["small"])
+    release.clear()
+    stalled.start()
+    await asyncio.sleep(0.01)
+    await stalled.stop()
+    assert not stalled.ready
+
+
+def test_load_config(monkeypatch):
+    """测试步骤与模型配置解析"""
+    monkeypatch.delenv("VIDEO_CAPTIONS_WARMUP", raising=False)
+    assert load_warmup_steps() == ["text", "bilibili", "youtube", "asr"]
+    monkeypatch.setenv("VIDEO_CAPTIONS_WARMUP", "asr, text,unknown,asr")
+    assert load_warmup_steps() == ["asr", "text"]
+    monkeypatch.setenv("VIDEO_CAPTIONS_WARMUP", "off")
+    assert load_warmup_steps() == []
+
+    monkeypatch.setenv("VIDEO_CAPTIONS_WARMUP_MODELS", "large, small")
+    assert load_warmup_models() == ["large", "small"]
+
+
+@pytest.mark.asyncio
+async def test_youtube_uses_configured_yt_dlp(monkeypatch):
+    """测试预热与实际请求运行同一个 yt-dlp"""
+    # 用 Python 解释器代替 yt-dlp：`python --version` 输出版本号
+    monkeypatch.setattr("core.ytdlp.YT_DLP", sys.executable)
+    detail = await YouTubeService().warm_up()
+    assert detail == {"yt_dlp": f"Python {platform.python_version()}"}
@@ -0,0 +1,92 @@
+"""
+测试用例 - B站 WBI 签名
+
+覆盖:
+1. 签名结果与公开的参考实现一致
+2. WBI key 只获取一次，日期变化后重新获取
+3. 播放器接口返回 -352 时丢弃 key 立即重新签名，不按限流处理
+"""
+
+import httpx
+import pytest
+
+import service.bilibili as bilibili
+import service.bilibili_wbi as wbi
+from service.bilibili import BilibiliService
+
+IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+
+
+def test_sign_params_reference_vector():
+    """测试参考实现中的签名示例"""
+    signed = wbi.sign_params(
+        {"foo": "114", "bar": "514", "zab": 1919810}, IMG_KEY, SUB_KEY, wts=1702204169
+    )
+
+    assert list(signed) == ["bar", "foo", "wts", "zab", "w_rid"]
+    assert signed["w_rid"] == "8f6f2b5b3d485fe1886cec6a0be8c5d4"
+    assert wbi.get_mixin_key(IMG_KEY, SUB_KEY) == "ea1db124af3c7062474693fa704f4ff8"
+
+
+@pytest.mark.asyncio
+async def test_keys_cached_and_refreshed_daily(tmp_path, monkeypatch):
+    """测试 key 在进程内和磁盘上缓存，日期变化后重新获取"""
+    monkeypatch.setenv("VIDEO_CAPTIONS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(wbi, "_keys", None)
+    calls = []
+
+    async def fake_get_json(url, **kwargs):
+        calls.append(url)
+        return {"code": -101, "data": {"wbi_img": {
+            "img_url": f"https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png",
+            "sub_url": f"https://i0.hdslb.com/bfs/wbi/{SUB_KEY}.png",
+        }}}
+
+    monkeypatch.setattr(wbi, "get_json", fake_get_json)
+    monkeypatch.setattr(wbi, "_today", lambda: "20240101")
+
+    assert await wbi.get_wbi_keys("https://api.test/nav") == (IMG_KEY, SUB_KEY)
+    await wbi.get_wbi_keys("https://api.test/nav")
+    # 其他进程：内存中没有，从磁盘读取
+    monkeypatch.setattr(wbi, "_keys", None)
+    await wbi.get_wbi_keys("https://api.test/nav")
+    assert len(calls) == 1
+
+    monkeypatch.setattr(wbi, "_today", lambda: "20240102")
+    signed = await wbi.sign_request_params({"bvid": "BV1"}, "https://api.test/nav")
+    assert len(calls) == 2
+    assert "w_rid" in signed
+
+
+@pytest.mark.asyncio
+async def test_stale_signature_resigned(monkeypatch):
+    """测试签名被拒绝（-352）时丢弃 key 并立即重新签名一次"""
+    responses = [
+        {"code": -352, "message": "风控校验失败"},
+        {"code": 0, "data": {
+            "cid": 1, "subtitle": {"subtitles": [{"lan": "ai-zh", "subtitle_url": "//s"}]}
+        }},
+    ]
+    signed = []
+    invalidated = []
+
+    async def fake_sign(params, nav_url, headers=None, cookies=None):
+        signed.append(params)
+        return params
+
+    async def fake_get_json(url, is_throttled=None, **kwargs):
+        data = responses.pop(0)
+        assert not is_throttled(httpx.Response(200, json=data))
+        return data
+
+    monkeypatch.setattr(bilibili, "sign_request_params", fake_sign)
+    monkeypatch.setattr(bilibili, "get_json", fake_get_json)
+    monkeypatch.setattr(bilibili, "invalidate_wbi_keys", lambda: invalidated.append(True))
+    monkeypatch.setattr(BilibiliService, "_get_cookies", lambda self: {})
+
+    info = await BilibiliService()._list_player_subtitles({"id": "BV1", "cid": 1})
+
+    assert info["available"] and info["subtitle_count"] == 1
+    assert len(signed) == 2 and invalidated == [True]
+    assert bilibili._is_risk_controlled_signed(httpx.Response(200, json={"code": -412}))